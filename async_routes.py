@@ -0,0 +1,93 @@
+import functools
+import inspect
+from typing import Callable
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.params import Depends as DependsParam
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.profiling import ProfilingRoute
+from db.database import AsyncReadSessionLocal, AsyncSessionLocal, READ_METHODS
+
+
+# Dependency для получения асинхронной сессии базы данных
+async def get_async_db(request: Request):
+    session_factory = AsyncReadSessionLocal if request.method in READ_METHODS else AsyncSessionLocal
+    async with session_factory() as db:
+        yield db
+
+
+# Dependency для POST-эндпоинтов, которые только читают данные (пакетное чтение)
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+def async_endpoint(endpoint: Callable, dependencies: dict[Callable, Callable]) -> Callable:
+    """
+    Превращает синхронный обработчик в асинхронный, который выполняет его через AsyncSession.run_sync.
+
+    Параметр сессии обработчика получает асинхронную сессию из соответствующей dependency, остальные
+    параметры передаются как есть. Тело обработчика выполняется в greenlet событийного цикла: запросы
+    к базе не блокируют цикл, а обработчик получает синхронную сессию и ведет себя так же, как в
+    синхронном режиме.
+
+    Args:
+        endpoint (Callable): Синхронный обработчик с параметром Session = Depends(...).
+        dependencies (dict[Callable, Callable]): Синхронная dependency сессии -> асинхронная.
+
+    Returns:
+        Callable: Асинхронный обработчик с той же сигнатурой, кроме параметра сессии.
+
+    Raises:
+        ValueError: Если у обработчика нет ровно одного параметра сессии.
+    """
+    signature = inspect.signature(endpoint)
+    session_params = [
+        name for name, param in signature.parameters.items()
+        if isinstance(param.default, DependsParam) and param.default.dependency in dependencies
+    ]
+    if len(session_params) != 1:
+        raise ValueError(f"Endpoint {endpoint.__name__} must have exactly one session parameter")
+    session_param = session_params[0]
+
+    @functools.wraps(endpoint)
+    async def run(**kwargs):
+        db: AsyncSession = kwargs.pop(session_param)
+        return await db.run_sync(lambda session: endpoint(**kwargs, **{session_param: session}))
+
+    parameters = [
+        param.replace(annotation=AsyncSession, default=Depends(dependencies[param.default.dependency]))
+        if name == session_param else param
+        for name, param in signature.parameters.items()
+    ]
+    run.__signature__ = signature.replace(parameters=parameters)
+    return run
+
+
+def build_async_router(router: APIRouter, dependencies: dict[Callable, Callable]) -> APIRouter:
+    """
+    Создает роутер для DB_MODE=async из роутера синхронных эндпоинтов.
+
+    Маршруты, модели ответов и обработчики общие для обоих режимов; отличается только сессия,
+    через которую выполняется обработчик (см. async_endpoint).
+
+    Args:
+        router (APIRouter): Роутер синхронных эндпоинтов.
+        dependencies (dict[Callable, Callable]): Синхронная dependency сессии -> асинхронная.
+
+    Returns:
+        APIRouter: Роутер с асинхронными обработчиками в том же порядке маршрутов.
+    """
+    async_router = APIRouter(route_class=ProfilingRoute)
+    for route in router.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        async_router.add_api_route(
+            route.path, async_endpoint(route.endpoint, dependencies), methods=route.methods, name=route.name,
+            response_model=route.response_model, status_code=route.status_code, response_class=route.response_class,
+            response_model_exclude_unset=route.response_model_exclude_unset,
+            include_in_schema=route.include_in_schema,
+        )
+    return async_router
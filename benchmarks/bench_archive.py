@@ -0,0 +1,101 @@
+"""
+Задержка запросов по активным выдачам в зависимости от длины истории, без архива и с архивом.
+
+Для каждого размера истории создает базу из db.seed (выдачи распределены по десяти
+годам до END_DATE), измеряет запросы к активным выдачам и удаление выдач самой
+популярной книги (в откатываемой транзакции), затем переносит выдачи,
+возвращенные более ARCHIVE_AFTER_DAYS дней назад, в borrow_archive через
+db.archive и повторяет замеры. С архивом таблица borrow содержит только выдачи
+за последний год, поэтому время запросов не растет вместе с историей.
+
+Запуск:
+    python -m benchmarks.bench_archive --borrows 100000 1000000 5000000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, delete, func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from benchmarks.common import seed_workdir
+from core.cruds.borrow import BorrowCRUD
+from core.cruds.stats import StatsCRUD
+from core.models.borrow import Borrow, BorrowArchive
+from core.models.stats import BookStats
+from db.archive import archive_all
+from db.seed import END_DATE
+
+
+def measure(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def delete_book_borrows(engine, book_id: int) -> None:
+    # Удаление истории выдач книги, как в BookCRUD.delete_books, без фиксации транзакции
+    with engine.connect() as conn:
+        conn.execute(delete(Borrow).where(Borrow.book_id == book_id))
+        conn.rollback()
+
+
+def measure_queries(engine, book_id: int, reader_id: int, repeat: int) -> dict[str, float]:
+    with Session(engine) as db:
+        return {
+            "reader active": measure(lambda: BorrowCRUD.get_reader_borrows(db, reader_id, active=True, limit=20),
+                                     repeat),
+            "book history": measure(lambda: BorrowCRUD.get_book_borrows(db, book_id, limit=20), repeat),
+            "overdue page": measure(lambda: StatsCRUD.get_overdue(db, as_of=END_DATE, limit=20), repeat),
+            "active count": measure(lambda: db.scalar(select(func.count()).select_from(Borrow)
+                                                      .where(Borrow.return_date.is_(None))), repeat),
+            "delete book": measure(lambda: delete_book_borrows(engine, book_id), repeat),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--borrows", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--books", type=int, default=50_000)
+    parser.add_argument("--readers", type=int, default=20_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'history':>10}{'mode':>12}{'hot rows':>10}{'active':>8}{'reader active ms':>18}"
+          f"{'book history ms':>17}{'overdue page ms':>17}{'active count ms':>17}{'delete book ms':>16}")
+    for borrows in args.borrows:
+        with tempfile.TemporaryDirectory() as workdir:
+            seed_workdir(workdir, args.books / 1_000_000, args.seed, authors=max(1, args.books // 5),
+                         books=args.books, borrows=borrows, readers=args.readers)
+            engine = create_engine(f"sqlite:///{os.path.join(workdir, 'library.db')}")
+            with Session(engine) as db:
+                book_id = db.scalar(select(BookStats.book_id).order_by(BookStats.total_loans.desc()).limit(1))
+                reader_id = db.scalar(select(Borrow.reader_id).where(Borrow.return_date.is_(None)).limit(1)) or 1
+                active = db.scalar(select(func.count()).select_from(Borrow).where(Borrow.return_date.is_(None)))
+
+            for mode in ("no archive", "archived"):
+                if mode == "archived":
+                    started = time.perf_counter()
+                    archived = archive_all(sessionmaker(bind=engine), as_of=END_DATE, batch_size=args.batch_size,
+                                           pause=0)
+                    print(f"{'':>10}  archived {archived} loans in {time.perf_counter() - started:.1f}s")
+                with Session(engine) as db:
+                    hot_rows = db.scalar(select(func.count()).select_from(Borrow))
+                timings = measure_queries(engine, book_id, reader_id, args.repeat)
+                print(f"{borrows:>10}{mode:>12}{hot_rows:>10}{active:>8}{timings['reader active']:>18.3f}"
+                      f"{timings['book history']:>17.3f}{timings['overdue page']:>17.3f}"
+                      f"{timings['active count']:>17.3f}{timings['delete book']:>16.3f}")
+            with Session(engine) as db:
+                assert db.scalar(select(func.count()).select_from(BorrowArchive)) == borrows - hot_rows
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
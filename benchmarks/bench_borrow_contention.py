@@ -0,0 +1,112 @@
+"""
+Нагрузочный тест конкурентной выдачи одной популярной книги.
+
+Параллельные потоки выдают одну и ту же книгу через BorrowCRUD.borrow_book
+(условный UPDATE + INSERT в одной транзакции). Для сравнения доступен режим
+--legacy, повторяющий прежнюю схему: чтение остатка, уменьшение в Python,
+коммит, затем вставка записи отдельным коммитом. С --write-queue выдачи
+выполняются через очередь записи с групповой фиксацией (core.write_queue).
+База создается db.seed, а остаток первой книги заменяется на --copies.
+
+Запуск:
+    python -m benchmarks.bench_borrow_contention --attempts 2000 --copies 1500 --threads 32
+    python -m benchmarks.bench_borrow_contention --attempts 2000 --copies 1500 --threads 32 --write-queue
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import seed_workdir
+from core.cruds.borrow import BorrowCRUD
+from core.metrics import metrics
+from core.models.book import Book
+from core.models.borrow import Borrow
+from core.schemas.borrow import BorrowCreate
+from core.write_queue import GroupSession, WriteQueue
+
+
+def legacy_borrow(db, borrow: BorrowCreate):
+    book = db.get(Book, borrow.book_id)
+    if book is None or book.available_copies <= 0:
+        return None
+    book.available_copies -= 1
+    db.commit()
+    return BorrowCRUD.create_borrow(db=db, borrow=borrow)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--attempts", type=int, default=2000)
+    parser.add_argument("--copies", type=int, default=1500)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--legacy", action="store_true", help="Использовать прежнюю схему из двух транзакций")
+    parser.add_argument("--write-queue", action="store_true", help="Выполнять выдачи через очередь записи")
+    parser.add_argument("--scale", type=float, default=0.001, help="Масштаб набора данных db.seed")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_workdir(workdir, args.scale, args.seed)
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'library.db')}", connect_args={"timeout": 60})
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        with factory() as db:
+            db.execute(update(Book).where(Book.id == 1).values(available_copies=args.copies))
+            db.commit()
+            baseline = db.scalar(select(func.count(Borrow.id)))
+
+        borrow_fn = legacy_borrow if args.legacy else BorrowCRUD.borrow_book
+        write_queue = None
+        if args.write_queue:
+            write_queue = WriteQueue(sessionmaker(bind=engine, class_=GroupSession, autoflush=False,
+                                                  expire_on_commit=False)).start()
+        errors = 0
+
+        def attempt(i):
+            nonlocal errors
+            borrow = BorrowCreate(book_id=1, reader_name=f"Reader {i}", borrow_date=date(2023, 1, 1))
+            try:
+                if write_queue is not None:
+                    return write_queue.submit(borrow_fn, borrow=borrow).result() is not None
+                with factory() as db:
+                    return borrow_fn(db, borrow) is not None
+            except OperationalError:
+                errors += 1
+                return False
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            succeeded = sum(pool.map(attempt, range(args.attempts)))
+        elapsed = time.perf_counter() - started
+        if write_queue is not None:
+            write_queue.stop()
+
+        with factory() as db:
+            remaining = db.get(Book, 1).available_copies
+            borrows = db.scalar(select(func.count(Borrow.id))) - baseline
+        engine.dispose()
+
+    mode = "legacy" if args.legacy else "atomic"
+    print(f"mode:              {mode}{' + write queue' if args.write_queue else ''}")
+    print(f"attempts:          {args.attempts} ({args.threads} threads, {args.copies} copies)")
+    print(f"succeeded:         {succeeded}")
+    print(f"lock errors:       {errors}")
+    print(f"borrows/sec:       {succeeded / elapsed:.1f}")
+    if args.write_queue:
+        batches = metrics.write_batch_sizes
+        print(f"write batches:     {batches.count} (avg {batches.sum / max(batches.count, 1):.1f} operations)")
+        waits = metrics.write_queue_waits
+        print(f"avg queue wait ms: {waits.sum / max(waits.count, 1) * 1000:.2f}")
+    print(f"remaining copies:  {remaining}")
+    print(f"borrow rows:       {borrows}")
+    print(f"consistent:        {remaining == args.copies - borrows and remaining >= 0}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Сравнение синхронного и асинхронного режимов работы с базой данных (DB_MODE).
+
+Для каждого режима запускает приложение под uvicorn на отдельной базе из db.seed
+и нагружает его смешанным потоком запросов с заданной конкурентностью.
+
+Запуск:
+    python -m benchmarks.bench_db_modes --requests 5000 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import percentile, run_server, seed_workdir
+from db.seed import SeedCounts
+
+
+def next_request(rng: random.Random, counts: SeedCounts) -> tuple[str, str, dict | None]:
+    roll = rng.random()
+    if roll < 0.8:
+        return "GET", f"/books/{rng.randint(1, counts.books)}", None
+    if roll < 0.9:
+        return "GET", "/authors/?limit=10", None
+    return "POST", "/authors/", {"first_name": "Bench", "last_name": "Author", "birth_date": "1900-01-01"}
+
+
+async def drive(base_url: str, counts: SeedCounts, total: int, concurrency: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    latencies: list[float] = []
+    errors = 0
+    remaining = total
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                method, url, body = next_request(rng, counts)
+                started = time.perf_counter()
+                response = await client.request(method, url, json=body)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scale", type=float, default=0.01, help="Масштаб набора данных db.seed")
+    parser.add_argument("--json", action="store_true", help="Вывести результаты в формате JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as workdir:
+            counts = seed_workdir(workdir, args.scale, args.seed)
+            with run_server(workdir, env={"DB_MODE": mode}) as base_url:
+                # Прогрев: пул соединений и кэш страниц SQLite
+                asyncio.run(drive(base_url, counts, min(500, args.requests), args.concurrency, args.seed))
+                results[mode] = asyncio.run(drive(base_url, counts, args.requests, args.concurrency, args.seed))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<8}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode, result in results.items():
+        print(f"{mode:<8}{result['requests']:>10}{result['errors']:>8}{result['rps']:>10}"
+              f"{result['p50_ms']:>10}{result['p99_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
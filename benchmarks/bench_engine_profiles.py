@@ -0,0 +1,109 @@
+"""
+Сравнение пропускной способности чтения и записи для профилей движка базы данных.
+
+Для каждого профиля из db.profiles и для прежней конфигурации (журнал отката,
+вывод SQL включен, PRAGMA по умолчанию) создается отдельная база из db.seed,
+после чего читатели (чтение книги по идентификатору) и писатели (изменение
+остатка книги) параллельно работают заданное время. Вывод SQL (прежняя
+конфигурация и профиль dev) направляется в /dev/null, поэтому в замер входит
+только стоимость форматирования и логирования запросов.
+
+Запуск:
+    python -m benchmarks.bench_engine_profiles --scale 0.01 --readers 8 --writers 2 --seconds 5
+"""
+import argparse
+import contextlib
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import seed_workdir
+from core.cruds.book import BookCRUD
+from core.models.book import Book
+from db.profiles import PROFILES, apply_pragmas, build_engine
+
+
+def make_engine(name: str, url: str):
+    if name == "legacy":
+        # Прежняя настройка db/database.py; сгенерированная база создается в режиме WAL
+        engine = create_engine(url, echo=True)
+        apply_pragmas(engine, {"journal_mode": "DELETE"})
+        return engine
+    return build_engine(url, PROFILES[name])
+
+
+def run_workload(engine, books: int, readers: int, writers: int, seconds: float) -> tuple[int, int, int]:
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def reader(seed: int):
+        rng = random.Random(seed)
+        done = 0
+        while time.monotonic() < deadline:
+            with factory() as db:
+                BookCRUD.get_book(db=db, book_id=rng.randint(1, books))
+            done += 1
+        with lock:
+            counts["reads"] += done
+
+    def writer(seed: int):
+        rng = random.Random(seed)
+        done = errors = 0
+        while time.monotonic() < deadline:
+            try:
+                with factory() as db:
+                    db.execute(
+                        update(Book)
+                        .where(Book.id == rng.randint(1, books))
+                        .values(available_copies=Book.available_copies + rng.choice((-1, 1)))
+                    )
+                    db.commit()
+                done += 1
+            except Exception:
+                errors += 1
+        with lock:
+            counts["writes"] += done
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts["reads"], counts["writes"], counts["errors"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", default=["legacy", *PROFILES])
+    parser.add_argument("--scale", type=float, default=0.01, help="Масштаб набора данных db.seed")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{'profile':<10}{'reads/s':>12}{'writes/s':>12}{'errors':>8}")
+    # Обработчик вывода SQL создается вместе с первым движком с echo=True и пишет в текущий sys.stdout
+    with open(os.devnull, "w") as devnull:
+        for name in args.profiles:
+            with tempfile.TemporaryDirectory() as workdir:
+                counts = seed_workdir(workdir, args.scale, args.seed)
+                url = f"sqlite:///{os.path.join(workdir, 'library.db')}"
+                with contextlib.redirect_stdout(devnull):
+                    engine = make_engine(name, url)
+                reads, writes, errors = run_workload(engine, counts.books, args.readers, args.writers, args.seconds)
+                engine.dispose()
+            print(f"{name:<10}{reads / args.seconds:>12.0f}{writes / args.seconds:>12.0f}{errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Стоимость формирования ответа списка: ORM-объекты с валидацией схемой и выборка столбцов с orjson.
+
+Прежний путь повторяет обработку ответа FastAPI: ORM-объекты страницы
+валидируются схемой ответа (from_attributes), сериализуются в JSON-совместимые
+данные и кодируются стандартным json. Новый путь - текущие методы CRUD без
+expand и rows_response. Замеры идут на базе из db.seed.
+
+Запуск:
+    python -m benchmarks.bench_list_serialization --pages 500 --limit 100
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import percentile, seed_workdir
+from core.cruds.book import BookCRUD
+from core.cruds.borrow import BorrowCRUD
+from core.models.book import Book as BookModel
+from core.models.borrow import Borrow as BorrowModel
+from core.pagination import paginate
+from core.responses import rows_response
+from core.schemas.book import Book
+from core.schemas.borrow import Borrow
+from db.profiles import PROFILES, build_engine
+
+
+def legacy_page(db, model, crud, schema, skip: int, limit: int) -> bytes:
+    objects = paginate(db.query(model), crud.SORTS, "id", skip, limit).all()
+    content = jsonable_encoder([schema.model_validate(obj) for obj in objects])
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def fast_page(db, crud, skip: int, limit: int) -> bytes:
+    rows = paginate(db.query(*crud.COLUMNS), crud.SORTS, "id", skip, limit).all()
+    return rows_response(rows).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--scale", type=float, default=0.01, help="Масштаб набора данных db.seed")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        counts = seed_workdir(workdir, args.scale, args.seed)
+        engine = build_engine(f"sqlite:///{os.path.join(workdir, 'library.db')}", PROFILES["prod"])
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        cases = {
+            "books": (BookModel, BookCRUD, Book, counts.books),
+            "borrows": (BorrowModel, BorrowCRUD, Borrow, counts.borrows),
+        }
+
+        print(f"{'list':<10}{'path':<10}{'p50 us':>10}{'p99 us':>10}{'mean us':>10}")
+        for name, (model, crud, schema, total) in cases.items():
+            paths = {
+                "legacy": lambda db, skip: legacy_page(db, model, crud, schema, skip, args.limit),
+                "fast": lambda db, skip: fast_page(db, crud, skip, args.limit),
+            }
+            for path, fn in paths.items():
+                rng = random.Random(args.seed)
+                timings = []
+                for _ in range(args.pages):
+                    skip = rng.randrange(max(1, min(total, 10_000) - args.limit))
+                    with factory() as db:
+                        started = time.perf_counter()
+                        fn(db, skip)
+                        timings.append(time.perf_counter() - started)
+                print(f"{name:<10}{path:<10}{percentile(timings, 50) * 1e6:>10.0f}"
+                      f"{percentile(timings, 99) * 1e6:>10.0f}{statistics.mean(timings) * 1e6:>10.0f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Задержка чтения во время массовой загрузки.
+
+Запускает приложение под uvicorn на базе из db.seed (кэш сущностей отключен,
+чтобы каждое чтение шло в базу), измеряет задержку GET-запросов без нагрузки, а затем во время
+загрузки большого NDJSON-файла книг через POST /books/import. Чтение идет
+через пул только для чтения и не должно ждать соединений и блокировок записи.
+
+Запуск:
+    python -m benchmarks.bench_read_during_import --rows 200000 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import threading
+import time
+
+import httpx
+
+from benchmarks.common import percentile, run_server, seed_workdir
+
+
+def ndjson_books(rows: int):
+    for start in range(0, rows, 1000):
+        yield "".join(
+            json.dumps({"title": f"Imported {i}", "author_id": 1, "available_copies": 1}) + "\n"
+            for i in range(start, min(start + 1000, rows))
+        ).encode()
+
+
+async def read_until(base_url: str, books: int, concurrency: int, stop: threading.Event, seed: int) -> dict:
+    rng = random.Random(seed)
+    latencies: list[float] = []
+    errors = 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            nonlocal errors
+            while not stop.is_set():
+                url = f"/books/{rng.randint(1, books)}" if rng.random() < 0.8 else "/books/?limit=10"
+                started = time.perf_counter()
+                response = await client.get(url)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--idle-seconds", type=float, default=5)
+    parser.add_argument("--profile", default="prod")
+    parser.add_argument("--scale", type=float, default=0.01, help="Масштаб набора данных db.seed")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    env = {"DB_PROFILE": args.profile, "CACHE_ENABLED": "0"}
+    with tempfile.TemporaryDirectory() as workdir:
+        counts = seed_workdir(workdir, args.scale, args.seed)
+        with run_server(workdir, env) as base_url:
+            idle, during_import, summary = measure(base_url, counts.books, args)
+
+    print(json.dumps({
+        "profile": args.profile,
+        "idle": idle,
+        "during_import": during_import,
+        "import": {"inserted": summary.get("inserted"), "seconds": summary.get("seconds")},
+    }, indent=2))
+
+
+def measure(base_url: str, books: int, args) -> tuple[dict, dict, dict]:
+    stop = threading.Event()
+    timer = threading.Timer(args.idle_seconds, stop.set)
+    timer.start()
+    idle = asyncio.run(read_until(base_url, books, args.concurrency, stop, seed=1))
+
+    stop.clear()
+    summary = {}
+
+    def run_import():
+        started = time.perf_counter()
+        response = httpx.post(f"{base_url}/books/import", content=ndjson_books(args.rows),
+                              headers={"Content-Type": "application/x-ndjson"}, timeout=None)
+        summary.update(response.json(), seconds=round(time.perf_counter() - started, 2))
+        stop.set()
+
+    importer = threading.Thread(target=run_import)
+    importer.start()
+    during_import = asyncio.run(read_until(base_url, books, args.concurrency, stop, seed=2))
+    importer.join()
+    return idle, during_import, summary
+
+
+if __name__ == "__main__":
+    main()
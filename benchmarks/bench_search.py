@@ -0,0 +1,83 @@
+"""
+Сравнение полнотекстового поиска FTS5 с поиском LIKE '%...%' по синтетическому каталогу.
+
+Создает базу из db.seed с заданным количеством книг (по умолчанию 1 000 000), затем для
+нескольких слов разной частоты измеряет время поиска первой страницы через
+BookCRUD.search_books и через LIKE по названию и описанию, а также время
+подсчета всех совпадений обоими способами.
+
+Запуск:
+    python -m benchmarks.bench_search --books 1000000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func, literal_column, or_, select
+from sqlalchemy.orm import Session
+
+from benchmarks.common import seed_workdir
+from core.cruds.book import BookCRUD, build_match_query
+from core.models.book import Book, book_fts
+from db.seed import make_vocabulary
+
+
+def measure(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Частоты слов в названиях и описаниях убывают по закону Ципфа, как в реальных текстах
+    vocabulary = make_vocabulary(args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        started = time.perf_counter()
+        # Выдачи для поиска не нужны
+        seed_workdir(workdir, args.books / 1_000_000, args.seed, books=args.books, borrows=0)
+        print(f"seeded {args.books} books in {time.perf_counter() - started:.1f}s")
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'library.db')}")
+
+        # Частое, среднее и редкое слово, а также поиск по префиксу. Ранжированный поиск
+        # должен просмотреть все совпадения, поэтому рядом приведено время подсчета всех
+        # совпадений: столько же стоил бы LIKE с сортировкой по релевантности.
+        terms = [vocabulary[0], vocabulary[100], vocabulary[10000], vocabulary[5][:3] + "*"]
+        print(f"{'query':<12}{'matches':>10}{'fts top ms':>12}{'like first ms':>15}"
+              f"{'fts all ms':>12}{'like all ms':>13}")
+        with Session(engine) as db:
+            for term in terms:
+                pattern = f"%{term.rstrip('*')}%"
+                like_where = or_(Book.title.like(pattern), Book.description.like(pattern))
+                like_first = select(Book).where(like_where).limit(args.limit)
+                like_all = select(func.count()).select_from(Book).where(like_where)
+                fts_all = (
+                    select(func.count())
+                    .select_from(book_fts)
+                    .where(literal_column("book_fts").op("MATCH")(build_match_query(term)))
+                )
+
+                matches = db.scalar(fts_all)
+                fts_top_ms = measure(lambda: BookCRUD.search_books(db=db, q=term, limit=args.limit), args.repeat)
+                like_first_ms = measure(lambda: db.scalars(like_first).all(), args.repeat)
+                fts_all_ms = measure(lambda: db.scalar(fts_all), args.repeat)
+                like_all_ms = measure(lambda: db.scalar(like_all), args.repeat)
+                print(f"{term:<12}{matches:>10}{fts_top_ms:>12.2f}{like_first_ms:>15.2f}"
+                      f"{fts_all_ms:>12.2f}{like_all_ms:>13.2f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
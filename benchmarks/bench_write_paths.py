@@ -0,0 +1,110 @@
+"""
+Задержка создания и обновления записей: прежний путь через ORM и INSERT/UPDATE ... RETURNING.
+
+Прежний путь воспроизводит реализацию до перехода на RETURNING: создание через
+add + commit + refresh, обновление через SELECT, изменение атрибутов, commit и
+refresh. Новый путь - текущие методы AuthorCRUD и BookCRUD. В обоих случаях
+результат сериализуется схемой ответа, как это делает эндпоинт. Замеры идут на
+базе из db.seed.
+
+Запуск:
+    python -m benchmarks.bench_write_paths --operations 2000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import percentile, seed_workdir
+from core.cruds.author import AuthorCRUD
+from core.cruds.book import BookCRUD
+from core.models.author import Author as AuthorModel
+from core.models.book import Book as BookModel
+from core.schemas.author import Author, AuthorCreate
+from core.schemas.book import Book, BookCreate, BookUpdate
+from db.profiles import PROFILES, build_engine
+
+
+def legacy_create_author(db, author: AuthorCreate):
+    db_author = AuthorModel(**author.model_dump())
+    db.add(db_author)
+    db.commit()
+    db.refresh(db_author)
+    return db_author
+
+
+def legacy_create_book(db, book: BookCreate):
+    db_book = BookModel(**book.model_dump())
+    db.add(db_book)
+    db.commit()
+    db.refresh(db_book)
+    return db_book
+
+
+def legacy_update_book(db, book_id: int, book: BookUpdate):
+    db_book = db.query(BookModel).filter(BookModel.id == book_id).first()
+    if db_book:
+        for key, value in book.model_dump(exclude_unset=True).items():
+            setattr(db_book, key, value)
+        db.commit()
+        db.refresh(db_book)
+    return db_book
+
+
+IMPLEMENTATIONS = {
+    "legacy": (legacy_create_author, legacy_create_book, legacy_update_book),
+    "returning": (
+        lambda db, author: AuthorCRUD.create_author(db=db, author=author),
+        lambda db, book: BookCRUD.create_book(db=db, book=book),
+        lambda db, book_id, book: BookCRUD.update_book(db=db, book_id=book_id, book=book),
+    ),
+}
+
+
+def measure(factory, fn, operations: int) -> list[float]:
+    timings = []
+    for i in range(operations):
+        with factory() as db:
+            started = time.perf_counter()
+            fn(db, i)
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--profile", default="prod")
+    parser.add_argument("--scale", type=float, default=0.01, help="Масштаб набора данных db.seed")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'implementation':<16}{'operation':<16}{'p50 us':>10}{'p99 us':>10}{'mean us':>10}")
+    for name, (create_author, create_book, update_book) in IMPLEMENTATIONS.items():
+        with tempfile.TemporaryDirectory() as workdir:
+            counts = seed_workdir(workdir, args.scale, args.seed)
+            engine = build_engine(f"sqlite:///{os.path.join(workdir, 'library.db')}", PROFILES[args.profile])
+            factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+            author = AuthorCreate(first_name="Bench", last_name="Author", birth_date="1900-01-01")
+            operations = {
+                "POST author": lambda db, i: Author.model_validate(create_author(db, author)),
+                "POST book": lambda db, i: Book.model_validate(
+                    create_book(db, BookCreate(title=f"Book {i}", author_id=1, available_copies=1))
+                ),
+                "PUT book": lambda db, i: Book.model_validate(
+                    update_book(db, i % counts.books + 1, BookUpdate(title=f"Book {i} v2", author_id=1, available_copies=2))
+                ),
+            }
+            for operation, fn in operations.items():
+                timings = measure(factory, fn, args.operations)
+                print(f"{name:<16}{operation:<16}{percentile(timings, 50) * 1e6:>10.0f}"
+                      f"{percentile(timings, 99) * 1e6:>10.0f}{statistics.mean(timings) * 1e6:>10.0f}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
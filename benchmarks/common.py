@@ -0,0 +1,93 @@
+import contextlib
+import dataclasses
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Iterator, Optional
+
+import httpx
+
+from db.seed import SeedCounts, seed_file
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    """
+    Возвращает свободный TCP-порт на localhost.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed_workdir(workdir: str, scale: float, seed: int = 42, **counts: int) -> SeedCounts:
+    """
+    Создает в workdir файл library.db с синтетическими данными из db.seed.
+
+    Все бенчмарки работают с этим набором, чтобы результаты были сопоставимы
+    и воспроизводимы.
+
+    Args:
+        workdir (str): Рабочая директория бенчмарка.
+        scale (float): Масштаб набора данных (1.0 - 1 000 000 книг).
+        seed (int): Начальное значение генератора.
+        **counts (int): Явные количества authors, books, borrows или readers вместо вычисленных по масштабу.
+
+    Returns:
+        SeedCounts: Фактические размеры набора данных.
+    """
+    seed_counts = dataclasses.replace(SeedCounts.for_scale(scale), **counts)
+    seed_file(os.path.join(workdir, "library.db"), seed_counts, seed)
+    return seed_counts
+
+
+def percentile(values: list[float], p: float) -> float:
+    """
+    Возвращает перцентиль p (0..100) по методу ближайшего ранга.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+@contextlib.contextmanager
+def run_server(workdir: str, env: Optional[dict] = None, workers: int = 1) -> Iterator[str]:
+    """
+    Запускает приложение под uvicorn в отдельном процессе и возвращает его базовый URL.
+
+    База данных создается в workdir, так как путь к library.db по умолчанию относительный.
+
+    Args:
+        workdir (str): Рабочая директория процесса сервера.
+        env (Optional[dict]): Дополнительные переменные окружения.
+        workers (int): Количество процессов uvicorn.
+    """
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", ROOT_DIR, "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=workdir, env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            try:
+                httpx.get(f"{base_url}/authors/", timeout=1)
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("uvicorn did not start in time")
+                time.sleep(0.1)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
@@ -0,0 +1,352 @@
+"""
+Нагрузочное тестирование HTTP API.
+
+Запускает приложение под uvicorn на базе из db.seed и по очереди выполняет
+сценарии нагрузки:
+
+- browse: просмотр каталога (книга и автор по идентификатору, списки, книги
+  автора, поиск, список книг с авторами);
+- borrow: чтение книг вперемешку с сериями выдач и возвратов;
+- pagination: глубокий проход по выдачам курсором и по смещению.
+
+Для каждого эндпоинта записываются количество запросов, ошибки, пропускная
+способность и задержки p50/p95/p99. Результаты сохраняются в JSON, а режим
+compare сравнивает два файла результатов и завершается с кодом 1, если
+пропускная способность упала или задержка выросла больше порога.
+
+Запуск:
+    python -m benchmarks.loadtest run --scale 0.01 --seconds 10 --output results.json
+    python -m benchmarks.loadtest compare baseline.json results.json --threshold 10
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+
+from benchmarks.common import ROOT_DIR, percentile, run_server, seed_workdir
+from db.seed import SeedCounts, make_vocabulary
+
+# Выдачи в одной серии сценария borrow и доля шагов, начинающих серию
+BURST_SIZE = 5
+BURST_SHARE = 0.3
+# Выдачи идут по первым книгам, чтобы запросы конкурировали за одни и те же строки
+HOT_BOOKS = 200
+PAGE_SIZE = 100
+# Метрики, по которым ищутся регрессии: для rps хуже меньшее значение, для задержек - большее
+COMPARED_METRICS = {"rps": -1, "p50_ms": 1, "p95_ms": 1, "p99_ms": 1}
+
+
+@dataclass
+class Recorder:
+    """
+    Собирает задержки и коды ответа по эндпоинтам.
+
+    Эндпоинт обозначается шаблоном маршрута (например, "GET /books/{id}"), чтобы
+    запросы к разным записям попадали в одну группу.
+    """
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str,
+                      expected: tuple[int, ...] = (200,), **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.latencies[label].append(time.perf_counter() - started)
+            self.errors[label] += 1
+            return None
+        self.latencies[label].append(time.perf_counter() - started)
+        if response.status_code not in expected:
+            self.errors[label] += 1
+        return response
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {label: summarize(values, self.errors[label], elapsed)
+                     for label, values in sorted(self.latencies.items())}
+        everything = list(itertools.chain.from_iterable(self.latencies.values()))
+        return {"total": summarize(everything, sum(self.errors.values()), elapsed), "endpoints": endpoints}
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+class Workload(ABC):
+    """
+    Сценарий нагрузки: каждый виртуальный пользователь повторяет step до окончания замера.
+    """
+    name = ""
+
+    def __init__(self, counts: SeedCounts, seed: int):
+        self.counts = counts
+        self.seed = seed
+
+    def user(self, index: int) -> dict:
+        """
+        Создает состояние виртуального пользователя.
+        """
+        return {"rng": random.Random(f"{self.name}-{self.seed}-{index}")}
+
+    @abstractmethod
+    async def step(self, client: httpx.AsyncClient, recorder: Recorder, user: dict) -> None:
+        """
+        Выполняет один шаг виртуального пользователя и записывает его запросы в recorder.
+        """
+
+
+class BrowseWorkload(Workload):
+    name = "browse"
+
+    def __init__(self, counts: SeedCounts, seed: int):
+        super().__init__(counts, seed)
+        # Частые слова словаря: поиск по ним возвращает полную страницу
+        self.words = make_vocabulary(seed)[:200]
+
+    async def step(self, client, recorder, user):
+        rng = user["rng"]
+        roll = rng.random()
+        if roll < 0.45:
+            await recorder.request(client, "GET /books/{id}", "GET", f"/books/{rng.randint(1, self.counts.books)}")
+        elif roll < 0.55:
+            await recorder.request(client, "GET /authors/{id}", "GET",
+                                   f"/authors/{rng.randint(1, self.counts.authors)}")
+        elif roll < 0.70:
+            # Часть пользователей листает дальше по курсору в том же порядке сортировки
+            params = user.pop("books", None) or {"limit": 20, "order_by": rng.choice(["id", "-id", "title"])}
+            response = await recorder.request(client, "GET /books/", "GET", "/books/", params=params)
+            cursor = response.headers.get("X-Next-Cursor") if response is not None else None
+            if cursor and rng.random() < 0.5:
+                user["books"] = {**params, "after": cursor}
+        elif roll < 0.80:
+            await recorder.request(client, "GET /authors/{id}/books", "GET",
+                                   f"/authors/{rng.randint(1, self.counts.authors)}/books", expected=(200, 404))
+        elif roll < 0.95:
+            await recorder.request(client, "GET /books/search", "GET", "/books/search",
+                                   params={"q": rng.choice(self.words), "limit": 20})
+        else:
+            await recorder.request(client, "GET /books/?expand=author", "GET", "/books/",
+                                   params={"limit": 20, "expand": "author"})
+
+
+class BorrowWorkload(Workload):
+    name = "borrow"
+
+    async def step(self, client, recorder, user):
+        rng = user["rng"]
+        if rng.random() >= BURST_SHARE:
+            book_id = rng.randint(1, self.counts.books)
+            await recorder.request(client, "GET /books/{id}", "GET", f"/books/{book_id}")
+            return
+
+        # Серия выдач популярных книг; все выданные книги в конце серии возвращаются,
+        # поэтому остатки не исчерпываются за время замера. Отказ из-за отсутствия
+        # экземпляров (400) - ожидаемый ответ
+        borrowed = []
+        for _ in range(BURST_SIZE):
+            response = await recorder.request(client, "POST /borrows/", "POST", "/borrows/", expected=(200, 400), json={
+                "book_id": rng.randint(1, min(HOT_BOOKS, self.counts.books)),
+                "reader_name": f"Load {rng.randrange(self.counts.readers):07d}",
+                "borrow_date": "2025-01-10",
+            })
+            if response is not None and response.status_code == 200:
+                borrowed.append(response.json()["id"])
+        for borrow_id in borrowed:
+            await recorder.request(client, "PATCH /borrows/{id}/return", "PATCH", f"/borrows/{borrow_id}/return",
+                                   params={"return_date": "2025-01-20"})
+
+
+class PaginationWorkload(Workload):
+    name = "pagination"
+
+    async def step(self, client, recorder, user):
+        rng = user["rng"]
+        if rng.random() < 0.8:
+            # Курсор: стоимость страницы не зависит от глубины
+            params = {"limit": PAGE_SIZE, "order_by": "-borrow_date"}
+            if user.get("cursor"):
+                params["after"] = user["cursor"]
+            response = await recorder.request(client, "GET /borrows/?after=", "GET", "/borrows/", params=params)
+            user["cursor"] = response.headers.get("X-Next-Cursor") if response is not None else None
+        else:
+            # Смещение: для сравнения, страница из глубины списка
+            skip = rng.randrange(max(1, self.counts.borrows - PAGE_SIZE))
+            await recorder.request(client, "GET /borrows/?skip=", "GET", "/borrows/",
+                                   params={"limit": PAGE_SIZE, "skip": skip, "order_by": "-borrow_date"})
+
+
+WORKLOADS = {workload.name: workload for workload in (BrowseWorkload, BorrowWorkload, PaginationWorkload)}
+
+
+async def drive(base_url: str, workload: Workload, concurrency: int, seconds: float) -> dict:
+    """
+    Выполняет сценарий заданное время с заданным количеством виртуальных пользователей.
+    """
+    recorder = Recorder()
+    deadline = time.monotonic() + seconds
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker(index: int):
+            user = workload.user(index)
+            while time.monotonic() < deadline:
+                await workload.step(client, recorder, user)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return recorder.summary(elapsed)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def run(args) -> dict:
+    env = {"DB_PROFILE": args.profile, "DB_MODE": args.db_mode}
+    if args.no_cache:
+        env["CACHE_ENABLED"] = "0"
+
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "scale": args.scale,
+            "seed": args.seed,
+            "profile": args.profile,
+            "db_mode": args.db_mode,
+            "cache": not args.no_cache,
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "seconds": args.seconds,
+        },
+        "workloads": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.database:
+            # Готовая база копируется, так как сценарии ее изменяют
+            shutil.copyfile(args.database, os.path.join(workdir, "library.db"))
+            counts = SeedCounts.for_scale(args.scale)
+        else:
+            counts = seed_workdir(workdir, args.scale, args.seed)
+        with run_server(workdir, env, workers=args.workers) as base_url:
+            for name in args.workloads:
+                workload = WORKLOADS[name](counts, args.seed)
+                asyncio.run(drive(base_url, workload, args.concurrency, args.warmup))
+                results["workloads"][name] = asyncio.run(drive(base_url, workload, args.concurrency, args.seconds))
+                total = results["workloads"][name]["total"]
+                print(f"{name:<12}{total['rps']:>10.1f} req/s  p50 {total['p50_ms']:.2f} ms  "
+                      f"p99 {total['p99_ms']:.2f} ms  errors {total['errors']}", file=sys.stderr)
+    return results
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> tuple[list[tuple], bool]:
+    """
+    Сравнивает результаты двух прогонов по эндпоинтам.
+
+    Args:
+        baseline (dict): Результаты базового прогона.
+        current (dict): Результаты нового прогона.
+        threshold (float): Допустимое ухудшение метрики в процентах.
+
+    Returns:
+        tuple[list[tuple], bool]: Строки сравнения (сценарий, эндпоинт, метрика, было,
+            стало, изменение в процентах, регрессия) и признак наличия регрессий.
+    """
+    rows = []
+    for name, workload in current["workloads"].items():
+        base_workload = baseline["workloads"].get(name)
+        if base_workload is None:
+            continue
+        groups = {"total": (base_workload["total"], workload["total"])}
+        for label, stats in workload["endpoints"].items():
+            if label in base_workload["endpoints"]:
+                groups[label] = (base_workload["endpoints"][label], stats)
+        for label, (before, after) in groups.items():
+            for metric, direction in COMPARED_METRICS.items():
+                change = (after[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+                rows.append((name, label, metric, before[metric], after[metric], round(change, 1),
+                             change * direction > threshold))
+    return rows, any(row[-1] for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Выполнить сценарии и сохранить результаты")
+    run_parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS), default=list(WORKLOADS))
+    run_parser.add_argument("--scale", type=float, default=0.01, help="Масштаб набора данных db.seed")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--database", help="Готовая база db.seed, созданная с теми же --scale и --seed")
+    run_parser.add_argument("--profile", default="prod", help="Профиль движка DB_PROFILE")
+    run_parser.add_argument("--db-mode", default="sync", choices=["sync", "async"])
+    run_parser.add_argument("--no-cache", action="store_true", help="Отключить кэш сущностей")
+    run_parser.add_argument("--workers", type=int, default=1, help="Количество процессов uvicorn")
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    run_parser.add_argument("--seconds", type=float, default=10, help="Длительность замера каждого сценария")
+    run_parser.add_argument("--warmup", type=float, default=2, help="Прогрев перед замером каждого сценария")
+    run_parser.add_argument("--output", help="Файл результатов JSON; по умолчанию вывод в stdout")
+
+    compare_parser = commands.add_parser("compare", help="Сравнить два файла результатов")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=10, help="Допустимое ухудшение, %%")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = json.dumps(run(args), indent=2)
+        if args.output:
+            with open(args.output, "w") as file:
+                file.write(results + "\n")
+        else:
+            print(results)
+        return
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    rows, regressed = compare(baseline, current, args.threshold)
+    print(f"{'workload':<12}{'endpoint':<32}{'metric':<8}{'before':>10}{'after':>10}{'change':>9}")
+    for name, label, metric, before, after, change, regression in rows:
+        flag = "  REGRESSION" if regression else ""
+        print(f"{name:<12}{label:<32}{metric:<8}{before:>10}{after:>10}{change:>+8.1f}%{flag}")
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
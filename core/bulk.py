@@ -0,0 +1,296 @@
+import csv
+import json
+from typing import AsyncIterator, Iterable, Iterator, Optional
+
+import anyio.from_thread
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from core.cruds.bulk import BulkCRUD
+from core.models.base import Base
+from core.schemas.bulk import ImportRowError, ImportSummary
+
+# Размер пачки для одного executemany и одной транзакции
+IMPORT_CHUNK_SIZE = 1000
+# Максимальная длина одной строки загрузки
+MAX_LINE_BYTES = 1024 * 1024
+# Максимальное количество ошибок, возвращаемых в ответе
+MAX_REPORTED_ERRORS = 100
+
+CONTENT_TYPES = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+}
+
+
+def detect_format(content_type: Optional[str], fmt: Optional[str] = None) -> str:
+    """
+    Определяет формат загрузки по параметру format или заголовку Content-Type.
+
+    Args:
+        content_type (Optional[str]): Значение заголовка Content-Type.
+        fmt (Optional[str]): Явно указанный формат ("ndjson" или "csv").
+
+    Returns:
+        str: "ndjson" или "csv".
+
+    Raises:
+        ValueError: Если формат не поддерживается.
+    """
+    if fmt is not None:
+        if fmt not in ("ndjson", "csv"):
+            raise ValueError(f"Unsupported format: {fmt}")
+        return fmt
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if not media_type:
+        return "ndjson"
+    if media_type not in CONTENT_TYPES:
+        raise ValueError(f"Unsupported content type: {media_type}")
+    return CONTENT_TYPES[media_type]
+
+
+def iter_body(chunks: AsyncIterator[bytes]) -> Iterator[bytes]:
+    """
+    Синхронный итератор по телу запроса для рабочего потока.
+
+    Каждая порция читается в цикле событий через anyio.from_thread, поэтому функцию
+    можно вызывать только из потока, запущенного run_in_threadpool.
+
+    Args:
+        chunks (AsyncIterator[bytes]): Поток тела запроса.
+
+    Yields:
+        bytes: Очередная порция тела.
+    """
+    while True:
+        chunk = anyio.from_thread.run(_next_chunk, chunks)
+        if chunk is None:
+            return
+        yield chunk
+
+
+async def _next_chunk(chunks: AsyncIterator[bytes]) -> Optional[bytes]:
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[tuple[int, Optional[str], Optional[str]]]:
+    """
+    Разбивает поток байтов на строки, не накапливая в памяти больше одной строки.
+
+    Строки возвращаются вместе с переводом строки: по нему csv.reader отличает
+    перевод строки внутри поля в кавычках от конца строки.
+
+    Args:
+        chunks (Iterable[bytes]): Поток тела запроса.
+
+    Yields:
+        tuple[int, Optional[str], Optional[str]]: Номер строки, текст строки и описание ошибки.
+    """
+    buffer = bytearray()
+    line_no = 0
+    skipping = False
+    for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end == -1:
+                if not skipping:
+                    buffer += chunk[start:]
+                    if len(buffer) > MAX_LINE_BYTES:
+                        # Остаток слишком длинной строки пропускаем до ближайшего перевода строки
+                        buffer.clear()
+                        skipping = True
+                break
+            line_no += 1
+            if skipping:
+                skipping = False
+                yield line_no, None, "Line is too long"
+            else:
+                buffer += chunk[start:end + 1]
+                yield _decode_line(line_no, buffer)
+                buffer.clear()
+            start = end + 1
+    if skipping:
+        yield line_no + 1, None, "Line is too long"
+    elif buffer:
+        yield _decode_line(line_no + 1, buffer)
+
+
+def _decode_line(line_no: int, raw: bytearray) -> tuple[int, Optional[str], Optional[str]]:
+    try:
+        text = raw.decode("utf-8-sig" if line_no == 1 else "utf-8")
+    except UnicodeDecodeError:
+        return line_no, None, "Line is not valid UTF-8"
+    return line_no, text, None
+
+
+class _LineError(Exception):
+    pass
+
+
+class _CsvLines:
+    """
+    Итератор строк для csv.reader.
+
+    Строка с ошибкой (слишком длинная, не UTF-8) передается исключением _LineError:
+    csv.reader пробрасывает его из next() и продолжает разбор со следующей строки.
+    """
+
+    def __init__(self, lines: Iterator[tuple[int, Optional[str], Optional[str]]]):
+        self.lines = lines
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        _, text, error = next(self.lines)
+        if error is not None:
+            raise _LineError(error)
+        return text
+
+
+def iter_records(chunks: Iterable[bytes], fmt: str) -> Iterator[tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Разбирает поток NDJSON или CSV (с заголовком в первой записи) в словари.
+
+    Для NDJSON номер - номер строки. CSV разбирается csv.reader по всему потоку,
+    поэтому поле в кавычках может содержать переводы строк; номер - номер записи,
+    заголовок считается записью 1, пустые строки не считаются.
+
+    Args:
+        chunks (Iterable[bytes]): Поток тела запроса.
+        fmt (str): "ndjson" или "csv".
+
+    Yields:
+        tuple[int, Optional[dict], Optional[str]]: Номер строки или записи, данные и описание ошибки.
+    """
+    if fmt == "ndjson":
+        for line_no, line, error in iter_lines(chunks):
+            if error is not None:
+                yield line_no, None, error
+                continue
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line_no, None, "Expected a JSON object"
+                continue
+            yield line_no, row, None
+        return
+
+    reader = csv.reader(_CsvLines(iter_lines(chunks)))
+    header = None
+    record_no = 0
+    while True:
+        try:
+            values = next(reader)
+        except StopIteration:
+            break
+        except (_LineError, csv.Error) as e:
+            record_no += 1
+            yield record_no, None, str(e)
+            continue
+        if not "".join(values).strip():
+            continue
+        record_no += 1
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield record_no, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        # Пустое значение в CSV означает отсутствие значения
+        yield record_no, {name: value if value != "" else None for name, value in zip(header, values)}, None
+
+
+class BulkImporter:
+    """
+    Потоковая загрузка строк в таблицу пачками executemany.
+
+    Каждая строка проверяется Pydantic-схемой *Create. Разбор и запись выполняются
+    в рабочем потоке: корректные строки накапливаются в пачку по IMPORT_CHUNK_SIZE,
+    и только прочитанная целиком пачка вставляется и фиксируется отдельной
+    транзакцией. Пока транзакция открыта, тело запроса не читается, поэтому
+    медленный клиент не удерживает блокировку записи SQLite. В памяти одновременно
+    находится не больше одной пачки, поэтому объем загрузки не ограничен.
+    """
+
+    def __init__(self, db: Session, model: type[Base], schema: type[BaseModel]):
+        self.db = db
+        self.model = model
+        self.schema = schema
+        self.summary = ImportSummary()
+        self._rows: list[dict] = []
+        self._first_line = 0
+        self._last_line = 0
+
+    async def run(self, chunks: AsyncIterator[bytes], fmt: str) -> ImportSummary:
+        """
+        Загружает все строки из потока и возвращает сводку.
+
+        Args:
+            chunks (AsyncIterator[bytes]): Поток тела запроса.
+            fmt (str): "ndjson" или "csv".
+
+        Returns:
+            ImportSummary: Количество вставленных и отклоненных строк и первые ошибки.
+        """
+        return await run_in_threadpool(self.load, iter_body(chunks), fmt)
+
+    def load(self, chunks: Iterable[bytes], fmt: str) -> ImportSummary:
+        """
+        Синхронная версия run для потока байтов.
+        """
+        for line_no, row, error in iter_records(chunks, fmt):
+            if error is None:
+                try:
+                    item = self.schema.model_validate(row)
+                except ValidationError as e:
+                    error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            if error is not None:
+                self._fail(line_no, 1, error)
+                continue
+
+            if not self._rows:
+                self._first_line = line_no
+            self._last_line = line_no
+            self._rows.append(item.model_dump())
+            if len(self._rows) >= IMPORT_CHUNK_SIZE:
+                self._write()
+
+        if self._rows:
+            self._write()
+        return self.summary
+
+    def _write(self) -> None:
+        # Пачка уже прочитана и проверена: транзакция открывается и фиксируется без ожидания клиента
+        rows, self._rows = self._rows, []
+        try:
+            BulkCRUD.insert_rows(self.db, self.model, rows)
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            reason = str(getattr(e, "orig", None) or e)
+            self._fail(self._first_line, len(rows),
+                       f"Lines {self._first_line}-{self._last_line} were not inserted: {reason}")
+        else:
+            self.summary.inserted += len(rows)
+
+    def _fail(self, line_no: int, count: int, error: str) -> None:
+        self.summary.failed += count
+        if len(self.summary.errors) < MAX_REPORTED_ERRORS:
+            self.summary.errors.append(ImportRowError(line=line_no, error=error))
+        else:
+            self.summary.errors_truncated = True
@@ -0,0 +1,218 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Protocol
+
+from pydantic import BaseModel
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1") == "1"
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "10000"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+
+
+class CacheBackend(Protocol):
+    """
+    Интерфейс хранилища кэша. Значения должны быть сериализованными данными, а не ORM-объектами.
+    """
+
+    def get(self, key: Hashable) -> Optional[Any]: ...
+
+    def set(self, key: Hashable, value: Any) -> None: ...
+
+    def delete(self, key: Hashable) -> None: ...
+
+    def clear(self) -> None: ...
+
+    def stats(self) -> dict: ...
+
+
+class LRUCache:
+    """
+    Потокобезопасный LRU-кэш в памяти процесса с ограничением размера и временем жизни записей.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+
+class NullCache:
+    """
+    Хранилище-заглушка для отключенного кэша.
+    """
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        pass
+
+    def delete(self, key: Hashable) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "size": 0, "maxsize": 0}
+
+
+class EntityCache:
+    """
+    Read-through кэш сущностей по (вид, идентификатор) поверх заменяемого хранилища.
+
+    Каждая инвалидация увеличивает счетчик поколений. Загруженное из базы значение
+    кладется в кэш, только если за время загрузки не было ни одной инвалидации,
+    поэтому чтение, начавшееся до записи, не может вернуть в кэш устаревшие данные.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, kind: str, entity_id: int, loader: Callable[[], Optional[dict]]) -> Optional[dict]:
+        """
+        Возвращает данные сущности из кэша или загружает их и кладет в кэш.
+
+        Args:
+            kind (str): Вид сущности ("book", "author", "borrow").
+            entity_id (int): Идентификатор сущности.
+            loader (Callable[[], Optional[dict]]): Загрузка данных из базы; None, если сущность не найдена.
+
+        Returns:
+            Optional[dict]: Данные сущности или None, если она не найдена.
+        """
+        key = (kind, entity_id)
+        value = self.backend.get(key)
+        if value is not None:
+            return value
+        generation = self._generation
+        value = loader()
+        self._store(key, value, generation)
+        return value
+
+    def _store(self, key: tuple, value: Optional[dict], generation: int) -> None:
+        if value is None:
+            return
+        with self._lock:
+            if generation == self._generation:
+                self.backend.set(key, value)
+
+    def invalidate(self, kind: str, entity_id: int) -> None:
+        """
+        Удаляет сущность из кэша.
+
+        Args:
+            kind (str): Вид сущности.
+            entity_id (int): Идентификатор сущности.
+        """
+        with self._lock:
+            self._generation += 1
+            self.backend.delete((kind, entity_id))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+
+entity_cache = EntityCache(LRUCache(CACHE_MAXSIZE, CACHE_TTL) if CACHE_ENABLED else NullCache())
+
+
+def to_payload(schema: type[BaseModel], obj: Any) -> Optional[dict]:
+    """
+    Сериализует ORM-объект в данные ответа для хранения в кэше.
+
+    Args:
+        schema (type[BaseModel]): Pydantic-схема ответа.
+        obj (Any): ORM-объект или None.
+
+    Returns:
+        Optional[dict]: JSON-совместимые данные или None.
+    """
+    if obj is None:
+        return None
+    return schema.model_validate(obj).model_dump(mode="json")
+
+
+def invalidate_on_commit(db: Session, kind: str, entity_id: int) -> None:
+    """
+    Откладывает инвалидацию сущности до успешного коммита текущей транзакции сессии.
+
+    Инвалидация до коммита позволила бы параллельному чтению снова положить в кэш
+    старые данные, а после отката она не нужна.
+
+    Args:
+        db (Session): Сессия базы данных, в которой изменяется сущность.
+        kind (str): Вид сущности.
+        entity_id (int): Идентификатор сущности.
+    """
+    db.info.setdefault("cache_invalidations", set()).add((kind, entity_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session: Session) -> None:
+    for kind, entity_id in session.info.pop("cache_invalidations", ()):
+        entity_cache.invalidate(kind, entity_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session: Session) -> None:
+    session.info.pop("cache_invalidations", None)
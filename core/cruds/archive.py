@@ -0,0 +1,68 @@
+import os
+from datetime import date, timedelta
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+from core.models.borrow import Borrow as BorrowModel, BorrowArchive
+from core.cruds.bulk import id_chunks
+
+# Возвращенные выдачи старше этого числа дней переносятся в архив
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+# Число выдач, переносимых одной транзакцией: блокировка записи удерживается недолго
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+
+
+class ArchiveCRUD:
+    """
+    Класс для переноса давно возвращенных выдач из borrow в borrow_archive.
+    """
+
+    @staticmethod
+    def archive_cutoff(as_of: date) -> date:
+        """
+        Возвращает дату возврата, начиная с которой выдача на дату as_of еще не архивируется.
+        """
+        return as_of - timedelta(days=ARCHIVE_AFTER_DAYS)
+
+    @staticmethod
+    def archive_returned(db: Session, before: date, limit: int = ARCHIVE_BATCH_SIZE) -> int:
+        """
+        Переносит в архив не более limit выдач, возвращенных раньше даты before, одной транзакцией.
+
+        Выдачи выбираются от самых давних по частичному индексу возвращенных выдач.
+        INSERT ... SELECT сразу начинает транзакцию записи, поэтому между выбором
+        и удалением строк выдачу не может изменить другой запрос. Счетчики выдач
+        книг при удалении перенесенных строк не уменьшаются (см. BOOK_STATS_DDL).
+
+        Args:
+            db (Session): Сессия базы данных.
+            before (date): Переносятся выдачи с датой возврата раньше этой даты.
+            limit (int, optional): Наибольшее число выдач в пакете. Defaults to ARCHIVE_BATCH_SIZE.
+
+        Returns:
+            int: Количество перенесенных выдач; меньше limit, если подходящих выдач больше нет.
+        """
+        columns = [column.key for column in BorrowArchive.__table__.c]
+        candidates = (
+            select(BorrowModel.id)
+            .where(BorrowModel.return_date.isnot(None), BorrowModel.return_date < before)
+            .order_by(BorrowModel.return_date, BorrowModel.id)
+            .limit(limit)
+        )
+        archived_ids = db.scalars(
+            insert(BorrowArchive)
+            .from_select(columns, select(*(BorrowModel.__table__.c[key] for key in columns))
+                         .where(BorrowModel.id.in_(candidates)))
+            .returning(BorrowArchive.id)
+        ).all()
+        if not archived_ids:
+            db.rollback()
+            return 0
+        for chunk in id_chunks(archived_ids):
+            db.execute(
+                delete(BorrowModel).where(BorrowModel.id.in_(chunk)).execution_options(synchronize_session=False)
+            )
+        # Кэш записей о выдаче не сбрасывается: GET /borrows/{id} находит выдачу в архиве с теми же данными
+        db.commit()
+        return len(archived_ids)
+
@@ -1,8 +1,16 @@
+from sqlalchemy import Row, delete, insert, select, update
 from sqlalchemy.orm import Session
-from typing import Type, Optional
+from typing import Type, Optional, Sequence, Union
 from core.models.author import Author as AuthorModel, Author
+from core.models.book import Book as BookModel
+from core.cache import invalidate_on_commit
+from core.cruds.bulk import BulkCRUD, id_chunks
+from core.etag import PreconditionFailed, claim_version
+from core.expand import apply_expand
+from core.pagination import SortKey, paginate
+from core.responses import schema_columns
 
-from core.schemas.author import AuthorCreate, AuthorUpdate
+from core.schemas.author import Author as AuthorSchema, AuthorCreate, AuthorUpdate
 
 
 class AuthorCRUD:
@@ -10,22 +18,41 @@ class AuthorCRUD:
     Класс для управления данными авторов в базе данных.
     """
 
+    # Допустимые порядки сортировки для пагинации; каждому соответствует индекс
+    SORTS = {
+        "id": SortKey(AuthorModel.id),
+        "-id": SortKey(AuthorModel.id, descending=True),
+        "last_name": SortKey(AuthorModel.last_name, AuthorModel.id),
+    }
+
+    # Связи, которые можно загрузить вместе со списком через параметр expand
+    RELATIONS = {
+        "books": AuthorModel.books,
+    }
+
+    # Столбцы схемы ответа: списки без связей выбираются кортежами, без создания ORM-объектов
+    COLUMNS = schema_columns(AuthorModel, AuthorSchema)
+    # Столбцы для ETag страницы: проверка If-None-Match не читает остальные поля
+    VERSION_COLUMNS = (AuthorModel.id, AuthorModel.version)
+
     @staticmethod
-    def create_author(db: Session, author: AuthorCreate) -> AuthorModel:
+    def create_author(db: Session, author: AuthorCreate) -> Row:
         """
         Создает нового автора в базе данных.
 
+        Строка ответа возвращается тем же INSERT ... RETURNING, без повторного чтения.
+
         Args:
             db (Session): Сессия базы данных.
             author (AuthorCreate): Данные нового автора.
 
         Returns:
-            AuthorModel: Объект созданного автора.
+            Row: Строка созданного автора.
         """
-        db_author = AuthorModel(**author.model_dump())
-        db.add(db_author)
+        db_author = db.execute(
+            insert(AuthorModel).values(**author.model_dump()).returning(*AuthorModel.__table__.c)
+        ).one()
         db.commit()
-        db.refresh(db_author)
         return db_author
 
     @staticmethod
@@ -43,61 +70,169 @@ class AuthorCRUD:
         return db.query(AuthorModel).filter(AuthorModel.id == author_id).first()
 
     @staticmethod
-    def get_authors(db: Session, skip: int = 0, limit: int = 10) -> list[Type[Author]]:
+    def get_authors_by_ids(db: Session, author_ids: Sequence[int]) -> list[Row]:
+        """
+        Возвращает авторов по списку идентификаторов.
+
+        Args:
+            db (Session): Сессия базы данных.
+            author_ids (Sequence[int]): Идентификаторы без повторов.
+
+        Returns:
+            list[Row]: Найденные строки со столбцами AuthorCRUD.COLUMNS в произвольном порядке.
+        """
+        return BulkCRUD.get_rows(db, AuthorCRUD.COLUMNS, author_ids)
+
+    @staticmethod
+    def get_author_version(db: Session, author_id: int) -> Optional[int]:
+        """
+        Возвращает версию автора без чтения остальных столбцов.
+
+        Args:
+            db (Session): Сессия базы данных.
+            author_id (int): Идентификатор автора.
+
+        Returns:
+            Optional[int]: Версия автора или None, если автор не найден.
+        """
+        return db.scalar(select(AuthorModel.version).where(AuthorModel.id == author_id))
+
+    @staticmethod
+    def get_authors(db: Session, skip: int = 0, limit: int = 10, after: Optional[str] = None,
+                    order_by: str = "id", expand: Sequence[str] = (),
+                    columns: Sequence = COLUMNS) -> list[Union[Row, Type[Author]]]:
         """
         Возвращает список авторов с возможностью пагинации.
 
+        Поддерживает как skip/limit, так и keyset-пагинацию по курсору `after`,
+        которая не сканирует пропущенные строки. Без expand возвращаются строки
+        со столбцами columns, со связями - ORM-объекты.
+
         Args:
             db (Session): Сессия базы данных.
             skip (int, optional): Количество авторов, которые нужно пропустить. Defaults to 0.
             limit (int, optional): Количество авторов, которые нужно вернуть. Defaults to 10.
+            after (Optional[str], optional): Курсор последней строки предыдущей страницы. Defaults to None.
+            order_by (str, optional): Порядок сортировки, один из AuthorCRUD.SORTS. Defaults to "id".
+            expand (Sequence[str], optional): Связи из AuthorCRUD.RELATIONS, которые нужно загрузить. Defaults to ().
+            columns (Sequence, optional): Выбираемые столбцы без expand. Defaults to AuthorCRUD.COLUMNS.
 
         Returns:
-            list[Type[Author]]: Список авторов.
+            list[Union[Row, Type[Author]]]: Список авторов.
+
+        Raises:
+            ValueError: Если порядок сортировки, связь или курсор некорректны.
         """
-        return db.query(AuthorModel).offset(skip).limit(limit).all()
+        if expand:
+            query = apply_expand(db.query(AuthorModel), AuthorCRUD.RELATIONS, list(expand))
+        else:
+            query = db.query(*columns)
+        return paginate(query, AuthorCRUD.SORTS, order_by, skip, limit, after).all()
 
     @staticmethod
-    def update_author(db: Session, author_id: int, author: AuthorUpdate) -> Type[Author] | None:
+    def update_author(db: Session, author_id: int, author: AuthorUpdate,
+                      versions: Optional[Sequence[int]] = None) -> Row | None:
         """
-        Обновляет данные автора.
+        Обновляет данные автора и увеличивает его версию.
 
         Args:
             db (Session): Сессия базы данных.
             author_id (int): Идентификатор автора.
             author (AuthorUpdate): Данные для обновления.
+            versions (Optional[Sequence[int]], optional): Допустимые текущие версии (If-Match). Defaults to None.
 
         Returns:
-            Type[Author] | None: Объект обновленного автора или None, если автор не найден.
-        """
-        db_author = db.query(AuthorModel).filter(AuthorModel.id == author_id).first()
-        if db_author:
-            for key, value in author.model_dump(exclude_unset=True).items():
-                setattr(db_author, key, value)
-            db.commit()
-            db.refresh(db_author)
+            Row | None: Строка обновленного автора или None, если автор не найден.
+
+        Raises:
+            PreconditionFailed: Если версия автора не входит в versions.
+        """
+        # Один UPDATE ... RETURNING вместо чтения, изменения и повторного чтения строки;
+        # условие на версию проверяется тем же запросом
+        condition = [AuthorModel.id == author_id]
+        if versions is not None:
+            condition.append(AuthorModel.version.in_(versions))
+        db_author = db.execute(
+            update(AuthorModel)
+            .where(*condition)
+            .values(**author.model_dump(exclude_unset=True), version=AuthorModel.version + 1)
+            .returning(*AuthorModel.__table__.c)
+            .execution_options(synchronize_session=False)
+        ).one_or_none()
+        if db_author is None:
+            db.rollback()
+            if versions is not None and db.get(AuthorModel, author_id) is not None:
+                raise PreconditionFailed("Author version does not match If-Match")
+            return None
+        invalidate_on_commit(db, "author", author_id)
+        db.commit()
         return db_author
 
     @staticmethod
-    def delete_author(db: Session, author_id: int) -> Optional[Type[AuthorModel]]:
+    def delete_author(db: Session, author_id: int,
+                      versions: Optional[Sequence[int]] = None) -> Optional[Row]:
         """
         Удаляет автора из базы данных.
 
         Args:
             db (Session): Сессия базы данных.
             author_id (int): Идентификатор автора.
+            versions (Optional[Sequence[int]], optional): Допустимые текущие версии (If-Match). Defaults to None.
 
         Returns:
-            Optional[Type[AuthorModel]]: Объект удаленного автора или None, если автор не найден.
-        """
-        db_author = db.query(AuthorModel).filter(AuthorModel.id == author_id).first()
-        if db_author:
-            # Устанавливаем author_id в None для всех книг, связанных с автором
-            for book in db_author.books:
-                book.author_id = None  # Или можно переназначить на другого автора
-            db.commit()  # Сохраняем изменения в базе данных
-
-            # Теперь удаляем автора
-            db.delete(db_author)
-            db.commit()  # Сохраняем изменения в базе данных
-        return db_author
+            Optional[Row]: Строка удаленного автора или None, если автор не найден.
+
+        Raises:
+            PreconditionFailed: Если версия автора не входит в versions.
+        """
+        if versions is not None and not claim_version(db, AuthorModel, author_id, versions):
+            return None
+        deleted = AuthorCRUD.delete_authors(db=db, author_ids=[author_id])
+        return deleted[0] if deleted else None
+
+    @staticmethod
+    def delete_authors(db: Session, author_ids: Sequence[int]) -> list[Row]:
+        """
+        Удаляет авторов одной транзакцией; их книги остаются без автора.
+
+        Книги отвязываются одним UPDATE, авторы удаляются одним DELETE на каждые
+        ID_CHUNK_SIZE идентификаторов, поэтому количество запросов не зависит от
+        числа книг, а запрос не превышает ограничения SQLite на число параметров.
+        Первый же запрос изменяет данные и берет блокировку записи, а найденных
+        авторов определяет DELETE ... RETURNING, поэтому между проверкой и
+        удалением их не может изменить другой запрос.
+
+        Args:
+            db (Session): Сессия базы данных.
+            author_ids (Sequence[int]): Идентификаторы авторов.
+
+        Returns:
+            list[Row]: Строки удаленных авторов по возрастанию id; ненайденные идентификаторы пропускаются.
+        """
+        book_ids, authors = [], []
+        # Идентификаторы передаются частями по ID_CHUNK_SIZE, в той же транзакции
+        for chunk in id_chunks(list(dict.fromkeys(author_ids))):
+            # Устанавливаем author_id в None для всех книг, связанных с авторами
+            book_ids += db.scalars(
+                update(BookModel)
+                .where(BookModel.author_id.in_(chunk))
+                .values(author_id=None, version=BookModel.version + 1)
+                .returning(BookModel.id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            authors += db.execute(
+                delete(AuthorModel)
+                .where(AuthorModel.id.in_(chunk))
+                .returning(*AuthorModel.__table__.c)
+                .execution_options(synchronize_session=False)
+            ).all()
+        if not authors:
+            db.rollback()
+            return []
+
+        for book_id in book_ids:
+            invalidate_on_commit(db, "book", book_id)
+        for author in authors:
+            invalidate_on_commit(db, "author", author.id)
+        db.commit()
+        return sorted(authors, key=lambda author: author.id)
@@ -1,7 +1,45 @@
+import re
+
+from sqlalchemy import Row, delete, func, insert, literal_column, select, update
 from sqlalchemy.orm import Session
-from typing import Type, Optional
-from core.models.book import Book as BookModel, Book
-from core.schemas.book import BookCreate, BookUpdate
+from typing import Type, Optional, Sequence, Union
+from core.models.book import Book as BookModel, Book, book_fts
+from core.models.borrow import Borrow as BorrowModel, BorrowArchive
+from core.cache import invalidate_on_commit
+from core.cruds.bulk import BulkCRUD, id_chunks
+from core.etag import PreconditionFailed, claim_version
+from core.expand import apply_expand
+from core.pagination import SortKey, encode_cursor, paginate
+from core.responses import schema_columns
+from core.schemas.book import Book as BookSchema, BookCreate, BookUpdate
+
+# Слово поискового запроса; звездочка в конце слова означает поиск по префиксу
+SEARCH_TOKEN = re.compile(r"(\w+)(\*?)")
+
+# Релевантность BM25: совпадение в названии весит больше, чем в описании
+SEARCH_RANK = func.bm25(literal_column("book_fts"), 10.0, 1.0)
+
+
+def build_match_query(q: str) -> str:
+    """
+    Преобразует пользовательский запрос в выражение FTS5 MATCH.
+
+    Каждое слово берется в кавычки, поэтому спецсимволы синтаксиса FTS5 в запросе
+    не интерпретируются. Все слова должны присутствовать в книге.
+
+    Args:
+        q (str): Поисковый запрос, например "war pea*".
+
+    Returns:
+        str: Выражение для MATCH.
+
+    Raises:
+        ValueError: Если в запросе нет ни одного слова.
+    """
+    tokens = [f'"{word}"{star}' for word, star in SEARCH_TOKEN.findall(q)]
+    if not tokens:
+        raise ValueError("Search query is empty")
+    return " ".join(tokens)
 
 
 class BookCRUD:
@@ -9,22 +47,39 @@ class BookCRUD:
     Класс для управления данными книг в базе данных.
     """
 
+    # Допустимые порядки сортировки для пагинации; каждому соответствует индекс
+    SORTS = {
+        "id": SortKey(BookModel.id),
+        "-id": SortKey(BookModel.id, descending=True),
+        "title": SortKey(BookModel.title, BookModel.id),
+    }
+
+    # Связи, которые можно загрузить вместе со списком через параметр expand
+    RELATIONS = {
+        "author": BookModel.author,
+    }
+
+    # Столбцы схемы ответа: списки без связей выбираются кортежами, без создания ORM-объектов
+    COLUMNS = schema_columns(BookModel, BookSchema)
+    # Столбцы для ETag страницы: проверка If-None-Match не читает остальные поля
+    VERSION_COLUMNS = (BookModel.id, BookModel.version)
+
     @staticmethod
-    def create_book(db: Session, book: BookCreate) -> BookModel:
+    def create_book(db: Session, book: BookCreate) -> Row:
         """
         Создает новую книгу в базе данных.
 
+        Строка ответа возвращается тем же INSERT ... RETURNING, без повторного чтения.
+
         Args:
             db (Session): Сессия базы данных.
             book (BookCreate): Данные новой книги.
 
         Returns:
-            BookModel: Объект созданной книги.
+            Row: Строка созданной книги.
         """
-        db_book = BookModel(**book.model_dump())
-        db.add(db_book)
+        db_book = db.execute(insert(BookModel).values(**book.model_dump()).returning(*BookModel.__table__.c)).one()
         db.commit()
-        db.refresh(db_book)
         return db_book
 
     @staticmethod
@@ -42,60 +97,243 @@ class BookCRUD:
         return db.query(BookModel).filter(BookModel.id == book_id).first()
 
     @staticmethod
-    def get_books(db: Session, skip: int = 0, limit: int = 10) -> list[Type[Book]]:
+    def get_books_by_ids(db: Session, book_ids: Sequence[int]) -> list[Row]:
+        """
+        Возвращает книги по списку идентификаторов.
+
+        Args:
+            db (Session): Сессия базы данных.
+            book_ids (Sequence[int]): Идентификаторы без повторов.
+
+        Returns:
+            list[Row]: Найденные строки со столбцами BookCRUD.COLUMNS в произвольном порядке.
+        """
+        return BulkCRUD.get_rows(db, BookCRUD.COLUMNS, book_ids)
+
+    @staticmethod
+    def get_book_version(db: Session, book_id: int) -> Optional[int]:
+        """
+        Возвращает версию книги без чтения остальных столбцов.
+
+        Args:
+            db (Session): Сессия базы данных.
+            book_id (int): Идентификатор книги.
+
+        Returns:
+            Optional[int]: Версия книги или None, если книга не найдена.
+        """
+        return db.scalar(select(BookModel.version).where(BookModel.id == book_id))
+
+    @staticmethod
+    def get_books(db: Session, skip: int = 0, limit: int = 10, after: Optional[str] = None,
+                  order_by: str = "id", expand: Sequence[str] = (),
+                  columns: Sequence = COLUMNS) -> list[Union[Row, Type[Book]]]:
         """
         Возвращает список книг с возможностью пагинации.
 
+        Поддерживает как skip/limit, так и keyset-пагинацию по курсору `after`,
+        которая не сканирует пропущенные строки. Без expand возвращаются строки
+        со столбцами columns, со связями - ORM-объекты.
+
+        Args:
+            db (Session): Сессия базы данных.
+            skip (int, optional): Количество книг, которые нужно пропустить. Defaults to 0.
+            limit (int, optional): Количество книг, которые нужно вернуть. Defaults to 10.
+            after (Optional[str], optional): Курсор последней строки предыдущей страницы. Defaults to None.
+            order_by (str, optional): Порядок сортировки, один из BookCRUD.SORTS. Defaults to "id".
+            expand (Sequence[str], optional): Связи из BookCRUD.RELATIONS, которые нужно загрузить. Defaults to ().
+            columns (Sequence, optional): Выбираемые столбцы без expand. Defaults to BookCRUD.COLUMNS.
+
+        Returns:
+            list[Union[Row, Type[Book]]]: Список книг.
+
+        Raises:
+            ValueError: Если порядок сортировки, связь или курсор некорректны.
+        """
+        if expand:
+            query = apply_expand(db.query(BookModel), BookCRUD.RELATIONS, list(expand))
+        else:
+            query = db.query(*columns)
+        return paginate(query, BookCRUD.SORTS, order_by, skip, limit, after).all()
+
+    @staticmethod
+    def get_author_books(db: Session, author_id: int, skip: int = 0, limit: int = 10, after: Optional[str] = None,
+                         order_by: str = "id", columns: Sequence = COLUMNS) -> list[Row]:
+        """
+        Возвращает список книг автора с возможностью пагинации.
+
         Args:
             db (Session): Сессия базы данных.
+            author_id (int): Идентификатор автора.
             skip (int, optional): Количество книг, которые нужно пропустить. Defaults to 0.
             limit (int, optional): Количество книг, которые нужно вернуть. Defaults to 10.
+            after (Optional[str], optional): Курсор последней строки предыдущей страницы. Defaults to None.
+            order_by (str, optional): Порядок сортировки, один из BookCRUD.SORTS. Defaults to "id".
+            columns (Sequence, optional): Выбираемые столбцы. Defaults to BookCRUD.COLUMNS.
 
         Returns:
-            list[Type[Book]]: Список книг.
+            list[Row]: Строки книг автора.
+
+        Raises:
+            ValueError: Если порядок сортировки неизвестен или курсор некорректен.
         """
-        return db.query(BookModel).offset(skip).limit(limit).all()
+        query = db.query(*columns).filter(BookModel.author_id == author_id)
+        return paginate(query, BookCRUD.SORTS, order_by, skip, limit, after).all()
 
     @staticmethod
-    def update_book(db: Session, book_id: int, book: BookUpdate) -> Type[Book] | None:
+    def update_book(db: Session, book_id: int, book: BookUpdate,
+                    versions: Optional[Sequence[int]] = None) -> Row | None:
         """
-        Обновляет данные книги.
+        Обновляет данные книги и увеличивает ее версию.
 
         Args:
             db (Session): Сессия базы данных.
             book_id (int): Идентификатор книги.
             book (BookUpdate): Данные для обновления.
+            versions (Optional[Sequence[int]], optional): Допустимые текущие версии (If-Match). Defaults to None.
 
         Returns:
-            Type[Book] | None: Объект обновленной книги или None, если книга не найдена.
-        """
-        db_book = db.query(BookModel).filter(BookModel.id == book_id).first()
-        if db_book:
-            for key, value in book.dict(exclude_unset=True).items():
-                setattr(db_book, key, value)
-            db.commit()
-            db.refresh(db_book)
+            Row | None: Строка обновленной книги или None, если книга не найдена.
+
+        Raises:
+            PreconditionFailed: Если версия книги не входит в versions.
+        """
+        # Один UPDATE ... RETURNING вместо чтения, изменения и повторного чтения строки;
+        # условие на версию проверяется тем же запросом
+        condition = [BookModel.id == book_id]
+        if versions is not None:
+            condition.append(BookModel.version.in_(versions))
+        db_book = db.execute(
+            update(BookModel)
+            .where(*condition)
+            .values(**book.model_dump(exclude_unset=True), version=BookModel.version + 1)
+            .returning(*BookModel.__table__.c)
+            .execution_options(synchronize_session=False)
+        ).one_or_none()
+        if db_book is None:
+            db.rollback()
+            if versions is not None and db.get(BookModel, book_id) is not None:
+                raise PreconditionFailed("Book version does not match If-Match")
+            return None
+        invalidate_on_commit(db, "book", book_id)
+        db.commit()
         return db_book
 
     @staticmethod
-    def delete_book(db: Session, book_id: int) -> Optional[Type[Book]] | None:
+    def delete_book(db: Session, book_id: int,
+                    versions: Optional[Sequence[int]] = None) -> Optional[Row]:
         """
         Удаляет книгу из базы данных.
 
         Args:
             db (Session): Сессия базы данных.
             book_id (int): Идентификатор книги.
+            versions (Optional[Sequence[int]], optional): Допустимые текущие версии (If-Match). Defaults to None.
 
         Returns:
-            Optional[Type[Book]] | None: Объект удаленной книги или None, если книга не найдена.
-        """
-        db_book = db.query(BookModel).filter(BookModel.id == book_id).first()
-        if db_book:
-            # Удаляем все записи о выдаче книги
-            for borrow in db_book.borrows:
-                db.delete(borrow)
-            db.commit()
-            # Теперь удаляем книгу
-            db.delete(db_book)
-            db.commit()
-        return db_book
+            Optional[Row]: Строка удаленной книги или None, если книга не найдена.
+
+        Raises:
+            PreconditionFailed: Если версия книги не входит в versions.
+        """
+        if versions is not None and not claim_version(db, BookModel, book_id, versions):
+            return None
+        deleted = BookCRUD.delete_books(db=db, book_ids=[book_id])
+        return deleted[0] if deleted else None
+
+    @staticmethod
+    def delete_books(db: Session, book_ids: Sequence[int]) -> list[Row]:
+        """
+        Удаляет книги вместе с записями об их выдаче (включая архив) одной транзакцией.
+
+        Записи о выдаче удаляются одним DELETE на каждые ID_CHUNK_SIZE идентификаторов
+        без загрузки в сессию, поэтому количество запросов не зависит от длины истории
+        выдач, а запрос не превышает ограничения SQLite на число параметров. Первый же
+        запрос изменяет данные и берет блокировку записи, а найденные книги определяет
+        DELETE ... RETURNING, поэтому между проверкой и удалением их не может
+        изменить другой запрос.
+
+        Args:
+            db (Session): Сессия базы данных.
+            book_ids (Sequence[int]): Идентификаторы книг.
+
+        Returns:
+            list[Row]: Строки удаленных книг по возрастанию id; ненайденные идентификаторы пропускаются.
+        """
+        borrow_ids, books = [], []
+        # Идентификаторы передаются частями по ID_CHUNK_SIZE, в той же транзакции
+        for chunk in id_chunks(list(dict.fromkeys(book_ids))):
+            # Удаляем все записи о выдаче книг, в том числе из архива
+            borrow_ids += db.scalars(
+                delete(BorrowModel)
+                .where(BorrowModel.book_id.in_(chunk))
+                .returning(BorrowModel.id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            borrow_ids += db.scalars(
+                delete(BorrowArchive)
+                .where(BorrowArchive.book_id.in_(chunk))
+                .returning(BorrowArchive.id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            books += db.execute(
+                delete(BookModel)
+                .where(BookModel.id.in_(chunk))
+                .returning(*BookModel.__table__.c)
+                .execution_options(synchronize_session=False)
+            ).all()
+        if not books:
+            db.rollback()
+            return []
+
+        for borrow_id in borrow_ids:
+            invalidate_on_commit(db, "borrow", borrow_id)
+        for book in books:
+            invalidate_on_commit(db, "book", book.id)
+        db.commit()
+        return sorted(books, key=lambda book: book.id)
+
+    @staticmethod
+    def search_books(db: Session, q: str, limit: int = 10,
+                     after: Optional[str] = None) -> tuple[list[Type[Book]], Optional[str]]:
+        """
+        Ищет книги по названию и описанию через полнотекстовый индекс book_fts.
+
+        Результаты упорядочены по релевантности (BM25), страницы выдаются по курсору.
+
+        Args:
+            db (Session): Сессия базы данных.
+            q (str): Поисковый запрос; слово со звездочкой на конце ищется по префиксу.
+            limit (int, optional): Количество книг, которые нужно вернуть. Defaults to 10.
+            after (Optional[str], optional): Курсор последней книги предыдущей страницы. Defaults to None.
+
+        Returns:
+            tuple[list[Type[Book]], Optional[str]]: Список книг и курсор следующей страницы.
+
+        Raises:
+            ValueError: Если запрос пуст или курсор некорректен.
+        """
+        match = build_match_query(q)
+        # Имя порядка включает запрос, чтобы курсор нельзя было применить к другому поиску
+        order_by = f"search:{match}"
+        sorts = {order_by: SortKey(SEARCH_RANK, book_fts.c.rowid)}
+
+        # Ранжирование и отбор страницы выполняются только по индексу FTS,
+        # с таблицей book соединяются лишь строки найденной страницы
+        ranked = paginate(
+            db.query(book_fts.c.rowid, SEARCH_RANK.label("rank"))
+            .filter(literal_column("book_fts").op("MATCH")(match)),
+            sorts, order_by, 0, limit, after,
+        ).subquery()
+        rows = (
+            db.query(BookModel, ranked.c.rank)
+            .join(ranked, ranked.c.rowid == BookModel.id)
+            .order_by(ranked.c.rank, BookModel.id)
+            .all()
+        )
+
+        cursor = None
+        if rows and len(rows) == limit:
+            last_book, last_rank = rows[-1]
+            cursor = encode_cursor(order_by, [last_rank, last_book.id])
+        return [book for book, _ in rows], cursor
@@ -1,7 +1,26 @@
+import heapq
+from collections import Counter, defaultdict
+from datetime import date
+from itertools import islice
+
+from sqlalchemy import Row, case, exists, insert, literal, select, update
 from sqlalchemy.orm import Session
-from typing import Type
-from core.models.borrow import Borrow as BorrowModel, Borrow
-from core.schemas.borrow import BorrowCreate, BorrowUpdate
+from typing import Callable, Type, Optional, Sequence
+from core.models.book import Book as BookModel
+from core.models.borrow import Borrow as BorrowModel, Borrow, BorrowArchive
+from core.models.reader import Reader as ReaderModel
+from core.cache import invalidate_on_commit
+from core.cruds.bulk import BulkCRUD, id_chunks
+from core.cruds.reader import ReaderCRUD
+from core.pagination import SortKey, paginate
+from core.responses import schema_columns
+from core.schemas.borrow import Borrow as BorrowSchema, BorrowCreate, BorrowUpdate
+
+# Результат элемента пакетной операции: строка записи о выдаче или текст ошибки
+BatchOutcome = tuple[Optional[Row], Optional[str]]
+
+# Ошибка корректных элементов пакета, который не применен из-за ошибок в других элементах
+BATCH_NOT_APPLIED = "Batch was not applied because other items failed"
 
 
 class BorrowCRUD:
@@ -9,8 +28,29 @@ class BorrowCRUD:
     Класс для управления данными о выдаче книг в базе данных.
     """
 
+    # Допустимые порядки сортировки для пагинации; каждому соответствует индекс
+    SORTS = {
+        "id": SortKey(BorrowModel.id),
+        "-id": SortKey(BorrowModel.id, descending=True),
+        "borrow_date": SortKey(BorrowModel.borrow_date, BorrowModel.id),
+        "-borrow_date": SortKey(BorrowModel.borrow_date, BorrowModel.id, descending=True),
+    }
+
+    # Те же порядки сортировки для архива выдач
+    ARCHIVE_SORTS = {
+        "id": SortKey(BorrowArchive.id),
+        "-id": SortKey(BorrowArchive.id, descending=True),
+        "borrow_date": SortKey(BorrowArchive.borrow_date, BorrowArchive.id),
+        "-borrow_date": SortKey(BorrowArchive.borrow_date, BorrowArchive.id, descending=True),
+    }
+
+    # Столбцы схемы ответа: списки выбираются кортежами, без создания ORM-объектов
+    COLUMNS = schema_columns(BorrowModel, BorrowSchema)
+    # Столбцы для ETag страницы: проверка If-None-Match не читает остальные поля
+    VERSION_COLUMNS = (BorrowModel.id, BorrowModel.version)
+
     @staticmethod
-    def create_borrow(db: Session, borrow: BorrowCreate) -> BorrowModel:
+    def create_borrow(db: Session, borrow: BorrowCreate) -> Row:
         """
         Создает новую запись о выдаче книги в базе данных.
 
@@ -19,14 +59,36 @@ class BorrowCRUD:
             borrow (BorrowCreate): Данные новой записи о выдаче книги.
 
         Returns:
-            BorrowModel: Объект созданной записи о выдаче книги.
+            Row: Строка созданной записи о выдаче книги.
         """
-        db_borrow = BorrowModel(**borrow.model_dump())
-        db.add(db_borrow)
+        db_borrow = db.execute(
+            insert(BorrowModel).values(**BorrowCRUD.borrow_values(db, borrow)).returning(*BorrowModel.__table__.c)
+        ).one()
         db.commit()
-        db.refresh(db_borrow)
         return db_borrow
 
+    @staticmethod
+    def borrow_values(db: Session, borrow: BorrowCreate, reader_ids: Optional[dict[str, int]] = None) -> dict:
+        """
+        Возвращает значения столбцов новой записи о выдаче; читатель, указанный по имени, находится или создается.
+
+        Args:
+            db (Session): Сессия базы данных.
+            borrow (BorrowCreate): Данные новой записи о выдаче книги.
+            reader_ids (Optional[dict[str, int]], optional): Уже найденные читатели по именам; дополняется.
+                Defaults to None.
+
+        Returns:
+            dict: Значения столбцов таблицы borrow.
+        """
+        values = borrow.model_dump(exclude={"reader_name"})
+        if borrow.reader_name is not None:
+            reader_ids = {} if reader_ids is None else reader_ids
+            if borrow.reader_name not in reader_ids:
+                reader_ids[borrow.reader_name] = ReaderCRUD.get_or_create_reader_id(db, borrow.reader_name)
+            values["reader_id"] = reader_ids[borrow.reader_name]
+        return values
+
     @staticmethod
     def get_borrow(db: Session, borrow_id: int) -> Type[Borrow] | None:
         """
@@ -37,27 +99,175 @@ class BorrowCRUD:
             borrow_id (int): Идентификатор записи о выдаче книги.
 
         Returns:
-            Type[Borrow] | None: Объект записи о выдаче книги или None, если запись не найдена.
+            Type[Borrow] | None: Объект записи о выдаче книги (из borrow или borrow_archive) или None,
+                если запись не найдена.
         """
-        return db.query(BorrowModel).filter(BorrowModel.id == borrow_id).first()
+        return db.query(BorrowModel).filter(BorrowModel.id == borrow_id).first() or db.get(BorrowArchive, borrow_id)
 
     @staticmethod
-    def get_borrows(db: Session, skip: int = 0, limit: int = 10) -> list[Type[Borrow]]:
+    def get_borrows_by_ids(db: Session, borrow_ids: Sequence[int]) -> list[Row]:
+        """
+        Возвращает записи о выдаче книг по списку идентификаторов.
+
+        Args:
+            db (Session): Сессия базы данных.
+            borrow_ids (Sequence[int]): Идентификаторы без повторов.
+
+        Returns:
+            list[Row]: Найденные строки со столбцами BorrowCRUD.COLUMNS в произвольном порядке.
+        """
+        return BulkCRUD.get_rows(db, BorrowCRUD.COLUMNS, borrow_ids)
+
+    @staticmethod
+    def get_borrow_version(db: Session, borrow_id: int) -> Optional[int]:
+        """
+        Возвращает версию записи о выдаче книги без чтения остальных столбцов.
+
+        Args:
+            db (Session): Сессия базы данных.
+            borrow_id (int): Идентификатор записи о выдаче книги.
+
+        Returns:
+            Optional[int]: Версия записи (из borrow или borrow_archive) или None, если запись не найдена.
+        """
+        version = db.scalar(select(BorrowModel.version).where(BorrowModel.id == borrow_id))
+        if version is None:
+            version = db.scalar(select(BorrowArchive.version).where(BorrowArchive.id == borrow_id))
+        return version
+
+    @staticmethod
+    def get_history(db: Session, where: Callable[[type], list], skip: int, limit: int, after: Optional[str],
+                    order_by: str, columns: Sequence, include_archive: bool) -> list[Row]:
+        """
+        Возвращает страницу выдач, отобранных условиями where, при include_archive - вместе с архивом.
+
+        Из borrow и borrow_archive читается по странице с тем же порядком и курсором,
+        страницы сливаются по ключу сортировки. Курсор страницы годится для обеих таблиц,
+        так как идентификаторы выдач в них не пересекаются.
+
+        Args:
+            db (Session): Сессия базы данных.
+            where (Callable[[type], list]): Условия отбора для модели Borrow или BorrowArchive.
+            skip (int): Количество записей, которые нужно пропустить.
+            limit (int): Количество записей, которые нужно вернуть.
+            after (Optional[str]): Курсор последней строки предыдущей страницы.
+            order_by (str): Порядок сортировки, один из BorrowCRUD.SORTS.
+            columns (Sequence): Выбираемые столбцы Borrow.
+            include_archive (bool): Добавить выдачи из архива.
+
+        Returns:
+            list[Row]: Строки записей о выдаче.
+
+        Raises:
+            ValueError: Если порядок сортировки неизвестен или курсор некорректен.
+        """
+        if not include_archive:
+            return paginate(db.query(*columns).filter(*where(BorrowModel)), BorrowCRUD.SORTS, order_by,
+                            skip, limit, after).all()
+        sort_key = BorrowCRUD.SORTS.get(order_by)
+        if sort_key is None:
+            raise ValueError(f"Unknown order_by: {order_by}")
+        # Для слияния в строках нужны столбцы ключа сортировки, даже если они не запрошены
+        keys = list(dict.fromkeys([column.key for column in columns] + [column.key for column in sort_key.columns]))
+        pages = [
+            paginate(db.query(*(model.__table__.c[key] for key in keys)).filter(*where(model)), sorts, order_by,
+                     0, skip + limit, after).all()
+            for model, sorts in ((BorrowModel, BorrowCRUD.SORTS), (BorrowArchive, BorrowCRUD.ARCHIVE_SORTS))
+        ]
+        rows = heapq.merge(*pages, key=sort_key.values, reverse=sort_key.descending)
+        return list(islice(rows, skip, skip + limit))
+
+    @staticmethod
+    def get_borrows(db: Session, skip: int = 0, limit: int = 10, after: Optional[str] = None,
+                    order_by: str = "id", columns: Sequence = COLUMNS) -> list[Row]:
         """
         Возвращает список записей о выдаче книг с возможностью пагинации.
 
+        Поддерживает как skip/limit, так и keyset-пагинацию по курсору `after`,
+        которая не сканирует пропущенные строки.
+
         Args:
             db (Session): Сессия базы данных.
             skip (int, optional): Количество записей о выдаче книг, которые нужно пропустить. Defaults to 0.
             limit (int, optional): Количество записей о выдаче книг, которые нужно вернуть. Defaults to 10.
+            after (Optional[str], optional): Курсор последней строки предыдущей страницы. Defaults to None.
+            order_by (str, optional): Порядок сортировки, один из BorrowCRUD.SORTS. Defaults to "id".
+            columns (Sequence, optional): Выбираемые столбцы. Defaults to BorrowCRUD.COLUMNS.
+
+        Returns:
+            list[Row]: Строки записей о выдаче книг.
+
+        Raises:
+            ValueError: Если порядок сортировки неизвестен или курсор некорректен.
+        """
+        return paginate(db.query(*columns), BorrowCRUD.SORTS, order_by, skip, limit, after).all()
+
+    @staticmethod
+    def get_book_borrows(db: Session, book_id: int, skip: int = 0, limit: int = 10, after: Optional[str] = None,
+                         order_by: str = "-borrow_date", columns: Sequence = COLUMNS,
+                         include_archive: bool = False) -> list[Row]:
+        """
+        Возвращает историю выдач книги с возможностью пагинации.
+
+        Args:
+            db (Session): Сессия базы данных.
+            book_id (int): Идентификатор книги.
+            skip (int, optional): Количество записей, которые нужно пропустить. Defaults to 0.
+            limit (int, optional): Количество записей, которые нужно вернуть. Defaults to 10.
+            after (Optional[str], optional): Курсор последней строки предыдущей страницы. Defaults to None.
+            order_by (str, optional): Порядок сортировки, один из BorrowCRUD.SORTS. Defaults to "-borrow_date".
+            columns (Sequence, optional): Выбираемые столбцы. Defaults to BorrowCRUD.COLUMNS.
+            include_archive (bool, optional): Добавить выдачи из архива. Defaults to False.
 
         Returns:
-            list[Type[Borrow]]: Список записей о выдаче книг.
+            list[Row]: Строки записей о выдаче книги.
+
+        Raises:
+            ValueError: Если порядок сортировки неизвестен или курсор некорректен.
         """
-        return db.query(BorrowModel).offset(skip).limit(limit).all()
+        return BorrowCRUD.get_history(db, lambda model: [model.book_id == book_id], skip, limit, after, order_by,
+                                      columns, include_archive)
 
     @staticmethod
-    def update_borrow(db: Session, borrow_id: int, borrow: BorrowUpdate) -> Type[Borrow] | None:
+    def get_reader_borrows(db: Session, reader_id: int, active: Optional[bool] = None, skip: int = 0,
+                           limit: int = 10, after: Optional[str] = None, order_by: str = "-borrow_date",
+                           columns: Sequence = COLUMNS, include_archive: bool = False) -> list[Row]:
+        """
+        Возвращает выдачи читателя с возможностью пагинации.
+
+        История читается по индексу (reader_id, borrow_date, id), активные выдачи -
+        по частичному индексу только невозвращенных выдач.
+
+        Args:
+            db (Session): Сессия базы данных.
+            reader_id (int): Идентификатор читателя.
+            active (Optional[bool], optional): True - только активные выдачи, False - только возвращенные,
+                None - все. Defaults to None.
+            skip (int, optional): Количество записей, которые нужно пропустить. Defaults to 0.
+            limit (int, optional): Количество записей, которые нужно вернуть. Defaults to 10.
+            after (Optional[str], optional): Курсор последней строки предыдущей страницы. Defaults to None.
+            order_by (str, optional): Порядок сортировки, один из BorrowCRUD.SORTS. Defaults to "-borrow_date".
+            columns (Sequence, optional): Выбираемые столбцы. Defaults to BorrowCRUD.COLUMNS.
+            include_archive (bool, optional): Добавить выдачи из архива; в архиве только возвращенные выдачи,
+                поэтому при active=True не используется. Defaults to False.
+
+        Returns:
+            list[Row]: Строки записей о выдаче читателя.
+
+        Raises:
+            ValueError: Если порядок сортировки неизвестен или курсор некорректен.
+        """
+        def where(model) -> list:
+            criteria = [model.reader_id == reader_id]
+            if active is not None:
+                criteria.append(model.return_date.is_(None) if active else model.return_date.isnot(None))
+            return criteria
+
+        return BorrowCRUD.get_history(db, where, skip, limit, after, order_by, columns,
+                                      include_archive and active is not True)
+
+    @staticmethod
+    def update_borrow(db: Session, borrow_id: int, borrow: BorrowUpdate) -> Row | None:
         """
         Обновляет данные записи о выдаче книги.
 
@@ -67,12 +277,262 @@ class BorrowCRUD:
             borrow (BorrowUpdate): Данные для обновления.
 
         Returns:
-            Type[Borrow] | None: Объект обновленной записи о выдаче книги или None, если запись не найдена.
-        """
-        db_borrow = db.query(BorrowModel).filter(BorrowModel.id == borrow_id).first()
-        if db_borrow:
-            for key, value in borrow.dict(exclude_unset=True).items():
-                setattr(db_borrow, key, value)
-            db.commit()
-            db.refresh(db_borrow)
+            Row | None: Строка обновленной записи о выдаче книги или None, если запись не найдена.
+        """
+        db_borrow = db.execute(
+            update(BorrowModel)
+            .where(BorrowModel.id == borrow_id)
+            .values(**borrow.model_dump(exclude_unset=True), version=BorrowModel.version + 1)
+            .returning(*BorrowModel.__table__.c)
+            .execution_options(synchronize_session=False)
+        ).one_or_none()
+        if db_borrow is None:
+            db.rollback()
+            return None
+        invalidate_on_commit(db, "borrow", borrow_id)
+        db.commit()
+        return db_borrow
+
+    @staticmethod
+    def borrow_book(db: Session, borrow: BorrowCreate) -> Row | None:
+        """
+        Выдает книгу читателю одной транзакцией.
+
+        Количество доступных экземпляров уменьшается условным UPDATE прямо в базе,
+        поэтому параллельные выдачи не могут уйти в минус. Версия книги увеличивается
+        тем же запросом. Запись о выдаче вставляется INSERT ... SELECT с условием на
+        счетчик активных выдач читателя, поэтому лимит проверяется без подсчета его выдач.
+
+        Args:
+            db (Session): Сессия базы данных.
+            borrow (BorrowCreate): Данные новой записи о выдаче книги.
+
+        Returns:
+            Row | None: Строка созданной записи о выдаче книги или None,
+            если книга не найдена или нет доступных экземпляров.
+
+        Raises:
+            ValueError: Если читатель не найден или достиг лимита активных выдач.
+        """
+        values = BorrowCRUD.borrow_values(db, borrow)
+        result = db.execute(
+            update(BookModel)
+            .where(BookModel.id == borrow.book_id, BookModel.available_copies > 0)
+            .values(available_copies=BookModel.available_copies - 1, version=BookModel.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.rollback()
+            return None
+
+        under_limit = exists().where(ReaderModel.id == values["reader_id"],
+                                     ReaderModel.active_loans < ReaderModel.loan_limit)
+        db_borrow = db.execute(
+            insert(BorrowModel)
+            .from_select(list(values), select(*(literal(value) for value in values.values())).where(under_limit))
+            .returning(*BorrowModel.__table__.c)
+        ).one_or_none()
+        if db_borrow is None:
+            db.rollback()
+            if db.get(ReaderModel, values["reader_id"]) is None:
+                raise ValueError("Reader not found")
+            raise ValueError("Reader has reached the loan limit")
+        invalidate_on_commit(db, "book", borrow.book_id)
+        db.commit()
+        return db_borrow
+
+    @staticmethod
+    def return_borrow(db: Session, borrow_id: int, return_date: date) -> Row | None:
+        """
+        Оформляет возврат книги одной транзакцией.
+
+        Args:
+            db (Session): Сессия базы данных.
+            borrow_id (int): Идентификатор записи о выдаче книги.
+            return_date (date): Дата возврата.
+
+        Returns:
+            Row | None: Строка обновленной записи о выдаче книги или None, если запись не найдена.
+
+        Raises:
+            ValueError: Если книга по этой записи уже возвращена.
+        """
+        # Условие на return_date не дает вернуть одну выдачу дважды и увеличить остаток лишний раз
+        # RETURNING сразу возвращает строку для ответа, повторное чтение после коммита не нужно
+        db_borrow = db.execute(
+            update(BorrowModel)
+            .where(BorrowModel.id == borrow_id, BorrowModel.return_date.is_(None))
+            .values(return_date=return_date, version=BorrowModel.version + 1)
+            .returning(*BorrowModel.__table__.c)
+            .execution_options(synchronize_session=False)
+        ).one_or_none()
+        if db_borrow is None:
+            db.rollback()
+            # Выдачи в архиве всегда возвращены
+            if db.get(BorrowModel, borrow_id) is None and db.get(BorrowArchive, borrow_id) is None:
+                return None
+            raise ValueError("Book has already been returned")
+
+        db.execute(
+            update(BookModel)
+            .where(BookModel.id == db_borrow.book_id)
+            .values(available_copies=BookModel.available_copies + 1, version=BookModel.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        invalidate_on_commit(db, "borrow", borrow_id)
+        invalidate_on_commit(db, "book", db_borrow.book_id)
+        db.commit()
         return db_borrow
+
+    @staticmethod
+    def borrow_books(db: Session, borrows: Sequence[BorrowCreate], atomic: bool = True) -> list[BatchOutcome]:
+        """
+        Выдает несколько книг одной транзакцией.
+
+        Остатки всех запрошенных книг читаются одним UPDATE ... RETURNING без изменения
+        данных: он же начинает транзакцию записи, поэтому до коммита остатки и счетчики
+        читателей не может изменить другой запрос. Элементы проверяются по порядку, затем
+        остатки уменьшаются одним UPDATE, а записи о выдаче вставляются одним INSERT.
+        Количество запросов не зависит от размера пакета (при выдаче по reader_name
+        добавляется по запросу на каждое различное имя).
+
+        Args:
+            db (Session): Сессия базы данных.
+            borrows (Sequence[BorrowCreate]): Данные новых записей о выдаче.
+            atomic (bool, optional): True - при ошибке в любом элементе пакет не применяется. Defaults to True.
+
+        Returns:
+            list[BatchOutcome]: Для каждого элемента строка созданной записи или текст ошибки.
+        """
+        reader_ids: dict[str, int] = {}
+        values = [BorrowCRUD.borrow_values(db, borrow, reader_ids) for borrow in borrows]
+        book_ids = list({item["book_id"]: None for item in values})
+        available = {}
+        for chunk in id_chunks(book_ids):
+            available.update(db.execute(
+                update(BookModel)
+                .where(BookModel.id.in_(chunk))
+                .values(available_copies=BookModel.available_copies)
+                .returning(BookModel.id, BookModel.available_copies)
+                .execution_options(synchronize_session=False)
+            ).all())
+        remaining_loans = {}
+        for chunk in id_chunks(list({item["reader_id"]: None for item in values})):
+            remaining_loans.update(db.execute(
+                select(ReaderModel.id, ReaderModel.loan_limit - ReaderModel.active_loans)
+                .where(ReaderModel.id.in_(chunk))
+            ).all())
+
+        errors = []
+        for item in values:
+            if item["book_id"] not in available:
+                errors.append("Book not found")
+            elif available[item["book_id"]] <= 0:
+                errors.append("Book is not available for borrowing")
+            elif item["reader_id"] not in remaining_loans:
+                errors.append("Reader not found")
+            elif remaining_loans[item["reader_id"]] <= 0:
+                errors.append("Reader has reached the loan limit")
+            else:
+                available[item["book_id"]] -= 1
+                remaining_loans[item["reader_id"]] -= 1
+                errors.append(None)
+
+        accepted = [item for item, error in zip(values, errors) if error is None]
+        if not accepted or (atomic and len(accepted) < len(values)):
+            db.rollback()
+            return [(None, error or BATCH_NOT_APPLIED) for error in errors]
+
+        taken = Counter(item["book_id"] for item in accepted)
+        for chunk in id_chunks(list(taken)):
+            db.execute(
+                update(BookModel)
+                .where(BookModel.id.in_(chunk))
+                .values(available_copies=BookModel.available_copies - case(
+                            {book_id: taken[book_id] for book_id in chunk}, value=BookModel.id),
+                        version=BookModel.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+        # SQLite не гарантирует порядок строк RETURNING, а sort_by_parameter_order без столбца-метки
+        # выполняет INSERT построчно. Поэтому строки сопоставляются с элементами по значениям:
+        # элементы с одинаковыми значениями взаимозаменяемы.
+        created = defaultdict(list)
+        for row in db.execute(insert(BorrowModel).returning(*BorrowModel.__table__.c), accepted):
+            created[row.book_id, row.reader_id, row.borrow_date, row.return_date].append(row)
+        for book_id in taken:
+            invalidate_on_commit(db, "book", book_id)
+        db.commit()
+        return [
+            (created[item["book_id"], item["reader_id"], item["borrow_date"], item["return_date"]].pop(0), None)
+            if error is None else (None, error)
+            for item, error in zip(values, errors)
+        ]
+
+    @staticmethod
+    def return_borrows(db: Session, returns: Sequence[tuple[int, date]], atomic: bool = True) -> list[BatchOutcome]:
+        """
+        Оформляет возврат нескольких книг одной транзакцией.
+
+        Даты возврата записываются одним UPDATE ... RETURNING с условием на return_date,
+        остатки книг увеличиваются одним UPDATE.
+
+        Args:
+            db (Session): Сессия базы данных.
+            returns (Sequence[tuple[int, date]]): Пары (идентификатор записи о выдаче, дата возврата).
+            atomic (bool, optional): True - при ошибке в любом элементе пакет не применяется. Defaults to True.
+
+        Returns:
+            list[BatchOutcome]: Для каждого элемента строка обновленной записи или текст ошибки.
+        """
+        dates: dict[int, date] = {}
+        for borrow_id, return_date in returns:
+            dates.setdefault(borrow_id, return_date)
+        returned = {}
+        for chunk in id_chunks(list(dates)):
+            returned.update((row.id, row) for row in db.execute(
+                update(BorrowModel)
+                .where(BorrowModel.id.in_(chunk), BorrowModel.return_date.is_(None))
+                .values(return_date=case({borrow_id: dates[borrow_id] for borrow_id in chunk}, value=BorrowModel.id),
+                        version=BorrowModel.version + 1)
+                .returning(*BorrowModel.__table__.c)
+                .execution_options(synchronize_session=False)
+            ))
+
+        missing = [borrow_id for borrow_id in dates if borrow_id not in returned]
+        existing = set()
+        for chunk in id_chunks(missing):
+            for model in (BorrowModel, BorrowArchive):
+                existing.update(db.scalars(select(model.id).where(model.id.in_(chunk))))
+        returned_ids = set(returned)
+        outcomes: list[BatchOutcome] = []
+        for borrow_id, _ in returns:
+            row = returned.pop(borrow_id, None)
+            if row is not None:
+                outcomes.append((row, None))
+            elif borrow_id in existing or borrow_id in returned_ids:
+                # Повтор идентификатора в пакете: книгу уже вернул первый элемент
+                outcomes.append((None, "Book has already been returned"))
+            else:
+                outcomes.append((None, "Borrow record not found"))
+
+        rows = [row for row, _ in outcomes if row is not None]
+        if not rows or (atomic and len(rows) < len(outcomes)):
+            db.rollback()
+            return [(None, error or BATCH_NOT_APPLIED) for _, error in outcomes]
+
+        returned_books = Counter(row.book_id for row in rows)
+        for chunk in id_chunks(list(returned_books)):
+            db.execute(
+                update(BookModel)
+                .where(BookModel.id.in_(chunk))
+                .values(available_copies=BookModel.available_copies + case(
+                            {book_id: returned_books[book_id] for book_id in chunk}, value=BookModel.id),
+                        version=BookModel.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+        for row in rows:
+            invalidate_on_commit(db, "borrow", row.id)
+        for book_id in returned_books:
+            invalidate_on_commit(db, "book", book_id)
+        db.commit()
+        return outcomes
@@ -0,0 +1,61 @@
+from typing import Iterator, Sequence
+
+from sqlalchemy import Column, Row, insert, select
+from sqlalchemy.orm import Session
+
+from core.models.base import Base
+
+# Идентификаторов в одном IN (...): меньше ограничения SQLite на число параметров запроса
+# (SQLITE_MAX_VARIABLE_NUMBER, 999 в версиях до 3.32)
+ID_CHUNK_SIZE = 500
+
+
+def id_chunks(ids: Sequence[int]) -> Iterator[Sequence[int]]:
+    """
+    Разбивает идентификаторы на части по ID_CHUNK_SIZE для запросов с IN (...).
+    """
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        yield ids[start:start + ID_CHUNK_SIZE]
+
+
+class BulkCRUD:
+    """
+    Класс для массовой вставки и чтения данных в базе данных.
+    """
+
+    @staticmethod
+    def insert_rows(db: Session, model: type[Base], rows: list[dict]) -> None:
+        """
+        Вставляет пачку строк одним executemany без создания ORM-объектов.
+
+        Транзакция не фиксируется: коммит выполняет вызывающий код,
+        чтобы в одну транзакцию попадало несколько пачек.
+
+        Args:
+            db (Session): Сессия базы данных.
+            model (type[Base]): Модель таблицы.
+            rows (list[dict]): Строки для вставки.
+        """
+        db.execute(insert(model), rows)
+
+    @staticmethod
+    def get_rows(db: Session, columns: Sequence[Column], ids: Sequence[int]) -> list[Row]:
+        """
+        Выбирает строки по списку идентификаторов запросами WHERE id IN (...).
+
+        Идентификаторы разбиваются на части по ID_CHUNK_SIZE, поэтому для пакета
+        до MAX_BATCH_SIZE выполняется не больше двух запросов.
+
+        Args:
+            db (Session): Сессия базы данных.
+            columns (Sequence[Column]): Выбираемые столбцы одной таблицы с первичным ключом id.
+            ids (Sequence[int]): Идентификаторы без повторов.
+
+        Returns:
+            list[Row]: Найденные строки в произвольном порядке.
+        """
+        id_column = columns[0].table.c.id
+        rows = []
+        for chunk in id_chunks(ids):
+            rows += db.execute(select(*columns).where(id_column.in_(chunk))).all()
+        return rows
@@ -0,0 +1,105 @@
+from sqlalchemy import Row, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Optional
+from core.models.reader import Reader as ReaderModel
+from core.pagination import SortKey, paginate
+from core.responses import schema_columns
+from core.schemas.reader import Reader as ReaderSchema, ReaderCreate
+
+
+class ReaderCRUD:
+    """
+    Класс для управления данными читателей в базе данных.
+    """
+
+    # Допустимые порядки сортировки для пагинации; каждому соответствует индекс
+    SORTS = {
+        "id": SortKey(ReaderModel.id),
+        "-id": SortKey(ReaderModel.id, descending=True),
+    }
+
+    # Столбцы схемы ответа: списки выбираются кортежами, без создания ORM-объектов
+    COLUMNS = schema_columns(ReaderModel, ReaderSchema)
+
+    @staticmethod
+    def create_reader(db: Session, reader: ReaderCreate) -> Row:
+        """
+        Создает нового читателя в базе данных.
+
+        Args:
+            db (Session): Сессия базы данных.
+            reader (ReaderCreate): Данные нового читателя.
+
+        Returns:
+            Row: Строка созданного читателя.
+
+        Raises:
+            ValueError: Если читатель с таким именем уже есть.
+        """
+        try:
+            db_reader = db.execute(
+                insert(ReaderModel).values(**reader.model_dump(exclude_none=True)).returning(*ReaderCRUD.COLUMNS)
+            ).one()
+        except IntegrityError:
+            db.rollback()
+            raise ValueError("Reader with this name already exists")
+        db.commit()
+        return db_reader
+
+    @staticmethod
+    def get_reader(db: Session, reader_id: int) -> Row | None:
+        """
+        Возвращает читателя по его идентификатору.
+
+        Args:
+            db (Session): Сессия базы данных.
+            reader_id (int): Идентификатор читателя.
+
+        Returns:
+            Row | None: Строка читателя или None, если читатель не найден.
+        """
+        return db.execute(select(*ReaderCRUD.COLUMNS).where(ReaderModel.id == reader_id)).one_or_none()
+
+    @staticmethod
+    def get_readers(db: Session, skip: int = 0, limit: int = 10, after: Optional[str] = None,
+                    order_by: str = "id") -> list[Row]:
+        """
+        Возвращает список читателей с возможностью пагинации.
+
+        Args:
+            db (Session): Сессия базы данных.
+            skip (int, optional): Количество читателей, которых нужно пропустить. Defaults to 0.
+            limit (int, optional): Количество читателей, которых нужно вернуть. Defaults to 10.
+            after (Optional[str], optional): Курсор последней строки предыдущей страницы. Defaults to None.
+            order_by (str, optional): Порядок сортировки, один из ReaderCRUD.SORTS. Defaults to "id".
+
+        Returns:
+            list[Row]: Строки читателей.
+
+        Raises:
+            ValueError: Если порядок сортировки неизвестен или курсор некорректен.
+        """
+        return paginate(db.query(*ReaderCRUD.COLUMNS), ReaderCRUD.SORTS, order_by, skip, limit, after).all()
+
+    @staticmethod
+    def get_or_create_reader_id(db: Session, name: str) -> int:
+        """
+        Возвращает идентификатор читателя по имени, создавая читателя при необходимости.
+
+        Поиск и создание выполняются одним INSERT ... ON CONFLICT по уникальному
+        индексу имени, поэтому параллельные запросы не создают дубликатов.
+        Транзакция не фиксируется.
+
+        Args:
+            db (Session): Сессия базы данных.
+            name (str): Имя читателя.
+
+        Returns:
+            int: Идентификатор читателя.
+        """
+        stmt = sqlite_insert(ReaderModel).values(name=name)
+        # Пустое обновление нужно, чтобы RETURNING вернул и уже существующую строку
+        stmt = stmt.on_conflict_do_update(index_elements=[ReaderModel.name], set_={"name": stmt.excluded.name})
+        return db.scalar(stmt.returning(ReaderModel.id))
@@ -0,0 +1,140 @@
+import os
+from datetime import date, timedelta
+
+from sqlalchemy import Row, func, select
+from sqlalchemy.orm import Session
+from typing import Optional
+from core.cruds.borrow import BorrowCRUD
+from core.models.author import Author as AuthorModel
+from core.models.book import Book as BookModel
+from core.models.borrow import Borrow as BorrowModel
+from core.models.stats import AuthorStats, BookStats, LoanSummary
+from core.pagination import paginate
+
+# Срок выдачи: невозвращенная выдача старше срока считается просроченной
+LOAN_PERIOD_DAYS = int(os.getenv("LOAN_PERIOD_DAYS", "14"))
+
+
+class StatsCRUD:
+    """
+    Класс для отчетов о выдачах книг.
+
+    Счетчики выдач читаются из таблиц book_stats, author_stats и loan_summary,
+    которые триггеры обновляют вместе с borrow, поэтому отчеты не агрегируют
+    ни историю выдач, ни все книги.
+    Просроченные выдачи выбираются по частичному индексу активных выдач.
+    """
+
+    # Допустимые рейтинги книг: счетчик book_stats, по которому сортируется рейтинг
+    RANKINGS = {
+        "total_loans": BookStats.total_loans,
+        "active_loans": BookStats.active_loans,
+    }
+
+    @staticmethod
+    def overdue_cutoff(as_of: date) -> date:
+        """
+        Возвращает дату выдачи, начиная с которой выдача на дату as_of еще не просрочена.
+        """
+        return as_of - timedelta(days=LOAN_PERIOD_DAYS)
+
+    @staticmethod
+    def get_summary(db: Session, as_of: date) -> dict:
+        """
+        Возвращает общие счетчики выдач и число просроченных выдач.
+
+        Args:
+            db (Session): Сессия базы данных.
+            as_of (date): Дата, на которую считаются просроченные выдачи.
+
+        Returns:
+            dict: Данные для схемы CirculationSummary.
+        """
+        # Строка loan_summary создается вместе со схемой; без нее счетчики считаются нулевыми
+        active_loans, total_loans = db.execute(
+            select(LoanSummary.active_loans, LoanSummary.total_loans).where(LoanSummary.id == 1)
+        ).one_or_none() or (0, 0)
+        overdue_loans = db.scalar(
+            select(func.count()).select_from(BorrowModel)
+            .where(BorrowModel.return_date.is_(None), BorrowModel.borrow_date < StatsCRUD.overdue_cutoff(as_of))
+        )
+        return {
+            "active_loans": active_loans,
+            "total_loans": total_loans,
+            "overdue_loans": overdue_loans,
+            "as_of": as_of,
+            "loan_period_days": LOAN_PERIOD_DAYS,
+        }
+
+    @staticmethod
+    def get_top_books(db: Session, order_by: str = "total_loans", limit: int = 10) -> list[Row]:
+        """
+        Возвращает книги с наибольшим числом выдач.
+
+        Args:
+            db (Session): Сессия базы данных.
+            order_by (str, optional): Счетчик рейтинга, один из StatsCRUD.RANKINGS. Defaults to "total_loans".
+            limit (int, optional): Количество книг. Defaults to 10.
+
+        Returns:
+            list[Row]: Строки со столбцами book_id, title, author_id, active_loans, total_loans.
+
+        Raises:
+            ValueError: Если счетчик рейтинга неизвестен.
+        """
+        counter = StatsCRUD.RANKINGS.get(order_by)
+        if counter is None:
+            raise ValueError(f"Unknown order_by: {order_by}")
+        return db.execute(
+            select(BookStats.book_id, BookModel.title, BookModel.author_id, BookStats.active_loans,
+                   BookStats.total_loans)
+            .join(BookModel, BookModel.id == BookStats.book_id)
+            .where(counter > 0)
+            .order_by(counter.desc(), BookStats.book_id.desc())
+            .limit(limit)
+        ).all()
+
+    @staticmethod
+    def get_top_authors(db: Session, limit: int = 10) -> list[Row]:
+        """
+        Возвращает авторов с наибольшим числом выдач их книг.
+
+        Счетчики читаются из author_stats в порядке индекса ix_author_stats_total_loans.
+
+        Args:
+            db (Session): Сессия базы данных.
+            limit (int, optional): Количество авторов. Defaults to 10.
+
+        Returns:
+            list[Row]: Строки со столбцами author_id, first_name, last_name, books, active_loans, total_loans.
+        """
+        return db.execute(
+            select(AuthorStats.author_id, AuthorModel.first_name, AuthorModel.last_name, AuthorStats.books,
+                   AuthorStats.active_loans, AuthorStats.total_loans)
+            .join(AuthorModel, AuthorModel.id == AuthorStats.author_id)
+            .where(AuthorStats.total_loans > 0)
+            .order_by(AuthorStats.total_loans.desc(), AuthorStats.author_id)
+            .limit(limit)
+        ).all()
+
+    @staticmethod
+    def get_overdue(db: Session, as_of: date, limit: int = 10, after: Optional[str] = None) -> list[Row]:
+        """
+        Возвращает просроченные выдачи, начиная с самых давних, с keyset-пагинацией.
+
+        Args:
+            db (Session): Сессия базы данных.
+            as_of (date): Дата, на которую считаются просроченные выдачи.
+            limit (int, optional): Количество записей. Defaults to 10.
+            after (Optional[str], optional): Курсор последней строки предыдущей страницы. Defaults to None.
+
+        Returns:
+            list[Row]: Строки со столбцами BorrowCRUD.COLUMNS.
+
+        Raises:
+            ValueError: Если курсор некорректен.
+        """
+        query = db.query(*BorrowCRUD.COLUMNS).filter(
+            BorrowModel.return_date.is_(None), BorrowModel.borrow_date < StatsCRUD.overdue_cutoff(as_of)
+        )
+        return paginate(query, BorrowCRUD.SORTS, "borrow_date", 0, limit, after).all()
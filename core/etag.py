@@ -0,0 +1,155 @@
+import hashlib
+from typing import Any, Callable, Optional, Sequence
+
+from fastapi import Request, Response
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+
+class PreconditionFailed(Exception):
+    """
+    Версия строки не совпадает с версией из заголовка If-Match.
+    """
+
+
+def etag(version: int) -> str:
+    """
+    Возвращает сильный ETag сущности по версии ее строки.
+
+    Args:
+        version (int): Версия строки.
+
+    Returns:
+        str: Значение заголовка ETag.
+    """
+    return f'"{version}"'
+
+
+def page_etag(rows: Sequence[Any]) -> str:
+    """
+    Возвращает сильный ETag страницы списка по идентификаторам и версиям ее строк.
+
+    Тело страницы определяется набором строк и их версиями, поэтому ETag меняется
+    при изменении, добавлении или удалении любой строки страницы.
+
+    Args:
+        rows (Sequence[Any]): Строки страницы с атрибутами id и version.
+
+    Returns:
+        str: Значение заголовка ETag.
+    """
+    digest = hashlib.blake2b(",".join(f"{row.id}:{row.version}" for row in rows).encode(), digest_size=8)
+    return f'"p{digest.hexdigest()}"'
+
+
+def _entity_tags(header: str) -> list[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def not_modified(request: Request, tag: Optional[str]) -> Optional[Response]:
+    """
+    Возвращает ответ 304, если ETag совпадает с одним из значений заголовка If-None-Match.
+
+    Сравнение слабое: префикс W/ у значений заголовка не учитывается.
+
+    Args:
+        request (Request): Входящий запрос.
+        tag (Optional[str]): Текущий ETag ресурса или None, если ресурс не найден.
+
+    Returns:
+        Optional[Response]: Ответ 304 или None, если ресурс нужно отдать полностью.
+    """
+    header = request.headers.get("if-none-match")
+    if not header or tag is None:
+        return None
+    tags = _entity_tags(header)
+    if "*" in tags or tag in (value.removeprefix("W/") for value in tags):
+        return Response(status_code=304, headers={"ETag": tag})
+    return None
+
+
+def entity_not_modified(request: Request, load_version: Callable[[], Optional[int]]) -> Optional[Response]:
+    """
+    Проверяет If-None-Match для сущности; версия читается из базы, только если заголовок передан.
+
+    Args:
+        request (Request): Входящий запрос.
+        load_version (Callable[[], Optional[int]]): Чтение версии строки; None, если строки нет.
+
+    Returns:
+        Optional[Response]: Ответ 304 или None, если сущность нужно отдать полностью.
+    """
+    if not request.headers.get("if-none-match"):
+        return None
+    version = load_version()
+    return not_modified(request, etag(version) if version is not None else None)
+
+
+def page_not_modified(request: Request, load_versions: Callable[[], Sequence[Any]]) -> Optional[Response]:
+    """
+    Проверяет If-None-Match для страницы списка; строки (id, version) читаются, только если заголовок передан.
+
+    Args:
+        request (Request): Входящий запрос.
+        load_versions (Callable[[], Sequence[Any]]): Чтение id и version строк страницы.
+
+    Returns:
+        Optional[Response]: Ответ 304 или None, если страницу нужно отдать полностью.
+    """
+    if not request.headers.get("if-none-match"):
+        return None
+    return not_modified(request, page_etag(load_versions()))
+
+
+def if_match_versions(request: Request) -> Optional[list[int]]:
+    """
+    Возвращает версии строки, допустимые по заголовку If-Match.
+
+    Сравнение сильное: слабые ETag и значения другого формата не совпадают ни с одной версией.
+
+    Args:
+        request (Request): Входящий запрос.
+
+    Returns:
+        Optional[list[int]]: Версии из заголовка или None, если заголовка нет или он равен "*".
+    """
+    header = request.headers.get("if-match")
+    if header is None:
+        return None
+    tags = _entity_tags(header)
+    if "*" in tags:
+        return None
+    return [int(tag[1:-1]) for tag in tags if len(tag) > 2 and tag[0] == tag[-1] == '"' and tag[1:-1].isdigit()]
+
+
+def claim_version(db: Session, model, entity_id: int, versions: Sequence[int]) -> bool:
+    """
+    Проверяет версию строки перед изменением из нескольких запросов (например, удалением со связанными строками).
+
+    Условный UPDATE без изменения данных начинает транзакцию записи, поэтому до ее
+    завершения версию строки не может изменить другой запрос.
+
+    Args:
+        db (Session): Сессия базы данных.
+        model: ORM-модель со столбцами id и version.
+        entity_id (int): Идентификатор строки.
+        versions (Sequence[int]): Допустимые версии из заголовка If-Match.
+
+    Returns:
+        bool: True, если строка найдена с допустимой версией, False, если строки нет.
+
+    Raises:
+        PreconditionFailed: Если версия строки не входит в допустимые.
+    """
+    result = db.execute(
+        update(model)
+        .where(model.id == entity_id, model.version.in_(versions))
+        .values(version=model.version)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        return True
+    db.rollback()
+    if db.get(model, entity_id) is None:
+        return False
+    raise PreconditionFailed(f"{model.__name__} version does not match If-Match")
@@ -0,0 +1,44 @@
+from typing import Optional
+
+from sqlalchemy.orm import InstrumentedAttribute, Query, selectinload
+
+
+def parse_expand(expand: Optional[str]) -> list[str]:
+    """
+    Разбирает параметр expand вида "author,books" в список имен связей.
+
+    Args:
+        expand (Optional[str]): Значение параметра запроса.
+
+    Returns:
+        list[str]: Имена связей без повторов и пустых элементов.
+    """
+    if not expand:
+        return []
+    return list(dict.fromkeys(name.strip() for name in expand.split(",") if name.strip()))
+
+
+def apply_expand(query: Query, relations: dict[str, InstrumentedAttribute], expand: list[str]) -> Query:
+    """
+    Добавляет к запросу загрузку запрошенных связей через selectinload.
+
+    Каждая связь загружается одним дополнительным запросом с IN по всем строкам
+    страницы, поэтому количество запросов не зависит от размера страницы.
+
+    Args:
+        query (Query): Исходный запрос.
+        relations (dict[str, InstrumentedAttribute]): Допустимые связи.
+        expand (list[str]): Имена запрошенных связей.
+
+    Returns:
+        Query: Запрос с опциями загрузки связей.
+
+    Raises:
+        ValueError: Если связь неизвестна.
+    """
+    for name in expand:
+        relation = relations.get(name)
+        if relation is None:
+            raise ValueError(f"Unknown expand: {name}")
+        query = query.options(selectinload(relation))
+    return query
@@ -0,0 +1,57 @@
+import csv
+import io
+from typing import Callable, Iterator
+
+import orjson
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from core.models.base import Base
+
+# Количество строк, которые читаются из курсора и кодируются за один шаг
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def export_rows(session_factory: Callable[[], Session], model: type[Base], fmt: str) -> Iterator[bytes]:
+    """
+    Построчно выгружает таблицу в NDJSON или CSV.
+
+    Строки читаются серверным курсором (yield_per) как кортежи столбцов без
+    создания ORM-объектов и кодируются пачками по EXPORT_BATCH_SIZE, поэтому
+    потребление памяти не зависит от размера таблицы. Сессия открывается внутри
+    генератора, так как она должна жить до конца отправки ответа.
+
+    Args:
+        session_factory (Callable[[], Session]): Фабрика сессий базы данных.
+        model (type[Base]): Модель выгружаемой таблицы.
+        fmt (str): "ndjson" или "csv".
+
+    Yields:
+        bytes: Очередная порция закодированных строк.
+    """
+    columns = list(model.__table__.columns)
+    names = [column.name for column in columns]
+    stmt = select(*columns).order_by(model.__table__.c.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    with session_factory() as db:
+        result = db.execute(stmt)
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(names)
+            for partition in result.partitions():
+                writer.writerows(partition)
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+            # Заголовок отправляется даже для пустой таблицы
+            if buffer.tell():
+                yield buffer.getvalue().encode()
+        else:
+            for partition in result.partitions():
+                yield b"".join(orjson.dumps(dict(zip(names, row))) + b"\n" for row in partition)
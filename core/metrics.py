@@ -0,0 +1,256 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import Engine, event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Запросы дольше порога записываются в журнал library.sql
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+
+# Границы корзин гистограмм задержки в секундах
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Границы корзин гистограммы числа операций в пакете очереди записи
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# Метка маршрута для запросов, не попавших ни в один эндпоинт, чтобы число меток не росло от произвольных URL
+UNMATCHED_ROUTE = "unmatched"
+
+slow_query_log = logging.getLogger("library.sql")
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами в формате Prometheus.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # Корзина с наименьшей границей, не меньшей значения; последняя - +Inf
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestStats:
+    """
+    Счетчики SQL одного HTTP-запроса.
+    """
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+# Счетчики текущего запроса. Синхронные эндпоинты выполняются в пуле потоков с копией
+# контекста, поэтому видят тот же объект и увеличивают его счетчики
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class MetricsRegistry:
+    """
+    Потокобезопасное хранилище метрик процесса.
+
+    При запуске нескольких процессов uvicorn каждый процесс отдает свои метрики;
+    Prometheus суммирует их по меткам экземпляра.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.in_flight = 0
+            self.requests: dict[tuple[str, str, int], int] = {}
+            self.durations: dict[tuple[str, str], Histogram] = {}
+            self.request_statements: dict[tuple[str, str], int] = {}
+            self.request_db_durations: dict[tuple[str, str], Histogram] = {}
+            self.statements = 0
+            self.statement_durations = Histogram()
+            self.slow_queries = 0
+            self.write_batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+            self.write_queue_waits = Histogram()
+            self.write_queue_size = 0
+            self.write_queue_rejected = 0
+
+    def request_started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[(method, route, status)] = self.requests.get((method, route, status), 0) + 1
+            self.durations.setdefault(key, Histogram()).observe(seconds)
+            self.request_statements[key] = self.request_statements.get(key, 0) + stats.statements
+            self.request_db_durations.setdefault(key, Histogram()).observe(stats.db_seconds)
+
+    def statement_finished(self, seconds: float, slow: bool) -> None:
+        with self._lock:
+            self.statements += 1
+            self.statement_durations.observe(seconds)
+            if slow:
+                self.slow_queries += 1
+
+    def write_batch_finished(self, size: int, waits: list[float]) -> None:
+        with self._lock:
+            self.write_batch_sizes.observe(size)
+            for seconds in waits:
+                self.write_queue_waits.observe(seconds)
+
+    def write_queue_depth(self, size: int) -> None:
+        with self._lock:
+            self.write_queue_size = size
+
+    def write_rejected(self) -> None:
+        with self._lock:
+            self.write_queue_rejected += 1
+
+    def render(self) -> str:
+        """
+        Возвращает метрики в текстовом формате Prometheus.
+        """
+        lines = []
+        with self._lock:
+            lines += _header("http_requests_total", "counter", "HTTP requests by route and status.")
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+            lines += _header("http_requests_in_flight", "gauge", "HTTP requests being processed.")
+            lines.append(f"http_requests_in_flight {self.in_flight}")
+            lines += _header("http_request_duration_seconds", "histogram", "HTTP request latency.")
+            for (method, route), histogram in sorted(self.durations.items()):
+                lines += _histogram("http_request_duration_seconds", histogram, method=method, route=route)
+            lines += _header("http_request_db_statements_total", "counter", "SQL statements executed by route.")
+            for (method, route), count in sorted(self.request_statements.items()):
+                lines.append(f"http_request_db_statements_total{_labels(method=method, route=route)} {count}")
+            lines += _header("http_request_db_duration_seconds", "histogram", "Time spent in SQL per HTTP request.")
+            for (method, route), histogram in sorted(self.request_db_durations.items()):
+                lines += _histogram("http_request_db_duration_seconds", histogram, method=method, route=route)
+            lines += _header("db_statements_total", "counter", "SQL statements executed by the process.")
+            lines.append(f"db_statements_total {self.statements}")
+            lines += _header("db_statement_duration_seconds", "histogram", "SQL statement latency.")
+            lines += _histogram("db_statement_duration_seconds", self.statement_durations)
+            lines += _header("db_slow_queries_total", "counter", f"SQL statements slower than {SLOW_QUERY_MS:g} ms.")
+            lines.append(f"db_slow_queries_total {self.slow_queries}")
+            lines += _header("db_write_batch_size", "histogram", "Write operations committed per write queue batch.")
+            lines += _histogram("db_write_batch_size", self.write_batch_sizes)
+            lines += _header("db_write_queue_wait_seconds", "histogram", "Time write operations spend in the queue.")
+            lines += _histogram("db_write_queue_wait_seconds", self.write_queue_waits)
+            lines += _header("db_write_queue_size", "gauge", "Write operations waiting in the queue.")
+            lines.append(f"db_write_queue_size {self.write_queue_size}")
+            lines += _header("db_write_queue_rejected_total", "counter", "Write operations rejected by a full queue.")
+            lines.append(f"db_write_queue_rejected_total {self.write_queue_rejected}")
+        return "\n".join(lines) + "\n"
+
+
+def _header(name: str, kind: str, description: str) -> list[str]:
+    return [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+def _histogram(name: str, histogram: Histogram, **labels) -> list[str]:
+    lines = []
+    cumulative = 0
+    for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum:.6f}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+    return lines
+
+
+metrics = MetricsRegistry()
+
+
+def instrument_engine(engine: Engine, slow_query_ms: float = SLOW_QUERY_MS) -> None:
+    """
+    Подключает к движку подсчет SQL-запросов, их времени и журнал медленных запросов.
+
+    Время запроса добавляется к счетчикам текущего HTTP-запроса, если он есть.
+
+    Args:
+        engine (Engine): Синхронный движок (для асинхронного - AsyncEngine.sync_engine).
+        slow_query_ms (float): Порог медленного запроса в миллисекундах.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - context.metrics_started
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += seconds
+        slow = seconds * 1000 >= slow_query_ms
+        metrics.statement_finished(seconds, slow)
+        if slow:
+            slow_query_log.warning("slow query (%.1f ms): %s", seconds * 1000, statement)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware, собирающий метрики HTTP-запросов и добавляющий заголовок Server-Timing.
+
+    Server-Timing содержит время обработки до начала ответа (app) и время в базе
+    данных с количеством SQL-запросов (db). Маршрут определяется по шаблону
+    пути эндпоинта, а не по URL, поэтому число меток не зависит от идентификаторов.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Optional[dict] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status = 500
+        metrics.request_started()
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = (f'app;dur={(time.perf_counter() - started) * 1000:.2f}, '
+                          f'db;dur={stats.db_seconds * 1000:.2f};desc="queries={stats.statements}"')
+                message = {**message, "headers": [*message.get("headers", ()), (b"server-timing", timing.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            metrics.request_finished(scope["method"], self.route(scope), status, time.perf_counter() - started, stats)
+
+    def route(self, scope) -> str:
+        # Маршрутизатор записывает в scope найденный эндпоинт; шаблоны путей собираются
+        # при первом запросе, когда все роутеры уже подключены
+        if self._routes is None:
+            self._routes = {route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")}
+        return self._routes.get(scope.get("endpoint"), UNMATCHED_ROUTE)
@@ -1,16 +1,23 @@
 from datetime import date
 from typing import List
 
-from sqlalchemy import Integer, String, Date
+from sqlalchemy import Integer, String, Date, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from core.models.base import Base  # Импортируйте базовый класс
 
 
 class Author(Base):
+    __table_args__ = (
+        # Индекс для keyset-пагинации по фамилии
+        Index("ix_author_last_name_id", "last_name", "id"),
+    )
+
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     first_name: Mapped[str] = mapped_column(String, nullable=False)
     last_name: Mapped[str] = mapped_column(String, nullable=False)
     birth_date: Mapped[date] = mapped_column(Date, nullable=False)
+    # Версия строки для ETag, увеличивается при каждом изменении
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
 
     books: Mapped[List["Book"]] = relationship("Book", back_populates="author")
 
@@ -1,20 +1,55 @@
 from typing import List
 
-from sqlalchemy import Integer, String, ForeignKey
+from sqlalchemy import Integer, String, ForeignKey, Index, DDL, event, table, column
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from core.models.base import Base
 
 
 class Book(Base):
+    __table_args__ = (
+        # Индекс для keyset-пагинации по названию
+        Index("ix_book_title_id", "title", "id"),
+    )
+
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     title: Mapped[str] = mapped_column(String, nullable=False)
     description: Mapped[str] = mapped_column(String, nullable=True)
     author_id: Mapped[int] = mapped_column(Integer,
-                                           ForeignKey("author.id"), nullable=True)
+                                           ForeignKey("author.id"), nullable=True, index=True)
     available_copies: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Версия строки для ETag, увеличивается при каждом изменении, включая выдачу и возврат
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
 
     author: Mapped["Author"] = relationship("Author", back_populates="books")
     borrows: Mapped[List["Borrow"]] = relationship("Borrow", back_populates="book")
 
     def __repr__(self) -> str:
         return f"Book(id={self.id!r}, title={self.title!r}, author_id={self.author_id!r})"
+
+
+# Полнотекстовый индекс FTS5 по названию и описанию книги. Таблица хранит только
+# индекс (content='book'), а триггеры поддерживают его в актуальном состоянии при
+# любых изменениях book, включая массовую загрузку.
+BOOK_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS book_fts USING fts5("
+    "title, description, content='book', content_rowid='id', "
+    # Префиксные индексы ускоряют запросы вида "dos*"
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS book_fts_ai AFTER INSERT ON book BEGIN "
+    "INSERT INTO book_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS book_fts_ad AFTER DELETE ON book BEGIN "
+    "INSERT INTO book_fts(book_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    # Изменение остатков не затрагивает индекс: триггер срабатывает только на title и description
+    "CREATE TRIGGER IF NOT EXISTS book_fts_au AFTER UPDATE OF title, description ON book BEGIN "
+    "INSERT INTO book_fts(book_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO book_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+]
+
+BOOK_FTS_REBUILD = "INSERT INTO book_fts(book_fts) VALUES ('rebuild')"
+
+book_fts = table("book_fts", column("rowid", Integer), column("title", String), column("description", String))
+
+for statement in BOOK_FTS_DDL:
+    event.listen(Book.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
@@ -1,19 +1,72 @@
 from datetime import date
 
-from sqlalchemy import Integer, ForeignKey, String, Date
+from sqlalchemy import Integer, ForeignKey, Date, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from core.models.base import Base
 
 
 class Borrow(Base):
+    __table_args__ = (
+        # Индекс для keyset-пагинации по дате выдачи
+        Index("ix_borrow_borrow_date_id", "borrow_date", "id"),
+        # Частичный индекс только по активным выдачам: он мал и не растет вместе с историей.
+        # return_date в ключе нужен планировщику SQLite: без него индекс оценивается так же,
+        # как ix_borrow_book_id, и выбор между ними зависит от порядка создания индексов
+        Index("ix_borrow_active_book_id", "book_id", "return_date",
+              sqlite_where=text("return_date IS NULL"), postgresql_where=text("return_date IS NULL")),
+        # Активные выдачи по дате выдачи для отчета о просроченных: условие borrow_date < срок
+        # и сортировка по (borrow_date, id) читают только начало индекса
+        Index("ix_borrow_active_borrow_date_id", "borrow_date", "id",
+              sqlite_where=text("return_date IS NULL"), postgresql_where=text("return_date IS NULL")),
+        # История выдач читателя и отдельно его активные выдачи, от новых к старым
+        Index("ix_borrow_reader_id_borrow_date_id", "reader_id", "borrow_date", "id"),
+        Index("ix_borrow_active_reader_id", "reader_id", "borrow_date", "id",
+              sqlite_where=text("return_date IS NULL"), postgresql_where=text("return_date IS NULL")),
+        # Возвращенные выдачи по дате возврата: архивирование выбирает самые давние без просмотра таблицы
+        Index("ix_borrow_returned_return_date_id", "return_date", "id",
+              sqlite_where=text("return_date IS NOT NULL"), postgresql_where=text("return_date IS NOT NULL")),
+        # AUTOINCREMENT: идентификаторы выдач, перенесенных в borrow_archive, не выдаются новым выдачам повторно
+        {"sqlite_autoincrement": True},
+    )
+
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     book_id: Mapped[int] = mapped_column(Integer, ForeignKey("book.id"),
-                                         nullable=False)
-    reader_name: Mapped[str] = mapped_column(String, nullable=False)
+                                         nullable=False, index=True)
+    reader_id: Mapped[int] = mapped_column(Integer, ForeignKey("reader.id"), nullable=False)
     borrow_date: Mapped[date] = mapped_column(Date, nullable=False)
     return_date: Mapped[date] = mapped_column(Date, nullable=True)
+    # Версия строки для ETag, увеличивается при каждом изменении
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
 
     book: Mapped["Book"] = relationship("Book", back_populates="borrows")
+    reader: Mapped["Reader"] = relationship("Reader", back_populates="borrows")
+
+    def __repr__(self) -> str:
+        return f"Borrow(id={self.id!r}, book_id={self.book_id!r}, reader_id={self.reader_id!r})"
+
+
+class BorrowArchive(Base):
+    """
+    Архив давно возвращенных выдач.
+
+    Строки переносятся из borrow с теми же идентификаторами и версиями и больше
+    не изменяются, поэтому таблица borrow и ее индексы содержат только активные
+    и недавно возвращенные выдачи.
+    """
+    __tablename__ = "borrow_archive"
+    __table_args__ = (
+        # История выдач книги и читателя в том же порядке, что и в borrow
+        Index("ix_borrow_archive_book_id_borrow_date_id", "book_id", "borrow_date", "id"),
+        Index("ix_borrow_archive_reader_id_borrow_date_id", "reader_id", "borrow_date", "id"),
+    )
+
+    # Идентификатор выдачи из borrow, а не новый
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    book_id: Mapped[int] = mapped_column(Integer, ForeignKey("book.id"), nullable=False)
+    reader_id: Mapped[int] = mapped_column(Integer, ForeignKey("reader.id"), nullable=False)
+    borrow_date: Mapped[date] = mapped_column(Date, nullable=False)
+    return_date: Mapped[date] = mapped_column(Date, nullable=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
 
     def __repr__(self) -> str:
-        return f"Borrow(id={self.id!r}, book_id={self.book_id!r}, reader_name={self.reader_name!r})"
+        return f"BorrowArchive(id={self.id!r}, book_id={self.book_id!r}, reader_id={self.reader_id!r})"
@@ -0,0 +1,49 @@
+import os
+from typing import List
+
+from sqlalchemy import Integer, String, DDL, event
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from core.models.base import Base
+
+# Лимит активных выдач для новых читателей
+DEFAULT_LOAN_LIMIT = int(os.getenv("DEFAULT_LOAN_LIMIT", "10"))
+
+
+class Reader(Base):
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    name: Mapped[str] = mapped_column(String, nullable=False, unique=True)
+    loan_limit: Mapped[int] = mapped_column(Integer, nullable=False, default=DEFAULT_LOAN_LIMIT)
+    # Число невозвращенных выдач; поддерживается триггерами на borrow и проверяется при выдаче
+    active_loans: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+    borrows: Mapped[List["Borrow"]] = relationship("Borrow", back_populates="reader")
+
+    def __repr__(self) -> str:
+        return f"Reader(id={self.id!r}, name={self.name!r})"
+
+
+# Триггеры обновляют счетчик активных выдач читателя в той же транзакции, что и изменение borrow
+READER_LOANS_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS reader_loans_borrow_ai AFTER INSERT ON borrow WHEN new.return_date IS NULL "
+    "BEGIN UPDATE reader SET active_loans = active_loans + 1 WHERE id = new.reader_id; END",
+    "CREATE TRIGGER IF NOT EXISTS reader_loans_borrow_ad AFTER DELETE ON borrow WHEN old.return_date IS NULL "
+    "BEGIN UPDATE reader SET active_loans = active_loans - 1 WHERE id = old.reader_id; END",
+    "CREATE TRIGGER IF NOT EXISTS reader_loans_borrow_au AFTER UPDATE OF reader_id, return_date ON borrow "
+    "WHEN old.reader_id IS NOT new.reader_id OR (old.return_date IS NULL) IS NOT (new.return_date IS NULL) BEGIN "
+    "UPDATE reader SET active_loans = active_loans - (old.return_date IS NULL) WHERE id = old.reader_id; "
+    "UPDATE reader SET active_loans = active_loans + (new.return_date IS NULL) WHERE id = new.reader_id; END",
+]
+
+READER_LOANS_TRIGGERS = ("reader_loans_borrow_ai", "reader_loans_borrow_ad", "reader_loans_borrow_au")
+
+# Пересчет счетчиков за один проход по активным выдачам
+READER_LOANS_REBUILD = [
+    "UPDATE reader SET active_loans = 0",
+    "UPDATE reader SET active_loans = active.loans FROM ("
+    "SELECT reader_id, COUNT(*) AS loans FROM borrow WHERE return_date IS NULL GROUP BY reader_id"
+    ") AS active WHERE reader.id = active.reader_id",
+]
+
+# Триггеры ссылаются на borrow и reader, поэтому создаются после всех таблиц
+for statement in READER_LOANS_DDL:
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="sqlite"))
@@ -0,0 +1,165 @@
+from sqlalchemy import CheckConstraint, Integer, ForeignKey, Index, DDL, event
+from sqlalchemy.orm import Mapped, mapped_column
+from core.models.base import Base
+
+
+class BookStats(Base):
+    """
+    Счетчики выдач книги, которые поддерживают триггеры на таблице borrow.
+    """
+    __tablename__ = "book_stats"
+    __table_args__ = (
+        # Индексы для рейтингов книг: ORDER BY счетчик DESC LIMIT n читает только начало индекса
+        Index("ix_book_stats_total_loans", "total_loans", "book_id"),
+        Index("ix_book_stats_active_loans", "active_loans", "book_id"),
+    )
+
+    book_id: Mapped[int] = mapped_column(Integer, ForeignKey("book.id"), primary_key=True)
+    # Число невозвращенных выдач
+    active_loans: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    # Число выдач за всю историю
+    total_loans: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self) -> str:
+        return f"BookStats(book_id={self.book_id!r}, active_loans={self.active_loans!r}, " \
+               f"total_loans={self.total_loans!r})"
+
+
+class AuthorStats(Base):
+    """
+    Счетчики выдач книг автора, которые поддерживают триггеры на таблицах book_stats и book.
+    """
+    __tablename__ = "author_stats"
+
+    author_id: Mapped[int] = mapped_column(Integer, ForeignKey("author.id"), primary_key=True)
+    # Число книг автора, которые выдавались хотя бы раз
+    books: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    active_loans: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    total_loans: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self) -> str:
+        return f"AuthorStats(author_id={self.author_id!r}, books={self.books!r}, " \
+               f"active_loans={self.active_loans!r}, total_loans={self.total_loans!r})"
+
+
+# Рейтинг авторов: ORDER BY total_loans DESC, author_id LIMIT n читает только начало индекса.
+# Направления столбцов в индексе совпадают с сортировкой рейтинга, поэтому временное B-дерево не нужно
+Index("ix_author_stats_total_loans", AuthorStats.total_loans.desc(), AuthorStats.author_id)
+
+
+class LoanSummary(Base):
+    """
+    Общие счетчики выдач по всем книгам: единственная строка с id = 1.
+    """
+    __tablename__ = "loan_summary"
+    __table_args__ = (
+        CheckConstraint("id = 1", name="ck_loan_summary_single_row"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, default=1)
+    active_loans: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    total_loans: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self) -> str:
+        return f"LoanSummary(active_loans={self.active_loans!r}, total_loans={self.total_loans!r})"
+
+
+# Выдача учитывается в счетчиках своей книги; строка счетчиков создается при первой выдаче
+_ADD_LOAN = (
+    "INSERT INTO book_stats(book_id, active_loans, total_loans) VALUES (new.book_id, new.return_date IS NULL, 1) "
+    "ON CONFLICT(book_id) DO UPDATE SET active_loans = active_loans + excluded.active_loans, "
+    "total_loans = total_loans + 1;"
+)
+_REMOVE_LOAN = (
+    "UPDATE book_stats SET active_loans = active_loans - (old.return_date IS NULL), total_loans = total_loans - 1 "
+    "WHERE book_id = old.book_id;"
+)
+
+# Триггеры обновляют счетчики в той же транзакции, что и изменение borrow, включая
+# массовую загрузку и прямые запросы к базе
+BOOK_STATS_DDL = [
+    f"CREATE TRIGGER IF NOT EXISTS book_stats_borrow_ai AFTER INSERT ON borrow BEGIN {_ADD_LOAN} END",
+    # Перенос выдачи в архив не уменьшает счетчики: архивированная выдача остается в истории книги
+    "CREATE TRIGGER IF NOT EXISTS book_stats_borrow_ad AFTER DELETE ON borrow "
+    f"WHEN NOT EXISTS (SELECT 1 FROM borrow_archive WHERE id = old.id) BEGIN {_REMOVE_LOAN} END",
+    # Срабатывает только при смене книги или возврате (отмене возврата), но не при изменении даты возврата
+    "CREATE TRIGGER IF NOT EXISTS book_stats_borrow_au AFTER UPDATE OF book_id, return_date ON borrow "
+    "WHEN old.book_id IS NOT new.book_id OR (old.return_date IS NULL) IS NOT (new.return_date IS NULL) "
+    f"BEGIN {_REMOVE_LOAN} {_ADD_LOAN} END",
+    "CREATE TRIGGER IF NOT EXISTS book_stats_book_ad AFTER DELETE ON book BEGIN "
+    "DELETE FROM book_stats WHERE book_id = old.id; END",
+]
+
+BOOK_STATS_TRIGGERS = ("book_stats_borrow_ai", "book_stats_borrow_ad", "book_stats_borrow_au", "book_stats_book_ad")
+
+# Счетчики книги входят в общие счетчики и в счетчики ее автора. Автор ищется по таблице book:
+# если книга уже удалена, ее вклад в счетчики автора вычел триггер loan_totals_book_bd
+_ADD_BOOK_STATS = (
+    "UPDATE loan_summary SET active_loans = active_loans + new.active_loans, "
+    "total_loans = total_loans + new.total_loans WHERE id = 1; "
+    "INSERT INTO author_stats(author_id, books, active_loans, total_loans) "
+    "SELECT author_id, new.total_loans > 0, new.active_loans, new.total_loans FROM book "
+    "WHERE id = new.book_id AND author_id IS NOT NULL "
+    "ON CONFLICT(author_id) DO UPDATE SET books = books + excluded.books, "
+    "active_loans = active_loans + excluded.active_loans, total_loans = total_loans + excluded.total_loans;"
+)
+_REMOVE_BOOK_STATS = (
+    "UPDATE loan_summary SET active_loans = active_loans - old.active_loans, "
+    "total_loans = total_loans - old.total_loans WHERE id = 1; "
+    "UPDATE author_stats SET books = books - (old.total_loans > 0), active_loans = active_loans - old.active_loans, "
+    "total_loans = total_loans - old.total_loans WHERE author_id = (SELECT author_id FROM book WHERE id = old.book_id);"
+)
+# Вклад счетчиков книги в счетчики автора при смене автора книги
+_ADD_BOOK_TO_AUTHOR = (
+    "INSERT INTO author_stats(author_id, books, active_loans, total_loans) "
+    "SELECT new.author_id, total_loans > 0, active_loans, total_loans FROM book_stats "
+    "WHERE book_id = new.id AND new.author_id IS NOT NULL "
+    "ON CONFLICT(author_id) DO UPDATE SET books = books + excluded.books, "
+    "active_loans = active_loans + excluded.active_loans, total_loans = total_loans + excluded.total_loans;"
+)
+_REMOVE_BOOK_FROM_AUTHOR = (
+    "UPDATE author_stats SET books = books - (SELECT total_loans > 0 FROM book_stats WHERE book_id = old.id), "
+    "active_loans = active_loans - (SELECT active_loans FROM book_stats WHERE book_id = old.id), "
+    "total_loans = total_loans - (SELECT total_loans FROM book_stats WHERE book_id = old.id) "
+    "WHERE author_id = old.author_id AND EXISTS (SELECT 1 FROM book_stats WHERE book_id = old.id);"
+)
+
+# Общие счетчики и счетчики авторов обновляются в той же транзакции, что и book_stats, поэтому
+# сводка и рейтинг авторов читают одну строку и начало индекса, а не агрегируют все книги
+LOAN_TOTALS_DDL = [
+    "INSERT OR IGNORE INTO loan_summary(id, active_loans, total_loans) VALUES (1, 0, 0)",
+    f"CREATE TRIGGER IF NOT EXISTS loan_totals_book_stats_ai AFTER INSERT ON book_stats BEGIN {_ADD_BOOK_STATS} END",
+    "CREATE TRIGGER IF NOT EXISTS loan_totals_book_stats_au AFTER UPDATE ON book_stats "
+    f"BEGIN {_REMOVE_BOOK_STATS} {_ADD_BOOK_STATS} END",
+    f"CREATE TRIGGER IF NOT EXISTS loan_totals_book_stats_ad AFTER DELETE ON book_stats BEGIN {_REMOVE_BOOK_STATS} END",
+    # Выдачи могут быть загружены раньше книги: счетчики книги переходят к автору при ее создании
+    f"CREATE TRIGGER IF NOT EXISTS loan_totals_book_ai AFTER INSERT ON book BEGIN {_ADD_BOOK_TO_AUTHOR} END",
+    "CREATE TRIGGER IF NOT EXISTS loan_totals_book_au AFTER UPDATE OF author_id ON book "
+    f"WHEN old.author_id IS NOT new.author_id BEGIN {_REMOVE_BOOK_FROM_AUTHOR} {_ADD_BOOK_TO_AUTHOR} END",
+    # BEFORE: строка book_stats удаляемой книги еще существует (ее удаляет book_stats_book_ad)
+    f"CREATE TRIGGER IF NOT EXISTS loan_totals_book_bd BEFORE DELETE ON book BEGIN {_REMOVE_BOOK_FROM_AUTHOR} END",
+]
+
+LOAN_TOTALS_TRIGGERS = ("loan_totals_book_stats_ai", "loan_totals_book_stats_au", "loan_totals_book_stats_ad",
+                        "loan_totals_book_ai", "loan_totals_book_au", "loan_totals_book_bd")
+
+# Пересчет счетчиков по таблицам borrow и borrow_archive; выдачи несуществующих книг не учитываются.
+# Общие счетчики и счетчики авторов пересчитываются последними, по уже пересчитанной таблице book_stats
+BOOK_STATS_REBUILD = [
+    "DELETE FROM book_stats",
+    "INSERT INTO book_stats(book_id, active_loans, total_loans) "
+    "SELECT loans.book_id, SUM(loans.return_date IS NULL), COUNT(*) FROM ("
+    "SELECT book_id, return_date FROM borrow UNION ALL SELECT book_id, return_date FROM borrow_archive"
+    ") AS loans JOIN book ON book.id = loans.book_id GROUP BY loans.book_id",
+    "DELETE FROM author_stats",
+    "INSERT INTO author_stats(author_id, books, active_loans, total_loans) "
+    "SELECT book.author_id, COUNT(*), SUM(book_stats.active_loans), SUM(book_stats.total_loans) FROM book_stats "
+    "JOIN book ON book.id = book_stats.book_id WHERE book.author_id IS NOT NULL AND book_stats.total_loans > 0 "
+    "GROUP BY book.author_id",
+    "INSERT OR REPLACE INTO loan_summary(id, active_loans, total_loans) "
+    "SELECT 1, COALESCE(SUM(active_loans), 0), COALESCE(SUM(total_loans), 0) FROM book_stats",
+]
+
+# Триггеры ссылаются на borrow, borrow_archive и таблицы счетчиков, поэтому создаются после всех таблиц
+for statement in (*BOOK_STATS_DDL, *LOAN_TOTALS_DDL):
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="sqlite"))
@@ -0,0 +1,137 @@
+import base64
+import json
+from datetime import date
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import InstrumentedAttribute, Query
+
+
+class SortKey:
+    """
+    Описание порядка сортировки для keyset-пагинации.
+
+    Последний столбец ключа должен быть уникальным (обычно первичный ключ),
+    чтобы порядок был стабильным. Для каждого ключа должен существовать
+    индекс с теми же столбцами, иначе SQLite придется сортировать всю таблицу.
+    """
+
+    def __init__(self, *columns: InstrumentedAttribute, descending: bool = False):
+        self.columns = columns
+        self.descending = descending
+
+    def order_by(self) -> list:
+        return [column.desc() if self.descending else column.asc() for column in self.columns]
+
+    def values(self, obj: Any) -> list:
+        return [getattr(obj, column.key) for column in self.columns]
+
+
+def encode_cursor(order_by: str, values: Sequence[Any]) -> str:
+    """
+    Кодирует значения ключа сортировки последней строки страницы в непрозрачный курсор.
+
+    Args:
+        order_by (str): Имя порядка сортировки.
+        values (Sequence[Any]): Значения столбцов ключа сортировки.
+
+    Returns:
+        str: Курсор в формате base64url.
+    """
+    payload = [order_by, [value.isoformat() if isinstance(value, date) else value for value in values]]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, order_by: str, sort_key: SortKey) -> list:
+    """
+    Декодирует курсор и проверяет, что он выдан для того же порядка сортировки.
+
+    Args:
+        cursor (str): Курсор, полученный из заголовка X-Next-Cursor.
+        order_by (str): Имя текущего порядка сортировки.
+        sort_key (SortKey): Описание текущего порядка сортировки.
+
+    Returns:
+        list: Значения столбцов ключа сортировки.
+
+    Raises:
+        ValueError: Если курсор поврежден или выдан для другого порядка сортировки.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_order_by, values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_order_by != order_by or not isinstance(values, list) or len(values) != len(sort_key.columns):
+        raise ValueError("Cursor does not match the requested order")
+
+    decoded = []
+    for column, value in zip(sort_key.columns, values):
+        if value is not None and _python_type(column) is date:
+            try:
+                value = date.fromisoformat(value)
+            except (ValueError, TypeError):
+                raise ValueError("Invalid cursor")
+        decoded.append(value)
+    return decoded
+
+
+def _python_type(column) -> Optional[type]:
+    # У вычисляемых выражений (например, bm25()) тип неизвестен
+    try:
+        return column.type.python_type
+    except NotImplementedError:
+        return None
+
+
+def paginate(query: Query, sorts: dict[str, SortKey], order_by: str, skip: int, limit: int,
+             after: Optional[str] = None) -> Query:
+    """
+    Применяет к запросу сортировку, keyset-условие по курсору и skip/limit.
+
+    Args:
+        query (Query): Исходный запрос.
+        sorts (dict[str, SortKey]): Допустимые порядки сортировки.
+        order_by (str): Имя порядка сортировки.
+        skip (int): Количество строк, которые нужно пропустить.
+        limit (int): Количество строк, которые нужно вернуть.
+        after (Optional[str]): Курсор последней строки предыдущей страницы.
+
+    Returns:
+        Query: Запрос с примененной пагинацией.
+
+    Raises:
+        ValueError: Если порядок сортировки неизвестен или курсор некорректен.
+    """
+    sort_key = sorts.get(order_by)
+    if sort_key is None:
+        raise ValueError(f"Unknown order_by: {order_by}")
+
+    if after is not None:
+        values = decode_cursor(after, order_by, sort_key)
+        key = tuple_(*sort_key.columns)
+        query = query.filter(key < tuple(values) if sort_key.descending else key > tuple(values))
+
+    query = query.order_by(*sort_key.order_by())
+    if skip:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+
+def next_cursor(items: Sequence[Any], sorts: dict[str, SortKey], order_by: str, limit: int) -> Optional[str]:
+    """
+    Возвращает курсор следующей страницы или None, если страница неполная.
+
+    Args:
+        items (Sequence[Any]): Строки текущей страницы.
+        sorts (dict[str, SortKey]): Допустимые порядки сортировки.
+        order_by (str): Имя порядка сортировки.
+        limit (int): Запрошенный размер страницы.
+
+    Returns:
+        Optional[str]: Курсор следующей страницы.
+    """
+    if not items or len(items) < limit:
+        return None
+    return encode_cursor(order_by, sorts[order_by].values(items[-1]))
@@ -0,0 +1,351 @@
+import asyncio
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+import anyio
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import Engine, event
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+# Если задан, заголовок X-Profile или параметр profile должен совпадать с ним; если не задан,
+# профилирование и отчеты доступны только клиентам с локального адреса
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_DIR = os.getenv("PROFILING_DIR", "profiles")
+# Наибольшее число хранимых отчетов; самые старые удаляются при сохранении нового
+PROFILING_MAX_REPORTS = int(os.getenv("PROFILING_MAX_REPORTS", "100"))
+
+LOOPBACK_HOSTS = frozenset({"127.0.0.1", "::1", "localhost"})
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY = "profile"
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Ветви дерева вызовов короче этой доли общего времени не выводятся
+TREE_MIN_SHARE = 0.01
+TREE_MAX_DEPTH = 40
+
+# Группы собственного времени функций: (группа, признаки в имени файла или функции)
+CATEGORIES = (
+    # Ожидание: цикл событий ждет рабочий поток, рабочий поток ждет задачу или блокировку
+    ("waiting", ("select.epoll", "/selectors.py", "of '_thread.lock'", "/threading.py:wait", "/queue.py")),
+    ("sqlite", ("sqlite3", "aiosqlite")),
+    ("orm", ("/sqlalchemy/orm/",)),
+    ("sql core", ("/sqlalchemy/",)),
+    ("validation", ("pydantic",)),
+    ("serialization", ("json", "/fastapi/encoders.py")),
+    ("framework", ("/fastapi/", "/starlette/", "/anyio/", "asyncio", "/contextlib.py")),
+    ("app", (ROOT_DIR,)),
+)
+
+
+class ProfileSession:
+    """
+    Профиль одного запроса: профилировщики всех потоков запроса и выполненные SQL-запросы.
+    """
+
+    def __init__(self):
+        # Идентификатор начинается с времени создания с точностью до наносекунд: по нему упорядочиваются отчеты
+        now = time.time_ns()
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now // 10**9))}-{now % 10**9:09d}-" \
+                  f"{uuid.uuid4().hex[:8]}"
+        self.profilers: list[cProfile.Profile] = []
+        self.threads: list[threading.Thread] = []
+        self.statements: list[tuple[float, str]] = []
+        self.wall_seconds = 0.0
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.profilers[0])
+        for profiler in self.profilers[1:]:
+            stats.add(profiler)
+        return stats
+
+
+current_profile: ContextVar[Optional[ProfileSession]] = ContextVar("current_profile", default=None)
+
+# Сессии по циклам событий: рабочие потоки цикла профилируемого запроса профилируются с момента создания
+_sessions: dict[asyncio.AbstractEventLoop, ProfileSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def _thread_started(frame, event, arg):
+    # Хук threading.setprofile вызывается в каждом новом потоке. Рабочие потоки anyio
+    # хранят свой цикл событий в атрибуте loop; остальные потоки сразу снимают хук
+    thread = threading.current_thread()
+    with _sessions_lock:
+        session = _sessions.get(getattr(thread, "loop", None))
+    if session is None:
+        sys.setprofile(None)
+        return
+    profiler = cProfile.Profile()
+    with _sessions_lock:
+        session.profilers.append(profiler)
+        session.threads.append(thread)
+    profiler.enable()
+
+
+def run_profiled(handler: Callable, request: Request, session: ProfileSession) -> Response:
+    """
+    Выполняет обработчик маршрута в отдельном цикле событий текущего потока под cProfile.
+
+    Отдельный цикл нужен, чтобы в профиль не попали корутины других запросов, а его
+    рабочие потоки (синхронные эндпоинты и зависимости) обслуживают только этот запрос.
+    """
+    loop = asyncio.new_event_loop()
+    with _sessions_lock:
+        _sessions[loop] = session
+        threading.setprofile(_thread_started)
+    token = current_profile.set(session)
+    profiler = cProfile.Profile()
+    session.profilers.append(profiler)
+    started = time.perf_counter()
+    try:
+        profiler.enable()
+        try:
+            response = loop.run_until_complete(handler(request))
+        finally:
+            profiler.disable()
+            session.wall_seconds = time.perf_counter() - started
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+    finally:
+        current_profile.reset(token)
+        with _sessions_lock:
+            del _sessions[loop]
+            if not _sessions:
+                threading.setprofile(None)
+    # Рабочие потоки завершаются вместе с циклом; статистика собирается после их остановки
+    for thread in session.threads:
+        thread.join(timeout=5)
+    return response
+
+
+def capture_sql(engine: Engine) -> None:
+    """
+    Записывает SQL-запросы профилируемого запроса вместе с их временем.
+
+    Args:
+        engine (Engine): Синхронный движок (для асинхронного - AsyncEngine.sync_engine).
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_profile.get() is not None:
+            context.profile_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        session = current_profile.get()
+        if session is not None:
+            session.statements.append((time.perf_counter() - context.profile_started, statement))
+
+
+def categorize(func: tuple) -> str:
+    filename, _, name = func
+    location = f"{filename}:{name}"
+    for category, markers in CATEGORIES:
+        if any(marker in location for marker in markers):
+            return category
+    return "other"
+
+
+def format_func(func: tuple) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{os.path.relpath(filename, ROOT_DIR) if filename.startswith(ROOT_DIR) else _short_path(filename)}" \
+           f":{line}({name})"
+
+
+def _short_path(filename: str) -> str:
+    # Путь внутри site-packages или стандартной библиотеки без общего префикса
+    match = re.search(r"(?:site-packages|python\d+\.\d+)/(.+)$", filename)
+    return match.group(1) if match else filename
+
+
+def call_tree(stats: pstats.Stats, total: float) -> list[str]:
+    """
+    Строит дерево вызовов из статистики cProfile.
+
+    cProfile хранит только пары вызывающий - вызываемый, поэтому для каждого ребра
+    выводится накопленное время вызовов из этого родителя, а потомки функции
+    раскрываются только при первом появлении (повторные отмечены "..."). Ветви
+    короче TREE_MIN_SHARE общего времени не выводятся.
+    """
+    children: dict[tuple, list[tuple[float, tuple]]] = {}
+    roots = []
+    for func, (_, _, _, cumulative, callers) in stats.stats.items():
+        for caller, (_, _, _, edge_cumulative) in callers.items():
+            children.setdefault(caller, []).append((edge_cumulative, func))
+        if not callers:
+            roots.append((cumulative, func))
+
+    lines = []
+    expanded = set()
+    threshold = total * TREE_MIN_SHARE
+
+    def walk(func: tuple, seconds: float, depth: int):
+        repeated = func in expanded and func in children
+        lines.append(f"{seconds * 1000:9.2f} ms  {'  ' * depth}{format_func(func)}{' ...' if repeated else ''}")
+        if repeated or depth >= TREE_MAX_DEPTH:
+            return
+        expanded.add(func)
+        for child_seconds, child in sorted(children.get(func, ()), reverse=True):
+            if child_seconds >= threshold:
+                walk(child, child_seconds, depth + 1)
+
+    for seconds, root in sorted(roots, reverse=True):
+        if seconds >= threshold:
+            walk(root, seconds, 0)
+    return lines
+
+
+def build_report(session: ProfileSession, request: Request, status: int) -> str:
+    """
+    Формирует текстовый отчет профиля: время, SQL-запросы, время по группам и дерево вызовов.
+    """
+    stats = session.stats()
+    by_category: dict[str, float] = {}
+    for func, (_, _, own, _, _) in stats.stats.items():
+        by_category[categorize(func)] = by_category.get(categorize(func), 0.0) + own
+    profiled = sum(by_category.values()) or 1.0
+
+    url = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+    lines = [
+        f"Profile {session.id}",
+        f"Request: {request.method} {url}",
+        f"Status: {status}",
+        f"Wall time: {session.wall_seconds * 1000:.2f} ms (under profiler), threads: {len(session.profilers)}",
+        "",
+        f"SQL statements: {len(session.statements)}, {sum(s for s, _ in session.statements) * 1000:.2f} ms",
+    ]
+    for seconds, statement in session.statements:
+        lines.append(f"{seconds * 1000:9.2f} ms  {' '.join(statement.split())}")
+    lines += ["", "Own time by category:"]
+    for category, seconds in sorted(by_category.items(), key=lambda item: -item[1]):
+        lines.append(f"{seconds * 1000:9.2f} ms  {seconds / profiled * 100:5.1f}%  {category}")
+    for index, profiler in enumerate(session.profilers):
+        thread_stats = pstats.Stats(profiler)
+        title = "event loop" if index == 0 else f"worker thread {index}"
+        lines += ["", f"Call tree, {title} (cumulative time per call site):"]
+        lines += call_tree(thread_stats, sum(own for _, _, own, _, _ in thread_stats.stats.values()) or 1.0)
+
+    top = io.StringIO()
+    stats.stream = top
+    stats.sort_stats("tottime").print_stats(25)
+    lines += ["", "Top functions by own time:", top.getvalue().strip()]
+    return "\n".join(lines) + "\n"
+
+
+def save_report(session: ProfileSession, report: str) -> None:
+    """
+    Сохраняет отчет (.txt) и статистику cProfile (.prof, для pstats и snakeviz) в PROFILING_DIR.
+    """
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    with open(os.path.join(PROFILING_DIR, f"{session.id}.txt"), "w") as file:
+        file.write(report)
+    session.stats().dump_stats(os.path.join(PROFILING_DIR, f"{session.id}.prof"))
+    prune_reports(PROFILING_MAX_REPORTS)
+
+
+def prune_reports(keep: int) -> None:
+    """
+    Удаляет из PROFILING_DIR самые старые отчеты, оставляя не больше keep.
+
+    Идентификатор отчета начинается с времени создания, поэтому порядок имен файлов -
+    порядок создания. Учитываются и отчеты, сохраненные другими процессами.
+    """
+    reports = sorted(name[:-len(".txt")] for name in os.listdir(PROFILING_DIR) if name.endswith(".txt"))
+    for profile_id in reports[:max(len(reports) - max(keep, 1), 0)]:
+        for extension in (".txt", ".prof"):
+            try:
+                os.remove(os.path.join(PROFILING_DIR, f"{profile_id}{extension}"))
+            except FileNotFoundError:
+                # Отчет уже удален параллельным запросом
+                pass
+
+
+def load_report(profile_id: str) -> Optional[str]:
+    """
+    Возвращает сохраненный отчет или None, если его нет.
+    """
+    if not re.fullmatch(r"[\w-]+", profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILING_DIR, f"{profile_id}.txt")) as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def profile_request(handler: Callable, request: Request, session: ProfileSession) -> Response:
+    """
+    Выполняет запрос под профилировщиком и сохраняет отчет; идентификатор отчета добавляется в заголовок X-Profile-Id.
+    """
+    response = run_profiled(handler, request, session)
+    save_report(session, build_report(session, request, response.status_code))
+    response.headers["X-Profile-Id"] = session.id
+    return response
+
+
+def profiling_authorized(request: Request) -> bool:
+    """
+    Проверяет, может ли клиент профилировать запросы и читать отчеты.
+
+    С PROFILING_TOKEN значение заголовка X-Profile или параметра profile должно совпадать
+    с ним; без токена доступ есть только у клиентов с локального адреса.
+    """
+    if PROFILING_TOKEN:
+        value = request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_QUERY) or ""
+        return hmac.compare_digest(value.encode(), PROFILING_TOKEN.encode())
+    return request.client is not None and request.client.host in LOOPBACK_HOSTS
+
+
+def profiling_requested(request: Request) -> bool:
+    value = request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_QUERY)
+    if not value or value == "0":
+        return False
+    return profiling_authorized(request)
+
+
+class ProfilingRoute(APIRoute):
+    """
+    Маршрут, который по запросу выполняет обработку под профилировщиком.
+
+    Профилирование включается настройкой PROFILING_ENABLED и для отдельного запроса -
+    заголовком X-Profile или параметром profile. В профиль входят разбор параметров,
+    зависимости, эндпоинт, валидация и сериализация ответа. Отчет сохраняется в
+    PROFILING_DIR, его идентификатор возвращается в заголовке X-Profile-Id. Остальные
+    запросы обрабатываются без изменений.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        if not PROFILING_ENABLED:
+            return handler
+
+        async def profiling_handler(request: Request) -> Response:
+            if not profiling_requested(request):
+                return await handler(request)
+
+            # Тело читается в текущем цикле событий: в цикле профилировщика оно отдается из памяти
+            body = await request.body()
+
+            async def receive():
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            session = ProfileSession()
+            return await anyio.to_thread.run_sync(profile_request, handler, Request(request.scope, receive), session)
+
+        return profiling_handler
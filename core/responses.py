@@ -0,0 +1,77 @@
+from typing import Optional, Sequence
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from sqlalchemy import Column, Row
+
+
+def schema_columns(model, schema: type[BaseModel]) -> tuple[Column, ...]:
+    """
+    Возвращает столбцы таблицы модели, которые входят в схему ответа.
+
+    Args:
+        model: ORM-модель.
+        schema (type[BaseModel]): Pydantic-схема ответа.
+
+    Returns:
+        tuple[Column, ...]: Столбцы в порядке полей схемы.
+    """
+    return tuple(model.__table__.c[name] for name in schema.model_fields)
+
+
+def batch_get_response(ids: Sequence[int], rows: Sequence[Row]) -> ORJSONResponse:
+    """
+    Формирует ответ пакетного чтения: найденные строки в порядке запроса и ненайденные идентификаторы.
+
+    Args:
+        ids (Sequence[int]): Запрошенные идентификаторы без повторов.
+        rows (Sequence[Row]): Найденные строки со столбцом id.
+
+    Returns:
+        ORJSONResponse: Ответ вида {"items": [...], "not_found": [...]}.
+    """
+    found = {row.id: row for row in rows}
+    return ORJSONResponse({
+        "items": [found[entity_id]._asdict() for entity_id in ids if entity_id in found],
+        "not_found": [entity_id for entity_id in ids if entity_id not in found],
+    })
+
+
+def batch_write_response(outcomes: Sequence[tuple[Optional[Row], Optional[str]]]) -> ORJSONResponse:
+    """
+    Формирует ответ пакетной записи: результат каждого элемента в порядке запроса и итоговые счетчики.
+
+    Args:
+        outcomes (Sequence[tuple[Optional[Row], Optional[str]]]): Для каждого элемента строка или текст ошибки.
+
+    Returns:
+        ORJSONResponse: Ответ вида {"results": [{"ok", "item", "error"}, ...], "succeeded": n, "failed": m}.
+    """
+    results = [{"ok": error is None, "item": row._asdict() if row is not None else None, "error": error}
+               for row, error in outcomes]
+    succeeded = sum(result["ok"] for result in results)
+    return ORJSONResponse({"results": results, "succeeded": succeeded, "failed": len(results) - succeeded})
+
+
+def rows_response(rows: Sequence[Row], cursor: Optional[str] = None, etag: Optional[str] = None) -> ORJSONResponse:
+    """
+    Формирует ответ со списком строк, выбранных по столбцам схемы.
+
+    Строки не проходят валидацию схемой: типы столбцов уже совпадают с полями
+    схемы, а orjson сериализует даты и None сам. Курсор следующей страницы
+    передается в заголовке X-Next-Cursor, ETag страницы - в заголовке ETag.
+
+    Args:
+        rows (Sequence[Row]): Строки результата запроса.
+        cursor (Optional[str]): Курсор следующей страницы.
+        etag (Optional[str]): ETag страницы.
+
+    Returns:
+        ORJSONResponse: Ответ со списком объектов.
+    """
+    headers = {}
+    if cursor is not None:
+        headers["X-Next-Cursor"] = cursor
+    if etag is not None:
+        headers["ETag"] = etag
+    return ORJSONResponse([row._asdict() for row in rows], headers=headers)
@@ -18,6 +18,8 @@ class AuthorUpdate(AuthorBase):
 
 class Author(AuthorBase):
     id: int
+    # Версия строки; в заголовке ETag передается она же
+    version: int
 
     class Config:
         from_attributes = True
@@ -0,0 +1,46 @@
+from typing import Generic, List, Optional, TypeVar
+
+from pydantic import BaseModel, Field
+
+# Ограничение размера пакета: идентификаторы передаются в IN (...) параметрами запроса
+MAX_BATCH_SIZE = 1000
+
+
+class IdList(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+T = TypeVar("T")
+
+
+class BatchGetResult(BaseModel, Generic[T]):
+    items: List[T] = []
+    not_found: List[int] = []
+
+
+class BatchItemResult(BaseModel, Generic[T]):
+    ok: bool
+    item: Optional[T] = None
+    error: Optional[str] = None
+
+
+class BatchWriteResult(BaseModel, Generic[T]):
+    # Результаты в порядке элементов запроса
+    results: List[BatchItemResult[T]] = []
+    succeeded: int = 0
+    failed: int = 0
+
+
+class BatchDeleteResult(BaseModel):
+    deleted: List[int] = []
+    not_found: List[int] = []
+
+
+def batch_delete_result(requested_ids: List[int], deleted_ids: List[int]) -> BatchDeleteResult:
+    """
+    Формирует ответ пакетного удаления с разделением на удаленные и ненайденные идентификаторы.
+    """
+    deleted = set(deleted_ids)
+    not_found = [entity_id for entity_id in dict.fromkeys(requested_ids) if entity_id not in deleted]
+    return BatchDeleteResult(deleted=sorted(deleted), not_found=not_found)
+
@@ -21,6 +21,10 @@ class BookUpdate(BookBase):
 
 class Book(BookBase):
     id: int
+    # После удаления автора его книги остаются без автора
+    author_id: Optional[int] = None
+    # Версия строки; в заголовке ETag передается она же
+    version: int
 
     class Config:
         from_attributes = True
@@ -1,32 +1,60 @@
-from typing import Optional
+from typing import List, Optional
 
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, model_validator
 from datetime import date
 
+from core.schemas.batch import MAX_BATCH_SIZE
+
 
 class BorrowBase(BaseModel):
     book_id: int
-    reader_name: str
+    reader_id: int
     borrow_date: date
     return_date: Optional[date] = None
 
-    @field_validator('return_date', mode='before')
-    def format_return_date(cls, v):
-        if isinstance(v, date):
-            return v.isoformat()  # Преобразуем дату в строку формата 'YYYY-MM-DD'
-        return v
-
 
 class BorrowCreate(BorrowBase):
-    pass
+    # Читателя можно указать по имени: он будет найден или создан при выдаче
+    reader_id: Optional[int] = None
+    reader_name: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_reader(self) -> "BorrowCreate":
+        if (self.reader_id is None) == (self.reader_name is None):
+            raise ValueError("Exactly one of reader_id and reader_name is required")
+        return self
 
 
 class BorrowUpdate(BorrowBase):
     pass
 
 
+class BorrowImport(BorrowBase):
+    # Загружается только история: активная выдача должна уменьшать остаток книги и учитывать
+    # лимит читателя, поэтому она создается через /borrows/ или /borrows/batch
+    return_date: date
+
+
+class BorrowBatch(BaseModel):
+    items: List[BorrowCreate] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+    # True - при ошибке в любом элементе пакет не применяется целиком, False - применяются успешные элементы
+    atomic: bool = True
+
+
+class ReturnItem(BaseModel):
+    borrow_id: int
+    return_date: date
+
+
+class ReturnBatch(BaseModel):
+    items: List[ReturnItem] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+    atomic: bool = True
+
+
 class Borrow(BorrowBase):
     id: int
+    # Версия строки; в заголовке ETag передается она же
+    version: int
 
     class Config:
         from_attributes = True
@@ -0,0 +1,16 @@
+from typing import List
+
+from pydantic import BaseModel
+
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportSummary(BaseModel):
+    inserted: int = 0
+    failed: int = 0
+    # Список ограничен, чтобы ответ не рос вместе с размером загрузки
+    errors: List[ImportRowError] = []
+    errors_truncated: bool = False
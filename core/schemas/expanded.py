@@ -0,0 +1,14 @@
+from typing import List, Optional
+
+from core.schemas.author import Author
+from core.schemas.book import Book
+
+
+# Вложенные схемы ответов для параметра expand. Вынесены в отдельный модуль,
+# так как схемы книг и авторов ссылаются друг на друга.
+class BookWithAuthor(Book):
+    author: Optional[Author] = None
+
+
+class AuthorWithBooks(Author):
+    books: List[Book] = []
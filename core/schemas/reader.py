@@ -0,0 +1,20 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class ReaderBase(BaseModel):
+    name: str = Field(min_length=1)
+
+
+class ReaderCreate(ReaderBase):
+    # Если не задан, используется DEFAULT_LOAN_LIMIT
+    loan_limit: Optional[int] = Field(default=None, ge=0)
+
+
+class Reader(ReaderBase):
+    id: int
+    loan_limit: int
+    active_loans: int
+
+    class Config:
+        from_attributes = True
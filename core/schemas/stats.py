@@ -0,0 +1,31 @@
+from datetime import date
+
+from pydantic import BaseModel
+from typing import Optional
+
+
+class BookCirculation(BaseModel):
+    book_id: int
+    title: str
+    author_id: Optional[int] = None
+    active_loans: int
+    total_loans: int
+
+
+class AuthorCirculation(BaseModel):
+    author_id: int
+    first_name: str
+    last_name: str
+    # Число книг автора, которые выдавались хотя бы раз
+    books: int
+    active_loans: int
+    total_loans: int
+
+
+class CirculationSummary(BaseModel):
+    active_loans: int
+    total_loans: int
+    overdue_loans: int
+    # Дата, на которую считаются просроченные выдачи, и срок выдачи в днях
+    as_of: date
+    loan_period_days: int
@@ -0,0 +1,217 @@
+import contextvars
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from sqlalchemy.orm import Session, SessionTransaction
+
+from core.cache import entity_cache
+from core.metrics import metrics
+
+# Очередь записи выключена по умолчанию: каждый запрос фиксирует свою транзакцию сам
+WRITE_QUEUE_ENABLED = os.getenv("WRITE_QUEUE_ENABLED", "0") == "1"
+# Наибольшее число операций, ожидающих записи; при переполнении запрос получает 503
+WRITE_QUEUE_MAXSIZE = int(os.getenv("WRITE_QUEUE_MAXSIZE", "1000"))
+# Наибольшее число операций в одной транзакции
+WRITE_QUEUE_MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "64"))
+
+
+class WriteQueueFull(Exception):
+    """
+    Очередь записи заполнена; запрос нужно повторить позже.
+    """
+
+
+class GroupSession(Session):
+    """
+    Сессия пакета записи, в которой каждая операция выполняется в своей точке сохранения.
+
+    Методы CRUD-классов сами вызывают commit и rollback. Внутри операции commit
+    только сбрасывает изменения в базу, а rollback откатывает изменения этой
+    операции, не затрагивая остальные операции пакета. Транзакцию пакета
+    фиксирует WriteQueue после выполнения всех операций.
+    """
+
+    _operation: Optional[SessionTransaction] = None
+
+    def begin_operation(self) -> None:
+        # Объекты предыдущих операций отсоединяются: их уже вернули вызывающим, а следующая
+        # операция должна читать строки из базы, а не из карты идентичности
+        self.expunge_all()
+        self._operation = self.begin_nested()
+        # SAVEPOINT выполняется сразу, вне контекста запроса: в Server-Timing входит только SQL самой операции
+        self.connection()
+
+    def end_operation(self, succeeded: bool) -> None:
+        operation, self._operation = self._operation, None
+        if operation.is_active:
+            if succeeded:
+                operation.commit()
+            else:
+                operation.rollback()
+
+    def commit(self) -> None:
+        if self._operation is None:
+            super().commit()
+        else:
+            self.flush()
+
+    def rollback(self) -> None:
+        if self._operation is None:
+            super().rollback()
+            return
+        if self._operation.is_active:
+            self._operation.rollback()
+        # Операция может продолжить работу после отката (например, проверить, существует ли строка)
+        self._operation = self.begin_nested()
+
+
+class WriteOperation:
+    """
+    Операция в очереди записи: функция CRUD-класса, ее аргументы и Future для результата.
+    """
+    __slots__ = ("function", "kwargs", "context", "future", "submitted")
+
+    def __init__(self, function: Callable[..., Any], kwargs: dict):
+        self.function = function
+        self.kwargs = kwargs
+        # Операция выполняется в контексте запроса: SQL учитывается в метриках и профиле запроса
+        self.context = contextvars.copy_context()
+        self.future: Future = Future()
+        self.submitted = time.perf_counter()
+
+
+class WriteQueue:
+    """
+    Очередь записи с групповой фиксацией (group commit).
+
+    Один поток-писатель забирает из очереди все накопившиеся операции (не больше
+    max_batch), выполняет их в одной транзакции BEGIN IMMEDIATE, каждую в своей
+    точке сохранения, и фиксирует транзакцию один раз. Каждый вызывающий получает
+    результат или исключение своей операции; ошибка одной операции не отменяет
+    остальные. Пока писатель фиксирует пакет, новые операции накапливаются для
+    следующего, поэтому запросы не соревнуются за блокировку записи SQLite и
+    платят за fsync один раз на пакет.
+    """
+
+    _STOP = object()
+
+    def __init__(self, session_factory: Callable[[], GroupSession], maxsize: int = WRITE_QUEUE_MAXSIZE,
+                 max_batch: int = WRITE_QUEUE_MAX_BATCH):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> "WriteQueue":
+        """
+        Запускает поток-писатель; повторный вызов для запущенной очереди ничего не делает.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Останавливает писателя после выполнения уже поставленных операций.
+
+        Новые операции после вызова не принимаются (WriteQueueFull), поэтому ни одна
+        принятая операция не остается без ответа. Очередь можно запустить снова.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            # Маркер ставится под блокировкой: все принятые операции оказываются в очереди до него
+            self._queue.put(self._STOP)
+        thread.join()
+
+    def submit(self, function: Callable[..., Any], **kwargs: Any) -> Future:
+        """
+        Ставит операцию в очередь записи.
+
+        Args:
+            function (Callable[..., Any]): Метод CRUD-класса; первым аргументом получает сессию.
+            **kwargs (Any): Остальные аргументы метода.
+
+        Returns:
+            Future: Результат или исключение операции после фиксации пакета.
+
+        Raises:
+            WriteQueueFull: Если очередь заполнена или остановлена.
+        """
+        operation = WriteOperation(function, kwargs)
+        with self._lock:
+            if self._thread is None:
+                raise WriteQueueFull("Write queue is stopped")
+            try:
+                self._queue.put_nowait(operation)
+            except queue.Full:
+                metrics.write_rejected()
+                raise WriteQueueFull("Write queue is full")
+        metrics.write_queue_depth(self._queue.qsize())
+        return operation.future
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = self._STOP in batch
+            operations = [operation for operation in batch if operation is not self._STOP]
+            metrics.write_queue_depth(self._queue.qsize())
+            if operations:
+                self._commit_batch(operations)
+            if stop:
+                return
+
+    def _commit_batch(self, operations: list[WriteOperation]) -> None:
+        started = time.perf_counter()
+        outcomes: list[tuple[WriteOperation, Any, Optional[BaseException]]] = []
+        invalidations: set[tuple[str, int]] = set()
+        try:
+            with self.session_factory() as db:
+                # Блокировка записи берется сразу: операции пакета не ждут ее по отдельности
+                db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+                for operation in operations:
+                    db.begin_operation()
+                    try:
+                        result = operation.context.run(operation.function, db, **operation.kwargs)
+                    except Exception as e:
+                        db.end_operation(succeeded=False)
+                        outcomes.append((operation, None, e))
+                    else:
+                        db.end_operation(succeeded=True)
+                        invalidations |= db.info.pop("cache_invalidations", set())
+                        outcomes.append((operation, result, None))
+                    db.info.pop("cache_invalidations", None)
+                db.commit()
+        except Exception as e:
+            # Транзакция пакета не зафиксирована: ни одна операция не применена
+            for operation in operations:
+                operation.future.set_exception(e)
+            return
+        finally:
+            metrics.write_batch_finished(len(operations), [started - operation.submitted for operation in operations])
+
+        # Кэш сбрасывается только после фиксации пакета
+        for kind, entity_id in invalidations:
+            entity_cache.invalidate(kind, entity_id)
+        for operation, result, error in outcomes:
+            if error is None:
+                operation.future.set_result(result)
+            else:
+                operation.future.set_exception(error)
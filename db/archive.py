@@ -0,0 +1,105 @@
+"""
+Перенос давно возвращенных выдач из borrow в архив borrow_archive.
+
+Выдачи, возвращенные более ARCHIVE_AFTER_DAYS дней назад, переносятся пакетами
+по ARCHIVE_BATCH_SIZE, каждый пакет - отдельной короткой транзакцией, с паузой
+ARCHIVE_PAUSE секунд между пакетами, чтобы запросы на запись не ждали блокировку.
+Если задан ARCHIVE_INTERVAL (секунды), приложение запускает архивирование
+в фоновом потоке с этим интервалом между проходами.
+
+Запуск для базы из DATABASE_URL:
+    python -m db.archive
+    python -m db.archive --as-of 2024-01-01 --batch-size 1000
+"""
+import logging
+import os
+import threading
+import time
+from datetime import date
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+from core.cruds.archive import ARCHIVE_BATCH_SIZE, ArchiveCRUD
+
+# Интервал между проходами фонового архивирования в секундах; 0 - фоновое архивирование выключено
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "0"))
+# Пауза между пакетами в секундах
+ARCHIVE_PAUSE = float(os.getenv("ARCHIVE_PAUSE", "0.05"))
+
+archive_log = logging.getLogger("library.archive")
+
+
+def archive_all(session_factory: Callable[[], Session], as_of: date, batch_size: int = ARCHIVE_BATCH_SIZE,
+                pause: float = ARCHIVE_PAUSE, stop: Optional[threading.Event] = None) -> int:
+    """
+    Переносит в архив все подходящие выдачи пакетами, пока они не закончатся.
+
+    Args:
+        session_factory (Callable[[], Session]): Фабрика сессий для записи.
+        as_of (date): Дата, от которой отсчитывается ARCHIVE_AFTER_DAYS.
+        batch_size (int, optional): Размер пакета. Defaults to ARCHIVE_BATCH_SIZE.
+        pause (float, optional): Пауза между пакетами в секундах. Defaults to ARCHIVE_PAUSE.
+        stop (Optional[threading.Event], optional): Событие остановки; проверяется между пакетами. Defaults to None.
+
+    Returns:
+        int: Количество перенесенных выдач.
+    """
+    before = ArchiveCRUD.archive_cutoff(as_of)
+    total = 0
+    while stop is None or not stop.is_set():
+        with session_factory() as db:
+            moved = ArchiveCRUD.archive_returned(db, before=before, limit=batch_size)
+        total += moved
+        if moved < batch_size:
+            break
+        if stop is not None:
+            stop.wait(pause)
+        else:
+            time.sleep(pause)
+    return total
+
+
+class Archiver:
+    """
+    Фоновый поток, который периодически переносит в архив давно возвращенные выдачи.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], interval: float = ARCHIVE_INTERVAL,
+                 batch_size: int = ARCHIVE_BATCH_SIZE):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self.archived = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="borrow-archiver", daemon=True)
+
+    def start(self) -> "Archiver":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.archived += archive_all(self.session_factory, date.today(), self.batch_size, stop=self._stop)
+            except Exception:
+                # Например, database is locked при долгой конкурирующей записи: повтор на следующем проходе
+                archive_log.exception("Borrow archiving failed")
+            self._stop.wait(self.interval)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Перенос давно возвращенных выдач в архив")
+    parser.add_argument("--as-of", type=date.fromisoformat, default=date.today(),
+                        help="Дата, от которой отсчитывается ARCHIVE_AFTER_DAYS (по умолчанию сегодня)")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    print(f"Archived loans: {archive_all(SessionLocal, args.as_of, args.batch_size)}")
@@ -1,25 +1,76 @@
 import os
 from datetime import datetime
 
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from core.models.author import Author
-from core.models.base import Base
 from core.models.book import Book
 from core.models.borrow import Borrow
+from core.models.reader import Reader
+from core.metrics import METRICS_ENABLED, instrument_engine
+from core.profiling import PROFILING_ENABLED, capture_sql
+from core.write_queue import WRITE_QUEUE_ENABLED, GroupSession, WriteQueue
 from sqlalchemy.orm import Session
+from db.migrations import upgrade_db
+from db.profiles import build_async_engine, build_engine, get_profile
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./library.db")
+# Реплика для чтения; по умолчанию чтение идет из той же базы через отдельный пул
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL", DATABASE_URL)
 
-engine = create_engine(DATABASE_URL, echo=True)
+# Режим работы эндпоинтов: "sync" (по умолчанию) или "async"
+DB_MODE = os.getenv("DB_MODE", "sync")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1))
+ASYNC_READ_DATABASE_URL = os.getenv("ASYNC_READ_DATABASE_URL",
+                                    READ_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1))
+
+# HTTP-методы, которые обслуживаются сессиями для чтения
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Параметры движков (вывод SQL, пул соединений, PRAGMA) задаются профилем DB_PROFILE: dev, test или prod
+profile = get_profile()
+
+# Запись идет через небольшой отдельный пул, чтение - через пул соединений в режиме query_only,
+# поэтому запросы на чтение не ждут соединений, занятых записью
+engine = build_engine(DATABASE_URL, profile)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+read_engine = build_engine(READ_DATABASE_URL, profile, read_only=True)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Очередь записи с групповой фиксацией (WRITE_QUEUE_ENABLED=1): изменяющие запросы выполняются одним потоком,
+# по нескольку в транзакции. expire_on_commit=False: результаты операций читаются после закрытия сессии пакета
+# Очередь запускается при импорте; lifespan приложения останавливает ее, дождавшись принятых операций
+WriteSessionLocal = sessionmaker(bind=engine, class_=GroupSession, autoflush=False, expire_on_commit=False)
+write_queue = WriteQueue(WriteSessionLocal).start() if WRITE_QUEUE_ENABLED else None
+
+# Асинхронный движок создается только в async-режиме, чтобы синхронный режим не требовал aiosqlite
+async_engine = None
+async_read_engine = None
+AsyncSessionLocal: async_sessionmaker[AsyncSession] | None = None
+AsyncReadSessionLocal: async_sessionmaker[AsyncSession] | None = None
+if DB_MODE == "async":
+    async_engine = build_async_engine(ASYNC_DATABASE_URL, profile)
+    async_read_engine = build_async_engine(ASYNC_READ_DATABASE_URL, profile, read_only=True)
+    # expire_on_commit=False: после коммита атрибуты не должны подгружаться лениво вне greenlet
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine, autoflush=False, expire_on_commit=False)
+
+# Подсчет SQL-запросов и их времени для /metrics и заголовка Server-Timing, запись SQL в профили запросов
+for instrumented in (engine, read_engine, async_engine, async_read_engine):
+    if instrumented is not None:
+        if METRICS_ENABLED:
+            instrument_engine(getattr(instrumented, "sync_engine", instrumented))
+        if PROFILING_ENABLED:
+            capture_sql(getattr(instrumented, "sync_engine", instrumented))
 
 
 def create_db():
-    if not os.path.exists("library.db"):
-        # Создание всех таблиц
-        Base.metadata.create_all(bind=engine)
+    is_new = not os.path.exists("library.db")
+
+    # Создание таблиц для новой базы или обновление схемы и индексов существующей
+    upgrade_db(engine)
 
+    if is_new:
         # Заполнение тестовыми данными
         db: Session = SessionLocal()
         try:
@@ -55,14 +106,18 @@ def create_db():
             db.add_all(books)
             db.commit()
 
+            # Добавление читателей
+            readers = [Reader(name=name) for name in ("Alice", "Bob", "Charlie", "Diana", "Eve")]
+            db.add_all(readers)
+            db.commit()
+
             # Добавление записей о выдаче
             borrows = [
-                Borrow(book_id=1, reader_name="Alice", borrow_date=datetime.strptime("2023-01-01", '%Y-%m-%d').date()),
-                Borrow(book_id=2, reader_name="Bob", borrow_date=datetime.strptime("2023-01-05", '%Y-%m-%d').date()),
-                Borrow(book_id=3, reader_name="Charlie",
-                       borrow_date=datetime.strptime("2023-01-10", '%Y-%m-%d').date()),
-                Borrow(book_id=4, reader_name="Diana", borrow_date=datetime.strptime("2023-01-15", '%Y-%m-%d').date()),
-                Borrow(book_id=5, reader_name="Eve", borrow_date=datetime.strptime("2023-01-20", '%Y-%m-%d').date()),
+                Borrow(book_id=1, reader_id=1, borrow_date=datetime.strptime("2023-01-01", '%Y-%m-%d').date()),
+                Borrow(book_id=2, reader_id=2, borrow_date=datetime.strptime("2023-01-05", '%Y-%m-%d').date()),
+                Borrow(book_id=3, reader_id=3, borrow_date=datetime.strptime("2023-01-10", '%Y-%m-%d').date()),
+                Borrow(book_id=4, reader_id=4, borrow_date=datetime.strptime("2023-01-15", '%Y-%m-%d').date()),
+                Borrow(book_id=5, reader_id=5, borrow_date=datetime.strptime("2023-01-20", '%Y-%m-%d').date()),
             ]
             db.add_all(borrows)
             db.commit()
@@ -0,0 +1,231 @@
+"""
+Обновление схемы существующих баз данных.
+
+Версия схемы хранится в PRAGMA user_version. Новые таблицы создаются через
+create_all, изменения существующих таблиц (новые столбцы, перенос данных)
+описываются функциями в MIGRATIONS и применяются по порядку. Недостающие
+индексы, объявленные в моделях, создаются при каждом обновлении.
+
+Запуск для базы из DATABASE_URL:
+    python -m db.migrations
+    python -m db.migrations --rebuild-search   # дополнительно перестроить полнотекстовый индекс
+    python -m db.migrations --rebuild-stats    # дополнительно пересчитать счетчики выдач книг и читателей
+"""
+from typing import Callable
+
+from sqlalchemy import Connection, Engine, inspect, text
+from sqlalchemy.schema import CreateTable
+
+# Импорт моделей регистрирует их таблицы в Base.metadata
+from core.models.author import Author  # noqa: F401
+from core.models.base import Base
+from core.models.book import Book, BOOK_FTS_DDL, BOOK_FTS_REBUILD  # noqa: F401
+from core.models.borrow import Borrow, BorrowArchive  # noqa: F401
+from core.models.reader import (  # noqa: F401
+    Reader, DEFAULT_LOAN_LIMIT, READER_LOANS_DDL, READER_LOANS_REBUILD, READER_LOANS_TRIGGERS,
+)
+from core.models.stats import (  # noqa: F401
+    AuthorStats, BookStats, LoanSummary, BOOK_STATS_DDL, BOOK_STATS_REBUILD, BOOK_STATS_TRIGGERS, LOAN_TOTALS_DDL,
+)
+
+
+def add_book_fts(conn: Connection) -> None:
+    """
+    Создает полнотекстовый индекс книг с триггерами и заполняет его существующими книгами.
+    """
+    for statement in BOOK_FTS_DDL:
+        conn.exec_driver_sql(statement)
+    rebuild_book_fts(conn)
+
+
+def rebuild_book_fts(conn: Connection) -> None:
+    """
+    Перестраивает полнотекстовый индекс книг по содержимому таблицы book.
+    """
+    conn.exec_driver_sql(BOOK_FTS_REBUILD)
+
+
+def add_row_versions(conn: Connection) -> None:
+    """
+    Добавляет столбец version в таблицы author, book и borrow; существующие строки получают версию 1.
+
+    Индекс активных выдач удаляется и создается заново с return_date в ключе
+    (см. модель Borrow) вместе с остальными недостающими индексами.
+    """
+    inspector = inspect(conn)
+    for table in ("author", "book", "borrow"):
+        if "version" not in {column["name"] for column in inspector.get_columns(table)}:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_borrow_active_book_id")
+
+
+def add_book_stats(conn: Connection) -> None:
+    """
+    Создает триггеры счетчиков выдач и заполняет таблицу book_stats по существующим выдачам.
+    """
+    for statement in BOOK_STATS_DDL:
+        conn.exec_driver_sql(statement)
+    rebuild_book_stats(conn)
+
+
+def rebuild_book_stats(conn: Connection) -> None:
+    """
+    Пересчитывает счетчики выдач книг, авторов и общие счетчики, исправляя возможные расхождения.
+    """
+    for statement in BOOK_STATS_REBUILD:
+        conn.exec_driver_sql(statement)
+
+
+def add_readers(conn: Connection) -> None:
+    """
+    Заменяет имя читателя в borrow ссылкой reader_id на таблицу reader.
+
+    Каждое различное имя становится одним читателем (в порядке первой выдачи),
+    затем столбец reader_name и его индекс удаляются. SQLite не позволяет
+    добавить столбец NOT NULL без значения по умолчанию, поэтому в обновленной
+    базе reader_id допускает NULL на уровне схемы; приложение всегда его заполняет.
+    """
+    if "reader_name" in {column["name"] for column in inspect(conn).get_columns("borrow")}:
+        conn.execute(
+            text("INSERT INTO reader (name, loan_limit) "
+                 "SELECT reader_name, :loan_limit FROM borrow GROUP BY reader_name ORDER BY MIN(id)"),
+            {"loan_limit": DEFAULT_LOAN_LIMIT},
+        )
+        conn.exec_driver_sql("ALTER TABLE borrow ADD COLUMN reader_id INTEGER REFERENCES reader (id)")
+        conn.exec_driver_sql("UPDATE borrow SET reader_id = (SELECT id FROM reader WHERE name = borrow.reader_name)")
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_borrow_reader_name")
+        conn.exec_driver_sql("ALTER TABLE borrow DROP COLUMN reader_name")
+    for statement in READER_LOANS_DDL:
+        conn.exec_driver_sql(statement)
+    rebuild_reader_loans(conn)
+
+
+def rebuild_reader_loans(conn: Connection) -> None:
+    """
+    Пересчитывает счетчики активных выдач читателей по таблице borrow.
+    """
+    for statement in READER_LOANS_REBUILD:
+        conn.exec_driver_sql(statement)
+
+
+def add_borrow_archive(conn: Connection) -> None:
+    """
+    Пересоздает таблицу borrow с AUTOINCREMENT для архива выдач borrow_archive.
+
+    Без AUTOINCREMENT SQLite выдает новой строке идентификатор max(id) + 1, и после
+    переноса или удаления последних выдач новая выдача могла бы получить
+    идентификатор выдачи из архива. SQLite не позволяет изменить это свойство
+    существующей таблицы, поэтому строки копируются в новую таблицу. Триггеры
+    счетчиков создаются заново: перенос в архив не должен уменьшать счетчики книг.
+    Таблица borrow_archive создается через create_all.
+    """
+    for trigger in (*BOOK_STATS_TRIGGERS, *READER_LOANS_TRIGGERS):
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+    for index in inspect(conn).get_indexes("borrow"):
+        conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index['name']}")
+    conn.exec_driver_sql("ALTER TABLE borrow RENAME TO borrow_old")
+    # Индексы создаются после копирования строк, в create_missing_indexes
+    conn.execute(CreateTable(Borrow.__table__))
+    columns = ", ".join(column.name for column in Borrow.__table__.c)
+    conn.exec_driver_sql(f"INSERT INTO borrow ({columns}) SELECT {columns} FROM borrow_old")
+    conn.exec_driver_sql("DROP TABLE borrow_old")
+    for statement in (*BOOK_STATS_DDL, *READER_LOANS_DDL):
+        conn.exec_driver_sql(statement)
+
+
+def add_loan_totals(conn: Connection) -> None:
+    """
+    Создает триггеры общих счетчиков выдач и счетчиков авторов и заполняет их по book_stats.
+
+    Таблицы loan_summary и author_stats создаются через create_all.
+    """
+    for statement in LOAN_TOTALS_DDL:
+        conn.exec_driver_sql(statement)
+    rebuild_book_stats(conn)
+
+
+# Миграции по порядку: миграция с индексом i переводит схему на версию i + 1
+MIGRATIONS: list[Callable[[Connection], None]] = [
+    add_book_fts,
+    add_row_versions,
+    add_book_stats,
+    add_readers,
+    add_borrow_archive,
+    add_loan_totals,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(conn: Connection) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def set_schema_version(conn: Connection, version: int) -> None:
+    # PRAGMA не поддерживает параметры запроса
+    conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+
+def create_missing_indexes(conn: Connection) -> list[str]:
+    """
+    Создает индексы, объявленные в моделях, но отсутствующие в базе.
+
+    Args:
+        conn (Connection): Соединение с базой данных.
+
+    Returns:
+        list[str]: Имена созданных индексов.
+    """
+    inspector = inspect(conn)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+                created.append(index.name)
+    return created
+
+
+def upgrade_db(engine: Engine) -> list[str]:
+    """
+    Приводит схему базы данных к текущему состоянию моделей.
+
+    Для новой базы таблицы создаются сразу в актуальном виде, и миграции не выполняются.
+
+    Args:
+        engine (Engine): Движок базы данных.
+
+    Returns:
+        list[str]: Имена созданных индексов.
+    """
+    with engine.begin() as conn:
+        is_new = not inspect(conn).get_table_names()
+        Base.metadata.create_all(bind=conn)
+        if not is_new:
+            for migration in MIGRATIONS[get_schema_version(conn):]:
+                migration(conn)
+        set_schema_version(conn, SCHEMA_VERSION)
+        return create_missing_indexes(conn)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from db.database import engine
+
+    parser = argparse.ArgumentParser(description="Обновление схемы базы данных из DATABASE_URL")
+    parser.add_argument("--rebuild-search", action="store_true", help="Перестроить полнотекстовый индекс книг")
+    parser.add_argument("--rebuild-stats", action="store_true", help="Пересчитать счетчики выдач книг и читателей")
+    args = parser.parse_args()
+
+    created_indexes = upgrade_db(engine)
+    if args.rebuild_search:
+        with engine.begin() as connection:
+            rebuild_book_fts(connection)
+    if args.rebuild_stats:
+        with engine.begin() as connection:
+            rebuild_book_stats(connection)
+            rebuild_reader_loans(connection)
+    print(f"Schema version: {SCHEMA_VERSION}")
+    print(f"Created indexes: {', '.join(created_indexes) or 'none'}")
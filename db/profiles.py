@@ -0,0 +1,189 @@
+"""
+Профили настройки движков базы данных.
+
+Профиль выбирается переменной окружения DB_PROFILE (dev, test или prod, по умолчанию prod) и задает
+параметры движка, размеры пула соединений и PRAGMA, которые выполняются для
+каждого нового соединения с SQLite.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Optional, Union
+
+from sqlalchemy import Engine, create_engine, event, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import QueuePool
+
+# По умолчанию prod: вывод SQL с параметрами включается только явно выбранным профилем dev
+DEFAULT_DB_PROFILE = "prod"
+DB_PROFILE = os.getenv("DB_PROFILE", DEFAULT_DB_PROFILE)
+
+
+@dataclass(frozen=True)
+class EngineProfile:
+    """
+    Настройки движка базы данных.
+
+    Запись в SQLite всегда выполняется одним соединением за раз, поэтому пул
+    для записи небольшой, а пул для чтения рассчитан на параллельные запросы.
+    Параметры пула применяются только к пулам с очередью соединений: для SQLite
+    в памяти SQLAlchemy использует пул из одного соединения на поток, а
+    aiosqlite в этой версии SQLAlchemy работает без пула.
+    """
+    name: str
+    echo: bool = False
+    pool_size: int = 5
+    max_overflow: int = 10
+    read_pool_size: int = 10
+    read_max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_pre_ping: bool = False
+    # PRAGMA выполняются по порядку при открытии каждого соединения
+    pragmas: dict[str, Union[str, int]] = field(default_factory=dict)
+
+
+PROFILES: dict[str, EngineProfile] = {
+    # Разработка: вывод SQL в консоль, WAL, чтобы чтение не блокировало запись
+    "dev": EngineProfile(
+        name="dev",
+        echo=True,
+        pool_size=2,
+        max_overflow=3,
+        pragmas={
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,
+        },
+    ),
+    # Тесты: надежность записи на диск не нужна, временные таблицы в памяти
+    "test": EngineProfile(
+        name="test",
+        pool_size=5,
+        max_overflow=5,
+        read_pool_size=20,
+        read_max_overflow=20,
+        pragmas={
+            "journal_mode": "WAL",
+            "synchronous": "OFF",
+            "temp_store": "MEMORY",
+            "busy_timeout": 10000,
+        },
+    ),
+    # Эксплуатация: WAL с synchronous=NORMAL (коммит не ждет fsync, но база не
+    # повреждается при сбое), большой кэш страниц и отображение файла в память
+    "prod": EngineProfile(
+        name="prod",
+        pool_size=4,
+        max_overflow=4,
+        read_pool_size=32,
+        read_max_overflow=32,
+        pool_timeout=10,
+        pragmas={
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,
+            "cache_size": -65536,  # 64 МБ (отрицательное значение задается в КиБ)
+            "mmap_size": 268435456,  # 256 МБ
+            "temp_store": "MEMORY",
+        },
+    ),
+}
+
+
+def get_profile(name: Optional[str] = None) -> EngineProfile:
+    """
+    Возвращает профиль по имени, по умолчанию из DB_PROFILE.
+
+    Raises:
+        ValueError: Если профиль неизвестен.
+    """
+    name = name or DB_PROFILE
+    profile = PROFILES.get(name)
+    if profile is None:
+        raise ValueError(f"Unknown DB_PROFILE: {name}. Available: {', '.join(PROFILES)}")
+    return profile
+
+
+def engine_options(url: str, profile: EngineProfile, read_only: bool = False) -> dict:
+    """
+    Собирает аргументы create_engine для профиля.
+
+    Args:
+        url (str): Адрес базы данных.
+        profile (EngineProfile): Профиль движка.
+        read_only (bool): Движок для чтения (используются размеры пула для чтения).
+
+    Returns:
+        dict: Именованные аргументы для create_engine или create_async_engine.
+    """
+    options = {"echo": profile.echo, "pool_pre_ping": profile.pool_pre_ping}
+    parsed = make_url(url)
+    if issubclass(parsed.get_dialect().get_pool_class(parsed), QueuePool):
+        if read_only:
+            options.update(pool_size=profile.read_pool_size, max_overflow=profile.read_max_overflow)
+        else:
+            options.update(pool_size=profile.pool_size, max_overflow=profile.max_overflow)
+        options["pool_timeout"] = profile.pool_timeout
+    return options
+
+
+def apply_pragmas(engine: Engine, pragmas: dict[str, Union[str, int]]) -> None:
+    """
+    Регистрирует выполнение PRAGMA для каждого нового соединения движка.
+
+    Args:
+        engine (Engine): Синхронный движок (для асинхронного - AsyncEngine.sync_engine).
+        pragmas (dict[str, Union[str, int]]): Имена и значения PRAGMA.
+    """
+    if not pragmas or engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                # PRAGMA не поддерживает параметры запроса; значения берутся только из профиля
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+
+def connection_pragmas(profile: EngineProfile, read_only: bool = False) -> dict[str, Union[str, int]]:
+    """
+    Возвращает PRAGMA для соединений движка.
+
+    Соединения для чтения дополнительно переводятся в query_only, чтобы запись через
+    них завершалась ошибкой. query_only выполняется последним: до него journal_mode
+    еще может изменить заголовок файла базы.
+    """
+    if not read_only:
+        return profile.pragmas
+    return {**profile.pragmas, "query_only": "ON"}
+
+
+def build_engine(url: str, profile: Optional[EngineProfile] = None, read_only: bool = False) -> Engine:
+    """
+    Создает синхронный движок с настройками профиля.
+
+    Args:
+        url (str): Адрес базы данных.
+        profile (Optional[EngineProfile]): Профиль; по умолчанию из DB_PROFILE.
+        read_only (bool): Создать движок только для чтения.
+
+    Returns:
+        Engine: Движок базы данных.
+    """
+    profile = profile or get_profile()
+    engine = create_engine(url, **engine_options(url, profile, read_only))
+    apply_pragmas(engine, connection_pragmas(profile, read_only))
+    return engine
+
+
+def build_async_engine(url: str, profile: Optional[EngineProfile] = None, read_only: bool = False) -> AsyncEngine:
+    """
+    Асинхронная версия build_engine.
+    """
+    profile = profile or get_profile()
+    engine = create_async_engine(url, **engine_options(url, profile, read_only))
+    apply_pragmas(engine.sync_engine, connection_pragmas(profile, read_only))
+    return engine
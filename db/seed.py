@@ -0,0 +1,329 @@
+"""
+Генерация синтетического набора данных заданного масштаба.
+
+Масштаб 1.0 соответствует 200 000 авторов, 1 000 000 книг и 20 000 000 записей
+о выдаче. Популярность книг и продуктивность авторов распределены по закону
+Ципфа, читатели выбираются для выдач равномерно. Выдачи идут в хронологическом
+порядке; часть недавних выдач остается активной, и остаток экземпляров книг с
+ними согласован. При одинаковых seed и параметрах результат всегда одинаков.
+
+Данные пишутся пакетными INSERT через Core в крупных транзакциях. На время
+загрузки вторичные индексы и триггеры (полнотекстовый индекс, счетчики выдач)
+удаляются, а после загрузки создаются заново одним проходом.
+
+Запуск:
+    python -m db.seed --scale 0.1 --database library.db --overwrite
+    python -m db.seed --books 1000000 --authors 200000 --borrows 0
+"""
+import argparse
+import itertools
+import os
+import random
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import Engine, func, insert, inspect, select, text
+
+from core.models.author import Author
+from core.models.base import Base
+from core.models.book import Book, BOOK_FTS_DDL
+from core.models.borrow import Borrow
+from core.models.reader import Reader, READER_LOANS_DDL, READER_LOANS_TRIGGERS
+from core.models.stats import BOOK_STATS_DDL, BOOK_STATS_TRIGGERS, LOAN_TOTALS_DDL, LOAN_TOTALS_TRIGGERS
+from db.migrations import create_missing_indexes, rebuild_book_fts, rebuild_book_stats, rebuild_reader_loans, \
+    upgrade_db
+from db.profiles import EngineProfile, build_engine
+
+# Размер набора при масштабе 1.0
+BASE_AUTHORS = 200_000
+BASE_BOOKS = 1_000_000
+BASE_BORROWS = 20_000_000
+BASE_READERS = 500_000
+
+# Строк в одном executemany и в одной транзакции
+BATCH_SIZE = 50_000
+TRANSACTION_ROWS = 1_000_000
+
+# Выдачи распределены по десяти годам до END_DATE; активными могут остаться
+# только выдачи за последние ACTIVE_DAYS дней
+END_DATE = date(2024, 12, 31)
+HISTORY_DAYS = 3652
+ACTIVE_DAYS = 60
+ACTIVE_SHARE = 0.7
+
+VOCABULARY_SIZE = 20_000
+SYLLABLES = ["ka", "ro", "mi", "ta", "ne", "so", "vi", "la", "du", "ze", "po", "ri", "sha", "gor", "lin", "tor"]
+FIRST_NAMES = [
+    "Anna", "Boris", "Clara", "Dmitry", "Elena", "Fedor", "Galina", "Igor", "Irina", "Leo", "Maria", "Nikolai",
+    "Olga", "Pavel", "Sofia", "Vera", "Victor", "Yuri", "Zoya", "Alexei", "Daria", "Ivan", "Natalia", "Sergei",
+]
+
+# Загрузка не требует надежности записи на диск: при сбое набор генерируется заново
+SEED_PROFILE = EngineProfile(
+    name="seed",
+    pragmas={
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -262144,  # 256 МБ
+        "temp_store": "MEMORY",
+    },
+)
+
+FTS_TRIGGERS = ("book_fts_ai", "book_fts_ad", "book_fts_au")
+
+
+@dataclass(frozen=True)
+class SeedCounts:
+    authors: int
+    books: int
+    borrows: int
+    readers: int
+
+    @classmethod
+    def for_scale(cls, scale: float) -> "SeedCounts":
+        return cls(
+            authors=max(1, round(BASE_AUTHORS * scale)),
+            books=max(1, round(BASE_BOOKS * scale)),
+            borrows=round(BASE_BORROWS * scale),
+            readers=max(1, round(BASE_READERS * scale)),
+        )
+
+
+def make_vocabulary(seed: int, size: int = VOCABULARY_SIZE) -> list[str]:
+    """
+    Возвращает словарь слов для названий и описаний книг.
+
+    Слова упорядочены по убыванию частоты: при генерации слово с индексом i
+    выбирается с весом 1 / (i + 1), поэтому бенчмарки могут выбирать частые и
+    редкие слова по индексу.
+
+    Args:
+        seed (int): Значение seed, с которым генерируется набор данных.
+        size (int): Размер словаря.
+
+    Returns:
+        list[str]: Слова словаря.
+    """
+    rng = random.Random(f"vocabulary-{seed}")
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    ordered = sorted(words)
+    rng.shuffle(ordered)
+    return ordered
+
+
+def zipf_cum_weights(n: int, skew: float) -> list[float]:
+    """
+    Накопленные веса распределения Ципфа для random.choices.
+    """
+    return list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(n)))
+
+
+def batched(rows: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    while batch := list(itertools.islice(rows, size)):
+        yield batch
+
+
+def insert_rows(engine: Engine, table, rows: Iterator[dict]) -> int:
+    """
+    Записывает строки пакетами по BATCH_SIZE, фиксируя транзакцию каждые TRANSACTION_ROWS строк.
+
+    Returns:
+        int: Количество записанных строк.
+    """
+    stmt = insert(table)
+    total = 0
+    conn = engine.connect()
+    try:
+        for batch in batched(rows, BATCH_SIZE):
+            conn.execute(stmt, batch)
+            total += len(batch)
+            if total % TRANSACTION_ROWS == 0:
+                conn.commit()
+        conn.commit()
+    finally:
+        conn.close()
+    return total
+
+
+def generate_authors(rng: random.Random, counts: SeedCounts, vocabulary: list[str]) -> Iterator[dict]:
+    earliest = date(1800, 1, 1)
+    for author_id in range(1, counts.authors + 1):
+        yield {
+            "id": author_id,
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(vocabulary).capitalize(),
+            "birth_date": earliest + timedelta(days=rng.randrange(365 * 190)),
+        }
+
+
+def generate_readers(counts: SeedCounts) -> Iterator[dict]:
+    for reader_id in range(1, counts.readers + 1):
+        yield {"id": reader_id, "name": f"Reader {reader_id:07d}"}
+
+
+def generate_books(rng: random.Random, counts: SeedCounts, vocabulary: list[str], copies: list[int],
+                   active: list[int], skew: float) -> Iterator[dict]:
+    word_weights = zipf_cum_weights(len(vocabulary), 1.0)
+    # Немногие авторы написали много книг, большинство - по одной-две
+    author_weights = zipf_cum_weights(counts.authors, skew)
+    author_ids = range(1, counts.authors + 1)
+    for index in range(counts.books):
+        if index % BATCH_SIZE == 0:
+            authors = iter(rng.choices(author_ids, cum_weights=author_weights, k=BATCH_SIZE))
+        words = rng.choices(vocabulary, cum_weights=word_weights, k=rng.randint(10, 25))
+        title_length = rng.randint(2, 5)
+        yield {
+            "id": index + 1,
+            "title": " ".join(words[:title_length]).capitalize(),
+            "description": " ".join(words[title_length:]),
+            "author_id": next(authors),
+            "available_copies": copies[index] - active[index],
+        }
+
+
+def generate_borrows(rng: random.Random, counts: SeedCounts, copies: list[int], active: list[int],
+                     skew: float) -> Iterator[dict]:
+    # Популярность книг по Ципфу: небольшая доля названий получает большую часть выдач
+    book_weights = zipf_cum_weights(counts.books, skew)
+    # Номер книги в рейтинге популярности не совпадает с ее идентификатором
+    popularity = list(range(counts.books))
+    rng.shuffle(popularity)
+    days = [END_DATE - timedelta(days=HISTORY_DAYS - day) for day in range(HISTORY_DAYS + 1)]
+    active_from = HISTORY_DAYS - ACTIVE_DAYS
+
+    for index in range(counts.borrows):
+        if index % BATCH_SIZE == 0:
+            ranks = iter(rng.choices(popularity, cum_weights=book_weights, k=BATCH_SIZE))
+        book_index = next(ranks)
+        day = index * HISTORY_DAYS // counts.borrows
+        return_date = None
+        if day < active_from or active[book_index] >= copies[book_index] or rng.random() >= ACTIVE_SHARE:
+            return_date = days[min(HISTORY_DAYS, day + rng.randint(1, 45))]
+        else:
+            active[book_index] += 1
+        yield {
+            "book_id": book_index + 1,
+            "reader_id": rng.randrange(counts.readers) + 1,
+            "borrow_date": days[day],
+            "return_date": return_date,
+        }
+
+
+def seed_database(engine: Engine, counts: SeedCounts, seed: int = 42, skew: float = 0.8,
+                  log: Optional[Callable[[str], None]] = None) -> None:
+    """
+    Заполняет пустую базу синтетическими данными.
+
+    Args:
+        engine (Engine): Движок базы данных.
+        counts (SeedCounts): Количество авторов, книг, выдач и читателей.
+        seed (int): Начальное значение генератора случайных чисел.
+        skew (float): Показатель распределения Ципфа для популярности книг и авторов.
+        log (Optional[Callable[[str], None]]): Функция для вывода прогресса.
+
+    Raises:
+        ValueError: Если в базе уже есть данные.
+    """
+    log = log or (lambda message: None)
+    upgrade_db(engine)
+    with engine.connect() as conn:
+        if any(conn.scalar(select(func.count()).select_from(table)) for table in (Author, Book, Borrow, Reader)):
+            raise ValueError("Database is not empty")
+
+    # Индексы и триггеры создаются после загрузки: так быстрее, чем обновлять их на каждой строке
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in inspect(conn).get_indexes(table.name):
+                conn.execute(text(f"DROP INDEX {index['name']}"))
+        for trigger in (*FTS_TRIGGERS, *BOOK_STATS_TRIGGERS, *LOAN_TOTALS_TRIGGERS, *READER_LOANS_TRIGGERS):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(seed)
+    copies = [rng.randint(1, 10) for _ in range(counts.books)]
+    active = [0] * counts.books
+
+    started = time.perf_counter()
+    insert_rows(engine, Author, generate_authors(rng, counts, vocabulary))
+    log(f"authors: {counts.authors} in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    insert_rows(engine, Reader, generate_readers(counts))
+    log(f"readers: {counts.readers} in {time.perf_counter() - started:.1f}s")
+
+    # Выдачи генерируются до книг, чтобы остаток экземпляров учитывал активные выдачи
+    started = time.perf_counter()
+    insert_rows(engine, Borrow, generate_borrows(rng, counts, copies, active, skew))
+    log(f"borrows: {counts.borrows} ({sum(active)} active) in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    insert_rows(engine, Book, generate_books(rng, counts, vocabulary, copies, active, skew))
+    log(f"books: {counts.books} in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        create_missing_indexes(conn)
+        for statement in (*BOOK_FTS_DDL, *BOOK_STATS_DDL, *LOAN_TOTALS_DDL, *READER_LOANS_DDL):
+            conn.exec_driver_sql(statement)
+        rebuild_book_fts(conn)
+        rebuild_book_stats(conn)
+        rebuild_reader_loans(conn)
+        conn.exec_driver_sql("ANALYZE")
+    log(f"indexes: {time.perf_counter() - started:.1f}s")
+
+
+def seed_file(path: str, counts: SeedCounts, seed: int = 42, skew: float = 0.8,
+              log: Optional[Callable[[str], None]] = None) -> None:
+    """
+    Создает файл базы SQLite с синтетическими данными.
+
+    Args:
+        path (str): Путь к файлу базы; файл не должен содержать данных.
+        counts (SeedCounts): Количество авторов, книг, выдач и читателей.
+        seed (int): Начальное значение генератора случайных чисел.
+        skew (float): Показатель распределения Ципфа.
+        log (Optional[Callable[[str], None]]): Функция для вывода прогресса.
+    """
+    engine = build_engine(f"sqlite:///{path}", SEED_PROFILE)
+    try:
+        seed_database(engine, counts, seed, skew, log)
+    finally:
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default="library.db", help="Путь к файлу базы SQLite")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--authors", type=int, help="Количество авторов вместо вычисленного по масштабу")
+    parser.add_argument("--books", type=int, help="Количество книг вместо вычисленного по масштабу")
+    parser.add_argument("--borrows", type=int, help="Количество выдач вместо вычисленного по масштабу")
+    parser.add_argument("--readers", type=int, help="Количество читателей вместо вычисленного по масштабу")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skew", type=float, default=0.8, help="Показатель распределения Ципфа")
+    parser.add_argument("--overwrite", action="store_true", help="Удалить существующий файл базы")
+    args = parser.parse_args()
+
+    scaled = SeedCounts.for_scale(args.scale)
+    counts = SeedCounts(
+        authors=args.authors if args.authors is not None else scaled.authors,
+        books=args.books if args.books is not None else scaled.books,
+        borrows=args.borrows if args.borrows is not None else scaled.borrows,
+        readers=args.readers if args.readers is not None else scaled.readers,
+    )
+    if args.overwrite:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.database + suffix):
+                os.remove(args.database + suffix)
+
+    started = time.perf_counter()
+    seed_file(args.database, counts, args.seed, args.skew, log=print)
+    print(f"seeded {args.database} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,155 +1,567 @@
-from datetime import datetime
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date, datetime
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+from typing import List, Optional
 
 from core.cruds.book import BookCRUD
 from core.cruds.borrow import BorrowCRUD
+from core.cruds.reader import ReaderCRUD
+from core.cruds.stats import StatsCRUD
 from core.schemas.author import Author, AuthorCreate, AuthorUpdate
 from core.cruds.author import AuthorCRUD
 from core.schemas.book import Book, BookCreate, BookUpdate
-from core.schemas.borrow import Borrow, BorrowCreate
-from db.database import create_db, SessionLocal
-
-app = FastAPI()
+from core.schemas.batch import BatchDeleteResult, BatchGetResult, BatchWriteResult, IdList, batch_delete_result
+from core.schemas.borrow import Borrow, BorrowBatch, BorrowCreate, BorrowImport, ReturnBatch
+from core.schemas.reader import Reader, ReaderCreate
+from core.schemas.expanded import AuthorWithBooks, BookWithAuthor
+from core.schemas.stats import AuthorCirculation, BookCirculation, CirculationSummary
+from core.bulk import BulkImporter, detect_format
+from core.cache import entity_cache, to_payload
+from core.etag import PreconditionFailed, entity_not_modified, etag, if_match_versions, page_etag, page_not_modified
+from core.export import MEDIA_TYPES, export_rows
+from core.metrics import METRICS_ENABLED, MetricsMiddleware, metrics
+from core.profiling import ProfilingRoute, load_report, profiling_authorized
+from core.models.author import Author as AuthorModel
+from core.models.book import Book as BookModel
+from core.models.borrow import Borrow as BorrowModel
+from core.expand import parse_expand
+from core.pagination import next_cursor
+from core.responses import batch_get_response, batch_write_response, rows_response
+from core.schemas.bulk import ImportSummary
+from db.archive import ARCHIVE_INTERVAL, Archiver
+from core.write_queue import WriteQueueFull
+from db.database import create_db, engine, read_engine, async_engine, async_read_engine, SessionLocal, \
+    ReadSessionLocal, READ_METHODS, DB_MODE, write_queue
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Фоновый перенос давно возвращенных выдач в архив (ARCHIVE_INTERVAL > 0)
+    archiver = Archiver(SessionLocal).start() if ARCHIVE_INTERVAL > 0 else None
+    if write_queue is not None:
+        write_queue.start()
+    yield
+    if archiver is not None:
+        archiver.stop()
+    # Писатель завершает уже принятые операции, чтобы ни один запрос не остался без ответа,
+    # до закрытия соединений с базой
+    if write_queue is not None:
+        await asyncio.to_thread(write_queue.stop)
+    for closed in (engine, read_engine):
+        closed.dispose()
+    for closed in (async_engine, async_read_engine):
+        if closed is not None:
+            await closed.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+# Любой эндпоинт можно выполнить под профилировщиком (PROFILING_ENABLED=1 и заголовок X-Profile)
+app.router.route_class = ProfilingRoute
+
+# Метрики запросов (/metrics) и заголовок Server-Timing
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Основные CRUD-эндпоинты; в async-режиме те же обработчики выполняются через AsyncSession (см. async_routes).
+# Роутер подключается в конце модуля, поэтому эндпоинты, объявленные прямо на app, имеют приоритет.
+router = APIRouter(route_class=ProfilingRoute)
 
 # Создание базы данных
 create_db()
 
 
-# Dependency для получения сессии базы данных
-def get_db():
-    with SessionLocal() as db:
+# Dependency для получения сессии базы данных: запросы на чтение получают сессию из пула
+# только для чтения (или реплики), изменяющие запросы - из пула для записи
+def get_db(request: Request):
+    session_factory = ReadSessionLocal if request.method in READ_METHODS else SessionLocal
+    with session_factory() as db:
         yield db
 
 
-# Эндпоинты для авторов
-@app.post("/authors/", response_model=Author)
-def create_author(author: AuthorCreate, db: Session = Depends(get_db)):
-    return AuthorCRUD.create_author(db=db, author=author)
+# Dependency для POST-эндпоинтов, которые только читают данные (пакетное чтение)
+def get_read_db():
+    with ReadSessionLocal() as db:
+        yield db
+
+
+# Изменяющий метод CRUD-класса выполняется в сессии запроса или, если включена очередь записи,
+# в транзакции очередного пакета; поток запроса ждет результат своей операции. В async-режиме
+# обработчик выполняется в greenlet внутри AsyncSession.run_sync, и результат ожидается без блокировки цикла
+def run_write(db: Session, operation, **kwargs):
+    if write_queue is None:
+        return operation(db, **kwargs)
+    future = write_queue.submit(operation, **kwargs)
+    if in_greenlet():
+        return await_only(asyncio.wrap_future(future))
+    return future.result()
 
 
-@app.get("/authors/", response_model=List[Author])
-def get_authors(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return AuthorCRUD.get_authors(db=db, skip=skip, limit=limit)
+@app.exception_handler(WriteQueueFull)
+async def write_queue_full(request: Request, exc: WriteQueueFull):
+    # Очередь записи заполнена: клиент повторяет запрос позже
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
 
 
-@app.get("/authors/{author_id}", response_model=Author)
-def get_author(author_id: int, db: Session = Depends(get_db)):
-    author = AuthorCRUD.get_author(db=db, author_id=author_id)
+# Эндпоинты для авторов
+@router.post("/authors/", response_model=Author)
+def create_author(author: AuthorCreate, db: Session = Depends(get_db)):
+    return run_write(db, AuthorCRUD.create_author, author=author)
+
+
+@router.get("/authors/", response_model=List[AuthorWithBooks], response_model_exclude_unset=True)
+def get_authors(request: Request, response: Response, skip: int = 0, limit: int = 10, after: Optional[str] = None,
+                order_by: str = "id", expand: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        names = parse_expand(expand)
+        # Неизменившаяся страница без связей отдается как 304 после выборки только id и version
+        unchanged = None if names else page_not_modified(request, lambda: AuthorCRUD.get_authors(
+            db=db, skip=skip, limit=limit, after=after, order_by=order_by, columns=AuthorCRUD.VERSION_COLUMNS))
+        if unchanged is not None:
+            return unchanged
+        authors = AuthorCRUD.get_authors(db=db, skip=skip, limit=limit, after=after, order_by=order_by,
+                                         expand=names)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    cursor = next_cursor(authors, AuthorCRUD.SORTS, order_by, limit)
+    if not names:
+        # Без связей строки сериализуются напрямую, без ORM-объектов и валидации схемой
+        return rows_response(authors, cursor, page_etag(authors))
+    # Курсор следующей страницы передается в заголовке, чтобы не менять формат ответа
+    if cursor is not None:
+        response.headers["X-Next-Cursor"] = cursor
+    return [AuthorWithBooks.model_validate(author) for author in authors]
+
+
+@router.get("/authors/{author_id}/books", response_model=List[Book])
+def get_author_books(author_id: int, request: Request, skip: int = 0, limit: int = 10,
+                     after: Optional[str] = None, order_by: str = "id", db: Session = Depends(get_db)):
+    if AuthorCRUD.get_author(db=db, author_id=author_id) is None:
+        raise HTTPException(status_code=404, detail="Author not found")
+    try:
+        unchanged = page_not_modified(request, lambda: BookCRUD.get_author_books(
+            db=db, author_id=author_id, skip=skip, limit=limit, after=after, order_by=order_by,
+            columns=BookCRUD.VERSION_COLUMNS))
+        if unchanged is not None:
+            return unchanged
+        books = BookCRUD.get_author_books(db=db, author_id=author_id, skip=skip, limit=limit, after=after,
+                                          order_by=order_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return rows_response(books, next_cursor(books, BookCRUD.SORTS, order_by, limit), page_etag(books))
+
+
+@router.get("/authors/{author_id}", response_model=Author)
+def get_author(author_id: int, request: Request, db: Session = Depends(get_db)):
+    # Клиент с актуальной версией получает 304 после чтения одного столбца version
+    unchanged = entity_not_modified(request, lambda: AuthorCRUD.get_author_version(db=db, author_id=author_id))
+    if unchanged is not None:
+        return unchanged
+    # Ответ берется из кэша сущностей; изменения инвалидируют его после коммита
+    author = entity_cache.get_or_load(
+        "author", author_id, lambda: to_payload(Author, AuthorCRUD.get_author(db=db, author_id=author_id))
+    )
     if author is None:
         raise HTTPException(status_code=404, detail="Author not found")
-    return author
+    return JSONResponse(author, headers={"ETag": etag(author["version"])})
 
 
-@app.put("/authors/{author_id}", response_model=Author)
-def update_author(author_id: int, author: AuthorUpdate, db: Session = Depends(get_db)):
-    updated_author = AuthorCRUD.update_author(db=db, author_id=author_id, author=author)
+@router.put("/authors/{author_id}", response_model=Author)
+def update_author(author_id: int, author: AuthorUpdate, request: Request, response: Response,
+                  db: Session = Depends(get_db)):
+    # If-Match: изменение применяется, только если версия автора не изменилась с момента чтения
+    try:
+        updated_author = run_write(db, AuthorCRUD.update_author, author_id=author_id, author=author,
+                                   versions=if_match_versions(request))
+    except PreconditionFailed as e:
+        raise HTTPException(status_code=412, detail=str(e))
     if updated_author is None:
         raise HTTPException(status_code=404, detail="Author not found")
+    response.headers["ETag"] = etag(updated_author.version)
     return updated_author
 
 
-@app.delete("/authors/{author_id}", response_model=Author)
-def delete_author(author_id: int, db: Session = Depends(get_db)):
-    deleted_author = AuthorCRUD.delete_author(db=db, author_id=author_id)
+@router.delete("/authors/{author_id}", response_model=Author)
+def delete_author(author_id: int, request: Request, db: Session = Depends(get_db)):
+    try:
+        deleted_author = run_write(db, AuthorCRUD.delete_author, author_id=author_id,
+                                   versions=if_match_versions(request))
+    except PreconditionFailed as e:
+        raise HTTPException(status_code=412, detail=str(e))
     if deleted_author is None:
         raise HTTPException(status_code=404, detail="Author not found")
     return deleted_author
 
 
-# Эндпоинты для книг
-@app.post("/books/", response_model=Book)
-def create_book(book: BookCreate, db: Session = Depends(get_db)):
-    return BookCRUD.create_book(db=db, book=book)
+@router.post("/authors/batch-get", response_model=BatchGetResult[Author])
+def get_authors_by_ids(body: IdList, db: Session = Depends(get_read_db)):
+    # Все идентификаторы читаются запросами WHERE id IN (...) вместо отдельного запроса на каждого автора
+    ids = list(dict.fromkeys(body.ids))
+    return batch_get_response(ids, AuthorCRUD.get_authors_by_ids(db=db, author_ids=ids))
 
 
-@app.get("/books/", response_model=List[Book])
-def get_books(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return BookCRUD.get_books(db=db, skip=skip, limit=limit)
+@router.post("/authors/batch-delete", response_model=BatchDeleteResult)
+def delete_authors(body: IdList, db: Session = Depends(get_db)):
+    deleted = run_write(db, AuthorCRUD.delete_authors, author_ids=body.ids)
+    return batch_delete_result(body.ids, [author.id for author in deleted])
 
 
-@app.get("/books/{book_id}", response_model=Book)
-def get_book(book_id: int, db: Session = Depends(get_db)):
-    book = BookCRUD.get_book(db=db, book_id=book_id)
+# Эндпоинты для книг
+@router.post("/books/", response_model=Book)
+def create_book(book: BookCreate, db: Session = Depends(get_db)):
+    return run_write(db, BookCRUD.create_book, book=book)
+
+
+@router.get("/books/", response_model=List[BookWithAuthor], response_model_exclude_unset=True)
+def get_books(request: Request, response: Response, skip: int = 0, limit: int = 10, after: Optional[str] = None,
+              order_by: str = "id", expand: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        names = parse_expand(expand)
+        # Неизменившаяся страница без связей отдается как 304 после выборки только id и version
+        unchanged = None if names else page_not_modified(request, lambda: BookCRUD.get_books(
+            db=db, skip=skip, limit=limit, after=after, order_by=order_by, columns=BookCRUD.VERSION_COLUMNS))
+        if unchanged is not None:
+            return unchanged
+        books = BookCRUD.get_books(db=db, skip=skip, limit=limit, after=after, order_by=order_by,
+                                     expand=names)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    cursor = next_cursor(books, BookCRUD.SORTS, order_by, limit)
+    if not names:
+        # Без связей строки сериализуются напрямую, без ORM-объектов и валидации схемой
+        return rows_response(books, cursor, page_etag(books))
+    # Курсор следующей страницы передается в заголовке, чтобы не менять формат ответа
+    if cursor is not None:
+        response.headers["X-Next-Cursor"] = cursor
+    return [BookWithAuthor.model_validate(book) for book in books]
+
+
+# include_archive=true добавляет к истории выдачи из архива borrow_archive
+@router.get("/books/{book_id}/borrows", response_model=List[Borrow])
+def get_book_borrows(book_id: int, request: Request, skip: int = 0, limit: int = 10, after: Optional[str] = None,
+                     order_by: str = "-borrow_date", include_archive: bool = False, db: Session = Depends(get_db)):
+    if BookCRUD.get_book(db=db, book_id=book_id) is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    try:
+        unchanged = page_not_modified(request, lambda: BorrowCRUD.get_book_borrows(
+            db=db, book_id=book_id, skip=skip, limit=limit, after=after, order_by=order_by,
+            columns=BorrowCRUD.VERSION_COLUMNS, include_archive=include_archive))
+        if unchanged is not None:
+            return unchanged
+        borrows = BorrowCRUD.get_book_borrows(db=db, book_id=book_id, skip=skip, limit=limit, after=after,
+                                              order_by=order_by, include_archive=include_archive)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return rows_response(borrows, next_cursor(borrows, BorrowCRUD.SORTS, order_by, limit), page_etag(borrows))
+
+
+@router.get("/books/{book_id}", response_model=Book)
+def get_book(book_id: int, request: Request, db: Session = Depends(get_db)):
+    unchanged = entity_not_modified(request, lambda: BookCRUD.get_book_version(db=db, book_id=book_id))
+    if unchanged is not None:
+        return unchanged
+    book = entity_cache.get_or_load(
+        "book", book_id, lambda: to_payload(Book, BookCRUD.get_book(db=db, book_id=book_id))
+    )
     if book is None:
         raise HTTPException(status_code=404, detail="Book not found")
-    return book
+    return JSONResponse(book, headers={"ETag": etag(book["version"])})
 
 
-@app.put("/books/{book_id}", response_model=Book)
-def update_book(book_id: int, book: BookUpdate, db: Session = Depends(get_db)):
-    updated_book = BookCRUD.update_book(db=db, book_id=book_id, book=book)
+@router.put("/books/{book_id}", response_model=Book)
+def update_book(book_id: int, book: BookUpdate, request: Request, response: Response,
+                db: Session = Depends(get_db)):
+    try:
+        updated_book = run_write(db, BookCRUD.update_book, book_id=book_id, book=book,
+                                 versions=if_match_versions(request))
+    except PreconditionFailed as e:
+        raise HTTPException(status_code=412, detail=str(e))
     if updated_book is None:
         raise HTTPException(status_code=404, detail="Book not found")
+    response.headers["ETag"] = etag(updated_book.version)
     return updated_book
 
 
-@app.delete("/books/{book_id}", response_model=Book)
-def delete_book(book_id: int, db: Session = Depends(get_db)):
-    book_to_delete = BookCRUD.get_book(db=db, book_id=book_id)
-
-    if book_to_delete is None:
+@router.delete("/books/{book_id}", response_model=Book)
+def delete_book(book_id: int, request: Request, db: Session = Depends(get_db)):
+    try:
+        deleted_book = run_write(db, BookCRUD.delete_book, book_id=book_id, versions=if_match_versions(request))
+    except PreconditionFailed as e:
+        raise HTTPException(status_code=412, detail=str(e))
+    if deleted_book is None:
         raise HTTPException(status_code=404, detail="Book not found")
+    return deleted_book
+
+
+@router.post("/books/batch-get", response_model=BatchGetResult[Book])
+def get_books_by_ids(body: IdList, db: Session = Depends(get_read_db)):
+    ids = list(dict.fromkeys(body.ids))
+    return batch_get_response(ids, BookCRUD.get_books_by_ids(db=db, book_ids=ids))
 
-    # Удалите книгу из базы данных
-    BookCRUD.delete_book(db=db, book_id=book_id)
 
-    # Преобразуйте книгу в Pydantic модель и верните ее
-    return Book.from_orm(book_to_delete)
+@router.post("/books/batch-delete", response_model=BatchDeleteResult)
+def delete_books(body: IdList, db: Session = Depends(get_db)):
+    deleted = run_write(db, BookCRUD.delete_books, book_ids=body.ids)
+    return batch_delete_result(body.ids, [book.id for book in deleted])
 
 
 # Эндпоинты для выдач
-@app.post("/borrows/", response_model=Borrow)
+@router.post("/borrows/", response_model=Borrow)
 def create_borrow(borrow: BorrowCreate, db: Session = Depends(get_db)):
-    book = BookCRUD.get_book(db=db, book_id=borrow.book_id)
-    if book is None or book.available_copies <= 0:
+    # Проверка остатка и его уменьшение выполняются вместе с созданием записи в одной транзакции
+    try:
+        db_borrow = run_write(db, BorrowCRUD.borrow_book, borrow=borrow)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if db_borrow is None:
         raise HTTPException(status_code=400, detail="Book is not available for borrowing")
-
-    # Уменьшаем количество доступных экземпляров
-    book.available_copies -= 1
-    db.commit()
-
-    return BorrowCRUD.create_borrow(db=db, borrow=borrow)
+    return db_borrow
 
 
-@app.get("/borrows/", response_model=List[Borrow])
-def get_borrows(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return BorrowCRUD.get_borrows(db=db, skip=skip, limit=limit)
-
-
-@app.get("/borrows/{borrow_id}", response_model=Borrow)
-def get_borrow(borrow_id: int, db: Session = Depends(get_db)):
-    borrow = BorrowCRUD.get_borrow(db=db, borrow_id=borrow_id)
+@router.get("/borrows/", response_model=List[Borrow])
+def get_borrows(request: Request, skip: int = 0, limit: int = 10, after: Optional[str] = None,
+                order_by: str = "id", db: Session = Depends(get_db)):
+    try:
+        unchanged = page_not_modified(request, lambda: BorrowCRUD.get_borrows(
+            db=db, skip=skip, limit=limit, after=after, order_by=order_by, columns=BorrowCRUD.VERSION_COLUMNS))
+        if unchanged is not None:
+            return unchanged
+        borrows = BorrowCRUD.get_borrows(db=db, skip=skip, limit=limit, after=after, order_by=order_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Курсор следующей страницы передается в заголовке, чтобы не менять формат ответа
+    return rows_response(borrows, next_cursor(borrows, BorrowCRUD.SORTS, order_by, limit), page_etag(borrows))
+
+
+@router.post("/borrows/batch-get", response_model=BatchGetResult[Borrow])
+def get_borrows_by_ids(body: IdList, db: Session = Depends(get_read_db)):
+    ids = list(dict.fromkeys(body.ids))
+    return batch_get_response(ids, BorrowCRUD.get_borrows_by_ids(db=db, borrow_ids=ids))
+
+
+# Пакетные выдача и возврат объявлены до /borrows/{borrow_id}: иначе /borrows/batch/return совпал бы с
+# /borrows/{borrow_id}/return
+@router.post("/borrows/batch", response_model=BatchWriteResult[Borrow])
+def create_borrows(body: BorrowBatch, db: Session = Depends(get_db)):
+    outcomes = run_write(db, BorrowCRUD.borrow_books, borrows=body.items, atomic=body.atomic)
+    return batch_write_response(outcomes)
+
+
+@router.patch("/borrows/batch/return", response_model=BatchWriteResult[Borrow])
+def return_borrows(body: ReturnBatch, db: Session = Depends(get_db)):
+    returns = [(item.borrow_id, item.return_date) for item in body.items]
+    outcomes = run_write(db, BorrowCRUD.return_borrows, returns=returns, atomic=body.atomic)
+    return batch_write_response(outcomes)
+
+
+@router.get("/borrows/{borrow_id}", response_model=Borrow)
+def get_borrow(borrow_id: int, request: Request, db: Session = Depends(get_db)):
+    unchanged = entity_not_modified(request, lambda: BorrowCRUD.get_borrow_version(db=db, borrow_id=borrow_id))
+    if unchanged is not None:
+        return unchanged
+    borrow = entity_cache.get_or_load(
+        "borrow", borrow_id, lambda: to_payload(Borrow, BorrowCRUD.get_borrow(db=db, borrow_id=borrow_id))
+    )
     if borrow is None:
         raise HTTPException(status_code=404, detail="Borrow record not found")
-    return borrow
+    return JSONResponse(borrow, headers={"ETag": etag(borrow["version"])})
 
 
-@app.patch("/borrows/{borrow_id}/return", response_model=Borrow)
+@router.patch("/borrows/{borrow_id}/return", response_model=Borrow)
 def return_borrow(borrow_id: int, return_date: str, db: Session = Depends(get_db)):
-    # Получаем запись о займе
-    borrow = BorrowCRUD.get_borrow(db=db, borrow_id=borrow_id)
-    if borrow is None:
-        raise HTTPException(status_code=404, detail="Borrow record not found")
-
     # Преобразуем строку return_date в объект date
     try:
         return_date_obj = datetime.strptime(return_date, "%Y-%m-%d").date()
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use 'YYYY-MM-DD'.")
 
-    # Увеличиваем количество доступных экземпляров
-    book = BookCRUD.get_book(db=db, book_id=borrow.book_id)
-    if book is None:
-        raise HTTPException(status_code=404, detail="Book not found")
+    # Дата возврата и остаток книги обновляются в одной транзакции
+    try:
+        borrow = run_write(db, BorrowCRUD.return_borrow, borrow_id=borrow_id, return_date=return_date_obj)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if borrow is None:
+        raise HTTPException(status_code=404, detail="Borrow record not found")
+    return borrow
 
-    book.available_copies += 1
 
-    # Обновляем дату возврата
-    borrow.return_date = return_date_obj
-    db.commit()
-    db.refresh(borrow)
+# Эндпоинты для читателей
+@router.post("/readers/", response_model=Reader)
+def create_reader(reader: ReaderCreate, db: Session = Depends(get_db)):
+    try:
+        return run_write(db, ReaderCRUD.create_reader, reader=reader)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return borrow
+
+@router.get("/readers/", response_model=List[Reader])
+def get_readers(skip: int = 0, limit: int = 10, after: Optional[str] = None, order_by: str = "id",
+                db: Session = Depends(get_db)):
+    try:
+        readers = ReaderCRUD.get_readers(db=db, skip=skip, limit=limit, after=after, order_by=order_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return rows_response(readers, next_cursor(readers, ReaderCRUD.SORTS, order_by, limit))
+
+
+@router.get("/readers/{reader_id}", response_model=Reader)
+def get_reader(reader_id: int, db: Session = Depends(get_db)):
+    reader = ReaderCRUD.get_reader(db=db, reader_id=reader_id)
+    if reader is None:
+        raise HTTPException(status_code=404, detail="Reader not found")
+    return reader
+
+
+# Выдачи читателя: active=true - книги на руках, active=false - возвращенные, без параметра - вся история;
+# include_archive=true добавляет выдачи из архива
+@router.get("/readers/{reader_id}/borrows", response_model=List[Borrow])
+def get_reader_borrows(reader_id: int, request: Request, active: Optional[bool] = None, skip: int = 0,
+                       limit: int = 10, after: Optional[str] = None, order_by: str = "-borrow_date",
+                       include_archive: bool = False, db: Session = Depends(get_db)):
+    if ReaderCRUD.get_reader(db=db, reader_id=reader_id) is None:
+        raise HTTPException(status_code=404, detail="Reader not found")
+    try:
+        unchanged = page_not_modified(request, lambda: BorrowCRUD.get_reader_borrows(
+            db=db, reader_id=reader_id, active=active, skip=skip, limit=limit, after=after, order_by=order_by,
+            columns=BorrowCRUD.VERSION_COLUMNS, include_archive=include_archive))
+        if unchanged is not None:
+            return unchanged
+        borrows = BorrowCRUD.get_reader_borrows(db=db, reader_id=reader_id, active=active, skip=skip, limit=limit,
+                                                after=after, order_by=order_by, include_archive=include_archive)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return rows_response(borrows, next_cursor(borrows, BorrowCRUD.SORTS, order_by, limit), page_etag(borrows))
+
+
+# Отчеты о выдачах: счетчики из book_stats и просроченные выдачи
+@router.get("/stats/summary", response_model=CirculationSummary)
+def get_stats_summary(as_of: Optional[date] = None, db: Session = Depends(get_db)):
+    return StatsCRUD.get_summary(db=db, as_of=as_of or date.today())
+
+
+@router.get("/stats/books", response_model=List[BookCirculation])
+def get_stats_books(order_by: str = "total_loans", limit: int = 10, db: Session = Depends(get_db)):
+    try:
+        return rows_response(StatsCRUD.get_top_books(db=db, order_by=order_by, limit=limit))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/stats/authors", response_model=List[AuthorCirculation])
+def get_stats_authors(limit: int = 10, db: Session = Depends(get_db)):
+    return rows_response(StatsCRUD.get_top_authors(db=db, limit=limit))
+
+
+@router.get("/stats/overdue", response_model=List[Borrow])
+def get_stats_overdue(as_of: Optional[date] = None, limit: int = 10, after: Optional[str] = None,
+                      db: Session = Depends(get_db)):
+    try:
+        borrows = StatsCRUD.get_overdue(db=db, as_of=as_of or date.today(), limit=limit, after=after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return rows_response(borrows, next_cursor(borrows, BorrowCRUD.SORTS, "borrow_date", limit))
+
+
+# Статистика кэша сущностей
+@app.get("/cache/stats")
+def cache_stats():
+    return entity_cache.stats()
+
+
+# Метрики в формате Prometheus
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# Отчеты профилирования запросов
+@app.get("/profiles/{profile_id}", include_in_schema=False)
+def get_profile_report(profile_id: str, request: Request):
+    # Отчеты доступны тем же клиентам, что и профилирование: с токеном или с локального адреса
+    report = load_report(profile_id) if profiling_authorized(request) else None
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(report)
+
+
+# Полнотекстовый поиск книг
+@app.get("/books/search", response_model=List[Book])
+def search_books(q: str, response: Response, limit: int = 10, after: Optional[str] = None,
+                 db: Session = Depends(get_db)):
+    try:
+        books, cursor = BookCRUD.search_books(db=db, q=q, limit=limit, after=after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if cursor is not None:
+        response.headers["X-Next-Cursor"] = cursor
+    return books
+
+
+# Эндпоинты массовой загрузки (NDJSON или CSV с заголовком)
+async def import_rows(request: Request, db: Session, model, schema, fmt: Optional[str]) -> ImportSummary:
+    try:
+        fmt = detect_format(request.headers.get("content-type"), fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    return await BulkImporter(db, model, schema).run(request.stream(), fmt)
+
+
+@app.post("/authors/import", response_model=ImportSummary)
+async def import_authors(request: Request, format: Optional[str] = None, db: Session = Depends(get_db)):
+    return await import_rows(request, db, AuthorModel, AuthorCreate, format)
+
+
+@app.post("/books/import", response_model=ImportSummary)
+async def import_books(request: Request, format: Optional[str] = None, db: Session = Depends(get_db)):
+    return await import_rows(request, db, BookModel, BookCreate, format)
+
+
+@app.post("/borrows/import", response_model=ImportSummary)
+async def import_borrows(request: Request, format: Optional[str] = None, db: Session = Depends(get_db)):
+    # Загружается только история возвращенных выдач (см. BorrowImport): остатки книг и лимиты читателей не меняются
+    return await import_rows(request, db, BorrowModel, BorrowImport, format)
+
+
+# Эндпоинты потоковой выгрузки
+def export_table(model, name: str, fmt: str) -> StreamingResponse:
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {fmt}")
+    return StreamingResponse(
+        export_rows(ReadSessionLocal, model, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+@app.get("/authors/export")
+def export_authors(format: str = "ndjson"):
+    return export_table(AuthorModel, "authors", format)
+
+
+@app.get("/books/export")
+def export_books(format: str = "ndjson"):
+    return export_table(BookModel, "books", format)
+
+
+@app.get("/borrows/export")
+def export_borrows(format: str = "ndjson"):
+    return export_table(BorrowModel, "borrows", format)
+
+
+if DB_MODE == "async":
+    from async_routes import build_async_router, get_async_db, get_async_read_db
+
+    app.include_router(build_async_router(router, {get_db: get_async_db, get_read_db: get_async_read_db}))
+else:
+    app.include_router(router)
@@ -0,0 +1,4 @@
+import os
+
+# Профиль движка задается до импорта приложения, так как движок создается при импорте db.database
+os.environ.setdefault("DB_PROFILE", "test")
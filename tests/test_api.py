@@ -1,8 +1,24 @@
+import csv
+import io
+import json
 import os
+import sqlite3
+from datetime import date
+from types import SimpleNamespace
+
+import anyio
 import pytest
 from fastapi.testclient import TestClient
-from db.database import create_db, SessionLocal
-from main import app
+from sqlalchemy import event, insert
+from db.database import create_db, SessionLocal, engine, read_engine
+from core.bulk import BulkImporter
+from core.cruds.bulk import ID_CHUNK_SIZE
+from core.models.author import Author as AuthorModel
+from core.models.book import Book as BookModel
+from core.models.borrow import Borrow as BorrowModel
+from core.schemas.batch import MAX_BATCH_SIZE
+from core.schemas.book import BookCreate
+from main import app, get_db
 
 client = TestClient(app)
 
@@ -66,7 +82,9 @@ def test_get_books(db_session):
 def test_create_borrow(db_session):
     response = client.post("/borrows/", json={"book_id": 1, "reader_name": "Test Reader", "borrow_date": "2023-01-01"})
     assert response.status_code == 200
-    assert response.json()["reader_name"] == "Test Reader"
+    # Читатель, указанный по имени, создается при первой выдаче и находится при следующих
+    reader_id = response.json()["reader_id"]
+    assert client.get(f"/readers/{reader_id}").json()["name"] == "Test Reader"
 
 
 def test_return_borrow(db_session):
@@ -83,3 +101,643 @@ def test_delete_author(db_session):
     response = client.delete(f"/authors/1")
     assert response.status_code == 200
     assert response.json()["id"] == 1
+
+
+def test_get_books_cursor_pagination(db_session):
+    expected = [book["id"] for book in client.get("/books/", params={"limit": 1000}).json()]
+
+    ids = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/books/", params=params)
+        assert response.status_code == 200
+        ids.extend(book["id"] for book in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params = {"limit": 2, "after": cursor}
+
+    assert ids == expected
+
+
+def test_get_borrows_cursor_by_borrow_date(db_session):
+    first = client.get("/borrows/", params={"limit": 2, "order_by": "-borrow_date"})
+    assert first.status_code == 200
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = client.get("/borrows/", params={"limit": 2, "order_by": "-borrow_date", "after": cursor})
+    assert second.status_code == 200
+    rows = first.json() + second.json()
+    keys = [(row["borrow_date"], row["id"]) for row in rows]
+    assert keys == sorted(keys, reverse=True)
+    assert len({row["id"] for row in rows}) == len(rows)
+
+
+def test_get_authors_invalid_cursor(db_session):
+    response = client.get("/authors/", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
+
+    cursor = client.get("/authors/", params={"limit": 1}).headers["X-Next-Cursor"]
+    response = client.get("/authors/", params={"after": cursor, "order_by": "last_name"})
+    assert response.status_code == 400
+
+
+def test_return_borrow_twice(db_session):
+    response = client.patch("/borrows/1/return", params={"return_date": "2023-01-11"})
+    assert response.status_code == 400
+
+
+def test_import_books_ndjson(db_session, monkeypatch):
+    monkeypatch.setattr("core.bulk.IMPORT_CHUNK_SIZE", 2)
+    body = "\n".join([
+        '{"title": "Imported 1", "author_id": 2, "available_copies": 1}',
+        '{"title": "Imported 2", "author_id": 2, "available_copies": "x"}',
+        'not json',
+        '',
+        '{"title": "Imported 3", "description": "d", "author_id": 2, "available_copies": 3}',
+        '{"title": "Imported 4", "author_id": 2, "available_copies": 4}',
+    ])
+    response = client.post("/books/import", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["inserted"] == 3
+    assert summary["failed"] == 2
+    assert [error["line"] for error in summary["errors"]] == [2, 3]
+
+    titles = [book["title"] for book in client.get("/books/", params={"limit": 1000}).json()]
+    assert {"Imported 1", "Imported 3", "Imported 4"} <= set(titles)
+    assert "Imported 2" not in titles
+
+
+def test_import_authors_csv(db_session):
+    body = "first_name,last_name,birth_date\r\nIvan,Bunin,1870-10-22\r\nMaxim,Gorky,not-a-date\r\n\"Mikhail\",\"Bulgakov\",1891-05-15"
+    response = client.post("/authors/import", content=body.encode(), headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["inserted"] == 2
+    assert summary["failed"] == 1
+    assert summary["errors"][0]["line"] == 3
+
+
+def test_csv_export_round_trip_with_multiline_fields(db_session):
+    description = 'First line,\nsecond "quoted" line\r\nthird line'
+    client.post("/books/", json={"title": "Multi-line", "description": description, "author_id": 2,
+                                 "available_copies": 1})
+    exported = client.get("/books/export", params={"format": "csv"}).content
+    records = list(csv.reader(io.StringIO(exported.decode(), newline="")))
+    assert sum(record[2] == description for record in records) == 1
+
+    response = client.post("/books/import", content=exported, headers={"Content-Type": "text/csv"})
+    summary = response.json()
+    # Отклоняются только книги без автора; ошибки указывают номер записи, а не физической строки
+    orphans = [number for number, record in enumerate(records, start=1) if number > 1 and record[3] == ""]
+    assert summary["inserted"] == len(records) - 1 - len(orphans)
+    assert [error["line"] for error in summary["errors"]] == orphans[:100]
+    books = client.get("/books/", params={"limit": 100000}).json()
+    assert sum(book["description"] == description for book in books) == 2
+
+
+def test_import_does_not_hold_write_lock_while_reading_body(db_session, monkeypatch):
+    monkeypatch.setattr("core.bulk.IMPORT_CHUNK_SIZE", 2)
+    locked = []
+
+    async def body():
+        for i in range(6):
+            yield f'{{"title": "Streamed {i}", "author_id": 2, "available_copies": 1}}\n'.encode()
+            # Пока клиент передает тело, другой процесс должен сразу получать блокировку записи
+            with sqlite3.connect("library.db", timeout=0) as conn:
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    conn.rollback()
+                except sqlite3.OperationalError:
+                    locked.append(i)
+
+    summary = anyio.run(BulkImporter(db_session, BookModel, BookCreate).run, body(), "ndjson")
+    assert summary.inserted == 6
+    assert locked == []
+
+
+def test_import_borrows_accepts_only_returned_loans(db_session):
+    book = client.post("/books/", json={"title": "Imported History", "author_id": 2, "available_copies": 1}).json()
+    body = "\n".join([
+        f'{{"book_id": {book["id"]}, "reader_id": 1, "borrow_date": "2024-01-01", "return_date": "2024-01-10"}}',
+        f'{{"book_id": {book["id"]}, "reader_id": 1, "borrow_date": "2024-02-01"}}',
+        f'{{"book_id": {book["id"]}, "reader_id": 1, "borrow_date": "2024-03-01", "return_date": null}}',
+    ])
+    response = client.post("/borrows/import", content=body, headers={"Content-Type": "application/x-ndjson"})
+    summary = response.json()
+    assert (summary["inserted"], summary["failed"]) == (1, 2)
+    assert [error["line"] for error in summary["errors"]] == [2, 3]
+
+    # Остаток книги не изменился, и последний экземпляр по-прежнему можно выдать ровно один раз
+    assert client.get(f"/books/{book['id']}").json()["available_copies"] == 1
+    borrows = client.get(f"/books/{book['id']}/borrows").json()
+    assert [borrow["return_date"] for borrow in borrows] == ["2024-01-10"]
+    new_borrow = {"book_id": book["id"], "reader_id": 1, "borrow_date": "2024-04-01"}
+    assert client.post("/borrows/", json=new_borrow).status_code == 200
+    assert client.post("/borrows/", json=new_borrow).status_code == 400
+
+
+def test_import_unsupported_content_type(db_session):
+    response = client.post("/borrows/import", content=b"<xml/>", headers={"Content-Type": "application/xml"})
+    assert response.status_code == 415
+
+
+def test_export_books_ndjson(db_session):
+    expected = client.get("/books/", params={"limit": 100000}).json()
+
+    response = client.get("/books/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows == expected
+
+
+def test_export_borrows_csv(db_session):
+    response = client.get("/borrows/export", params={"format": "csv"})
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "book_id", "reader_id", "borrow_date", "return_date", "version"]
+    assert len(rows) - 1 == len(client.get("/borrows/", params={"limit": 100000}).json())
+
+    assert client.get("/borrows/export", params={"format": "xml"}).status_code == 400
+
+
+def test_search_books(db_session):
+    ids = []
+    for title, description in [("Zebra Crossing", "A story about a zebra."),
+                               ("The Zebrafish", "Marine biology."),
+                               ("Horses", "Not about zebras at all, only a zebra mention.")]:
+        response = client.post("/books/", json={"title": title, "description": description, "author_id": 2,
+                                                "available_copies": 1})
+        ids.append(response.json()["id"])
+
+    response = client.get("/books/search", params={"q": "zebra"})
+    assert response.status_code == 200
+    # Совпадение в названии ранжируется выше совпадения только в описании
+    assert [book["id"] for book in response.json()] == [ids[0], ids[2]]
+
+    response = client.get("/books/search", params={"q": "zebra*", "limit": 2})
+    first_page = [book["id"] for book in response.json()]
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get("/books/search", params={"q": "zebra*", "limit": 2, "after": cursor})
+    assert sorted(first_page + [book["id"] for book in response.json()]) == sorted(ids)
+
+    client.put(f"/books/{ids[1]}", json={"title": "The Goldfish", "description": "Marine biology.", "author_id": 2,
+                                         "available_copies": 1})
+    client.delete(f"/books/{ids[0]}")
+    response = client.get("/books/search", params={"q": "zebra*"})
+    assert [book["id"] for book in response.json()] == [ids[2]]
+
+
+def test_search_books_invalid_query(db_session):
+    assert client.get("/books/search", params={"q": "  ()  "}).status_code == 400
+    assert client.get("/books/search", params={"q": "war", "after": "broken"}).status_code == 400
+
+
+def test_cached_reads_see_writes(db_session):
+    author_id = client.post("/authors/", json={"first_name": "Cache", "last_name": "Author",
+                                               "birth_date": "1900-01-01"}).json()["id"]
+    book_id = client.post("/books/", json={"title": "Cached", "author_id": author_id,
+                                           "available_copies": 1}).json()["id"]
+    assert client.get(f"/books/{book_id}").json()["title"] == "Cached"
+    # Повторное чтение берется из кэша
+    assert client.get(f"/books/{book_id}").json()["title"] == "Cached"
+
+    client.put(f"/books/{book_id}", json={"title": "Cached v2", "author_id": author_id, "available_copies": 1})
+    assert client.get(f"/books/{book_id}").json()["title"] == "Cached v2"
+
+    borrow_id = client.post("/borrows/", json={"book_id": book_id, "reader_name": "Reader",
+                                                "borrow_date": "2024-01-01"}).json()["id"]
+    assert client.get(f"/books/{book_id}").json()["available_copies"] == 0
+    assert client.get(f"/borrows/{borrow_id}").json()["return_date"] is None
+
+    client.patch(f"/borrows/{borrow_id}/return", params={"return_date": "2024-01-10"})
+    assert client.get(f"/books/{book_id}").json()["available_copies"] == 1
+    assert client.get(f"/borrows/{borrow_id}").json()["return_date"] == "2024-01-10"
+
+    client.delete(f"/books/{book_id}")
+    assert client.get(f"/books/{book_id}").status_code == 404
+    assert client.get(f"/borrows/{borrow_id}").status_code == 404
+
+
+def test_cached_author_books_after_author_delete(db_session):
+    author_id = client.post("/authors/", json={"first_name": "Gone", "last_name": "Author",
+                                               "birth_date": "1900-01-01"}).json()["id"]
+    book_id = client.post("/books/", json={"title": "Orphan", "author_id": author_id,
+                                           "available_copies": 1}).json()["id"]
+    assert client.get(f"/books/{book_id}").json()["author_id"] == author_id
+    assert client.get(f"/authors/{author_id}").status_code == 200
+
+    client.delete(f"/authors/{author_id}")
+    assert client.get(f"/authors/{author_id}").status_code == 404
+    assert client.get(f"/books/{book_id}").json()["author_id"] is None
+
+    stats = client.get("/cache/stats").json()
+    assert stats["hits"] > 0
+
+
+def test_get_db_routes_reads_to_read_pool(db_session):
+    for method, expected in (("GET", read_engine), ("POST", engine), ("PATCH", engine), ("DELETE", engine)):
+        sessions = get_db(SimpleNamespace(method=method))
+        assert next(sessions).get_bind() is expected
+        sessions.close()
+
+
+def count_statements(url, params=None, method="GET", json=None, bind=None):
+    statements = []
+    bind = bind or (read_engine if method == "GET" else engine)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(bind, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.request(method, url, params=params, json=json)
+    finally:
+        event.remove(bind, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200
+    return response.json(), len(statements)
+
+
+def test_expand_uses_constant_number_of_queries(db_session):
+    authors = [
+        client.post("/authors/", json={"first_name": f"Expand {i}", "last_name": "Author",
+                                       "birth_date": "1900-01-01"}).json()["id"]
+        for i in range(5)
+    ]
+    for i in range(30):
+        client.post("/books/", json={"title": f"Expand {i}", "author_id": authors[i % 5], "available_copies": 1})
+
+    small, small_count = count_statements("/books/", {"expand": "author", "limit": 2, "order_by": "-id"})
+    large, large_count = count_statements("/books/", {"expand": "author", "limit": 25, "order_by": "-id"})
+    assert len(large) == 25
+    assert small_count == large_count
+    assert all(book["author"]["id"] == book["author_id"] for book in large)
+
+    small, small_count = count_statements("/authors/", {"expand": "books", "limit": 2, "order_by": "-id"})
+    large, large_count = count_statements("/authors/", {"expand": "books", "limit": 5, "order_by": "-id"})
+    assert small_count == large_count
+    assert [len(author["books"]) for author in large] == [6] * 5
+
+
+def test_list_without_expand_has_no_relations(db_session):
+    books = client.get("/books/", params={"limit": 2}).json()
+    assert "author" not in books[0]
+    assert client.get("/books/", params={"expand": "reviews"}).status_code == 400
+
+
+def test_nested_endpoints(db_session):
+    author_id = client.post("/authors/", json={"first_name": "Nested", "last_name": "Author",
+                                               "birth_date": "1900-01-01"}).json()["id"]
+    book_ids = [
+        client.post("/books/", json={"title": f"Nested {i}", "author_id": author_id,
+                                     "available_copies": 5}).json()["id"]
+        for i in range(3)
+    ]
+    for day in (1, 2, 3):
+        client.post("/borrows/", json={"book_id": book_ids[0], "reader_name": "Reader",
+                                       "borrow_date": f"2024-02-0{day}"})
+
+    first = client.get(f"/authors/{author_id}/books", params={"limit": 2})
+    second = client.get(f"/authors/{author_id}/books", params={"limit": 2, "after": first.headers["X-Next-Cursor"]})
+    assert [book["id"] for book in first.json() + second.json()] == book_ids
+
+    history = client.get(f"/books/{book_ids[0]}/borrows").json()
+    assert [borrow["borrow_date"] for borrow in history] == ["2024-02-03", "2024-02-02", "2024-02-01"]
+    assert client.get(f"/books/{book_ids[1]}/borrows").json() == []
+    assert client.get("/authors/999999/books").status_code == 404
+    assert client.get("/books/999999/borrows").status_code == 404
+
+
+def create_author_with_books(books, borrows_per_book=0):
+    author_id = client.post("/authors/", json={"first_name": "Prolific", "last_name": "Author",
+                                               "birth_date": "1900-01-01"}).json()["id"]
+    book_ids = []
+    for i in range(books):
+        book_id = client.post("/books/", json={"title": f"Prolific {i}", "author_id": author_id,
+                                               "available_copies": 100}).json()["id"]
+        for _ in range(borrows_per_book):
+            client.post("/borrows/", json={"book_id": book_id, "reader_name": "Reader", "borrow_date": "2024-03-01"})
+        book_ids.append(book_id)
+    return author_id, book_ids
+
+
+def test_delete_author_is_set_based(db_session):
+    small_author, _ = create_author_with_books(1)
+    large_author, large_books = create_author_with_books(20)
+
+    _, small_count = count_statements(f"/authors/{small_author}", method="DELETE")
+    deleted, large_count = count_statements(f"/authors/{large_author}", method="DELETE")
+    assert deleted["id"] == large_author
+    assert small_count == large_count
+    assert all(client.get(f"/books/{book_id}").json()["author_id"] is None for book_id in large_books)
+
+
+def test_delete_book_is_set_based(db_session):
+    _, (small_book,) = create_author_with_books(1, borrows_per_book=1)
+    _, (large_book,) = create_author_with_books(1, borrows_per_book=20)
+
+    _, small_count = count_statements(f"/books/{small_book}", method="DELETE")
+    deleted, large_count = count_statements(f"/books/{large_book}", method="DELETE")
+    assert deleted["id"] == large_book
+    assert small_count == large_count
+    assert db_session.query(BorrowModel).filter(BorrowModel.book_id == large_book).count() == 0
+
+
+def test_batch_delete(db_session):
+    author_ids = [create_author_with_books(2)[0] for _ in range(3)]
+    _, book_ids = create_author_with_books(3, borrows_per_book=2)
+
+    response = client.post("/authors/batch-delete", json={"ids": author_ids + [999999]})
+    assert response.status_code == 200
+    assert response.json() == {"deleted": sorted(author_ids), "not_found": [999999]}
+    assert all(client.get(f"/authors/{author_id}").status_code == 404 for author_id in author_ids)
+
+    response = client.post("/books/batch-delete", json={"ids": book_ids})
+    assert response.json() == {"deleted": book_ids, "not_found": []}
+    assert client.get(f"/books/{book_ids[0]}/borrows").status_code == 404
+
+    assert client.post("/books/batch-delete", json={"ids": []}).status_code == 422
+    assert client.post("/books/batch-delete", json={"ids": list(range(1001))}).status_code == 422
+
+
+def test_batch_delete_splits_ids_under_sqlite_variable_limit(db_session):
+    # Предел SQLite до 3.32: 999 параметров в запросе
+    def limit_variables(dbapi_connection, connection_record):
+        dbapi_connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+
+    count = MAX_BATCH_SIZE
+    assert count > ID_CHUNK_SIZE
+    author_ids = db_session.scalars(insert(AuthorModel).returning(AuthorModel.id), [
+        {"first_name": "Chunked", "last_name": f"Author {i}", "birth_date": date(1900, 1, 1)}
+        for i in range(count)]).all()
+    book_ids = db_session.scalars(insert(BookModel).returning(BookModel.id), [
+        {"title": f"Chunked {i}", "author_id": author_id, "available_copies": 1}
+        for i, author_id in enumerate(author_ids)]).all()
+    db_session.commit()
+
+    engine.dispose()
+    event.listen(engine, "connect", limit_variables)
+    try:
+        authors = client.post("/authors/batch-delete", json={"ids": author_ids})
+        books = client.post("/books/batch-delete", json={"ids": book_ids})
+    finally:
+        event.remove(engine, "connect", limit_variables)
+        engine.dispose()
+    assert authors.status_code == 200
+    assert authors.json() == {"deleted": sorted(author_ids), "not_found": []}
+    assert books.json() == {"deleted": sorted(book_ids), "not_found": []}
+    db_session.expire_all()
+    assert db_session.query(BookModel).filter(BookModel.id.in_(book_ids[:ID_CHUNK_SIZE])).count() == 0
+
+
+def test_batch_delete_takes_write_lock_first(db_session):
+    author_id, book_ids = create_author_with_books(2, borrows_per_book=1)
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0])
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        books = client.post("/books/batch-delete", json={"ids": book_ids[:1] + [999999]}).json()
+        authors = client.post("/authors/batch-delete", json={"ids": [author_id]}).json()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    assert books == {"deleted": book_ids[:1], "not_found": [999999]}
+    assert authors == {"deleted": [author_id], "not_found": []}
+    # Нет предварительного SELECT: первый запрос уже берет блокировку записи, найденные строки определяет RETURNING
+    assert statements == ["DELETE", "DELETE", "DELETE", "UPDATE", "DELETE"]
+
+
+def test_writes_use_single_statement(db_session):
+    author = {"first_name": "Single", "last_name": "Statement", "birth_date": "1900-01-01"}
+    created, count = count_statements("/authors/", method="POST", json=author)
+    assert count == 1
+    updated, count = count_statements(f"/authors/{created['id']}", method="PUT", json={**author, "first_name": "One"})
+    assert count == 1
+    assert updated == {**author, "first_name": "One", "id": created["id"], "version": 2}
+
+    book = {"title": "Single", "author_id": created["id"], "available_copies": 1}
+    created_book, count = count_statements("/books/", method="POST", json=book)
+    assert count == 1
+    updated_book, count = count_statements(f"/books/{created_book['id']}", method="PUT",
+                                           json={**book, "title": "Single v2"})
+    assert count == 1
+    assert updated_book["title"] == "Single v2"
+
+    # Читатель по идентификатору: остаток книги и лимит читателя проверяются без отдельных запросов
+    reader = client.post("/readers/", json={"name": "Single Statement Reader"}).json()
+    borrow, count = count_statements("/borrows/", method="POST", json={"book_id": created_book["id"],
+                                                                       "reader_id": reader["id"],
+                                                                       "borrow_date": "2024-04-01"})
+    assert count == 2
+    returned, count = count_statements(f"/borrows/{borrow['id']}/return", method="PATCH",
+                                       params={"return_date": "2024-04-02"})
+    assert count == 2
+    assert returned == {**borrow, "return_date": "2024-04-02", "version": 2}
+
+    assert client.put("/authors/999999", json=author).status_code == 404
+    assert client.put("/books/999999", json=book).status_code == 404
+
+
+
+def test_list_fast_path_matches_schema(db_session):
+    from core.schemas.author import Author
+    from core.schemas.book import Book
+    from core.schemas.borrow import Borrow
+
+    author_id, book_ids = create_author_with_books(2, borrows_per_book=1)
+    borrow = client.post("/borrows/", json={"book_id": book_ids[1], "reader_name": "Reader",
+                                            "borrow_date": "2024-05-01"}).json()
+    client.patch(f"/borrows/{borrow['id']}/return", params={"return_date": "2024-05-10"})
+
+    for url, schema in [("/authors/", Author), ("/books/", Book), ("/borrows/", Borrow),
+                        (f"/authors/{author_id}/books", Book), (f"/books/{book_ids[1]}/borrows", Borrow)]:
+        response = client.get(url, params={"limit": 2, "order_by": "-id"})
+        assert response.status_code == 200
+        assert response.headers["X-Next-Cursor"]
+        # Ответ совпадает с сериализацией через схему: те же поля, даты в ISO-формате
+        assert [schema.model_validate(item).model_dump(mode="json") for item in response.json()] == response.json()
+
+    latest = client.get("/borrows/", params={"limit": 2, "order_by": "-id"}).json()
+    assert latest[0] == {**borrow, "return_date": "2024-05-10", "version": 2}
+    assert latest[1]["return_date"] is None
+
+
+def test_metrics_and_server_timing(db_session):
+    response = client.get("/books/", params={"limit": 2})
+    assert 'desc="queries=1"' in response.headers["server-timing"]
+    book_id = response.json()[0]["id"]
+    reader_id = client.post("/readers/", json={"name": "Timing Reader"}).json()["id"]
+    response = client.post("/borrows/", json={"book_id": book_id, "reader_id": reader_id, "borrow_date": "2024-06-01"})
+    assert 'desc="queries=2"' in response.headers["server-timing"]
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    assert 'http_requests_total{method="POST",route="/borrows/",status="200"}' in {line.rsplit(" ", 1)[0] for line in lines}
+    assert any(line.startswith('http_request_db_statements_total{method="GET",route="/books/"}') for line in lines)
+    assert any(line.startswith("db_statements_total ") for line in lines)
+
+
+def test_conditional_requests(db_session):
+    author_id, (book_id,) = create_author_with_books(1)
+    response = client.get(f"/books/{book_id}")
+    assert response.headers["ETag"] == '"1"'
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(read_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(f"/books/{book_id}", headers={"If-None-Match": '"0", "1"'})
+    finally:
+        event.remove(read_engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 304
+    assert response.content == b""
+    # Для 304 читается только версия книги
+    assert len(statements) == 1 and statements[0].startswith("SELECT book.version")
+
+    # Выдача меняет остаток и версию книги
+    client.post("/borrows/", json={"book_id": book_id, "reader_name": "Reader", "borrow_date": "2024-07-01"})
+    response = client.get(f"/books/{book_id}", headers={"If-None-Match": '"1"'})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"2"'
+    book = {key: response.json()[key] for key in ("title", "author_id", "available_copies")}
+
+    assert client.put(f"/books/{book_id}", json=book, headers={"If-Match": '"1"'}).status_code == 412
+    response = client.put(f"/books/{book_id}", json={**book, "title": "Renamed"}, headers={"If-Match": '"2"'})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"3"'
+    assert client.put("/books/999999", json=book, headers={"If-Match": '"1"'}).status_code == 404
+
+    # Для If-Match слабый ETag не совпадает
+    assert client.delete(f"/books/{book_id}", headers={"If-Match": 'W/"3"'}).status_code == 412
+    assert client.delete(f"/authors/{author_id}", headers={"If-Match": '"5"'}).status_code == 412
+    assert client.delete(f"/books/{book_id}", headers={"If-Match": '"3"'}).status_code == 200
+    assert client.delete(f"/books/{book_id}", headers={"If-Match": '"3"'}).status_code == 404
+
+
+def test_conditional_list_requests(db_session):
+    author_id, book_ids = create_author_with_books(2)
+    params = {"limit": 2, "order_by": "-id"}
+    response = client.get("/books/", params=params)
+    etag = response.headers["ETag"]
+
+    response = client.get("/books/", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    client.put(f"/books/{book_ids[0]}", json={"title": "Changed", "author_id": author_id, "available_copies": 1})
+    response = client.get("/books/", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.headers["X-Next-Cursor"]
+    assert [book["id"] for book in response.json()] == book_ids[::-1]
+
+
+def test_batch_get(db_session):
+    author_id, book_ids = create_author_with_books(3, borrows_per_book=1)
+    ids = [book_ids[2], 999999, book_ids[0], book_ids[2]]
+
+    response, count = count_statements("/books/batch-get", method="POST", json={"ids": ids}, bind=read_engine)
+    assert count == 1
+    assert [book["id"] for book in response["items"]] == [book_ids[2], book_ids[0]]
+    assert response["items"][0] == client.get(f"/books/{book_ids[2]}").json()
+    assert response["not_found"] == [999999]
+
+    response = client.post("/authors/batch-get", json={"ids": [author_id]}).json()
+    assert response == {"items": [client.get(f"/authors/{author_id}").json()], "not_found": []}
+
+    borrows = client.get(f"/books/{book_ids[1]}/borrows").json()
+    response = client.post("/borrows/batch-get", json={"ids": [borrows[0]["id"], 0]}).json()
+    assert response == {"items": borrows, "not_found": [0]}
+
+    # Идентификаторы делятся на части меньше ограничения SQLite на число параметров
+    _, count = count_statements("/books/batch-get", method="POST", json={"ids": list(range(1, 1001))},
+                                bind=read_engine)
+    assert count == 2
+    assert client.post("/books/batch-get", json={"ids": list(range(1001))}).status_code == 422
+
+
+def test_batch_borrow(db_session):
+    author_id, (book_id,) = create_author_with_books(1)
+    scarce_id = client.post("/books/", json={"title": "Scarce", "author_id": author_id,
+                                             "available_copies": 1}).json()["id"]
+    reader = client.post("/readers/", json={"name": "Batch Reader", "loan_limit": 3}).json()
+    item = {"reader_id": reader["id"], "borrow_date": "2024-05-01"}
+    items = [{**item, "book_id": book_id}, {**item, "book_id": scarce_id}, {**item, "book_id": scarce_id},
+             {**item, "book_id": 999999}]
+
+    # По умолчанию пакет атомарный: ошибка в одном элементе отменяет весь пакет
+    response = client.post("/borrows/batch", json={"items": items}).json()
+    assert (response["succeeded"], response["failed"]) == (0, 4)
+    assert [result["error"] for result in response["results"]][2:] == ["Book is not available for borrowing",
+                                                                       "Book not found"]
+    assert not response["results"][0]["ok"] and response["results"][0]["item"] is None
+    assert client.get(f"/books/{scarce_id}").json()["available_copies"] == 1
+    assert client.get(f"/readers/{reader['id']}").json()["active_loans"] == 0
+
+    response = client.post("/borrows/batch", json={"items": items, "atomic": False}).json()
+    assert (response["succeeded"], response["failed"]) == (2, 2)
+    assert [result["ok"] for result in response["results"]] == [True, True, False, False]
+    created = response["results"][1]["item"]
+    assert created == client.get(f"/borrows/{created['id']}").json()
+    assert client.get(f"/books/{scarce_id}").json()["available_copies"] == 0
+    assert client.get(f"/books/{book_id}").json()["available_copies"] == 99
+
+    # Лимит читателя учитывает и уже выданные, и предыдущие элементы пакета
+    response = client.post("/borrows/batch", json={"items": [{**item, "book_id": book_id}] * 2,
+                                                   "atomic": False}).json()
+    assert [result["error"] for result in response["results"]] == [None, "Reader has reached the loan limit"]
+
+    assert client.post("/borrows/batch", json={"items": []}).status_code == 422
+
+
+def test_batch_borrow_uses_constant_number_of_statements(db_session):
+    _, book_ids = create_author_with_books(20)
+    reader = client.post("/readers/", json={"name": "Bulk Desk Reader", "loan_limit": 100}).json()
+    item = {"reader_id": reader["id"], "borrow_date": "2024-05-01"}
+
+    small, small_count = count_statements("/borrows/batch", method="POST",
+                                          json={"items": [{**item, "book_id": book_ids[0]}]})
+    large, large_count = count_statements("/borrows/batch", method="POST",
+                                          json={"items": [{**item, "book_id": book_id} for book_id in book_ids]})
+    assert (small["succeeded"], large["succeeded"]) == (1, 20)
+    assert small_count == large_count
+
+    returns = [{"borrow_id": result["item"]["id"], "return_date": "2024-05-02"} for result in large["results"]]
+    _, small_count = count_statements("/borrows/batch/return", method="PATCH", json={"items": returns[:1]})
+    _, large_count = count_statements("/borrows/batch/return", method="PATCH", json={"items": returns[1:]})
+    assert small_count == large_count
+
+
+def test_batch_return(db_session):
+    _, (book_id,) = create_author_with_books(1)
+    reader = client.post("/readers/", json={"name": "Batch Return Reader"}).json()
+    item = {"book_id": book_id, "reader_id": reader["id"], "borrow_date": "2024-05-01"}
+    created = client.post("/borrows/batch", json={"items": [item] * 3}).json()["results"]
+    borrow_ids = [result["item"]["id"] for result in created]
+    assert len(set(borrow_ids)) == 3
+    first = {"borrow_id": borrow_ids[0], "return_date": "2024-05-02"}
+
+    response = client.patch("/borrows/batch/return", json={"items": [first, {**first, "borrow_id": 999999}]}).json()
+    assert [result["error"] for result in response["results"]] == ["Batch was not applied because other items failed",
+                                                                   "Borrow record not found"]
+    assert client.get(f"/borrows/{borrow_ids[0]}").json()["return_date"] is None
+
+    items = [first, first, {"borrow_id": borrow_ids[1], "return_date": "2024-05-03"}]
+    response = client.patch("/borrows/batch/return", json={"items": items, "atomic": False}).json()
+    assert [result["error"] for result in response["results"]] == [None, "Book has already been returned", None]
+    assert response["results"][2]["item"] == client.get(f"/borrows/{borrow_ids[1]}").json()
+    assert response["results"][2]["item"]["return_date"] == "2024-05-03"
+    assert client.get(f"/books/{book_id}").json()["available_copies"] == 99
+    assert client.get(f"/readers/{reader['id']}").json()["active_loans"] == 1
+
+    response = client.patch("/borrows/batch/return", json={"items": [first]}).json()
+    assert response["results"][0]["error"] == "Book has already been returned"
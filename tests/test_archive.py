@@ -0,0 +1,185 @@
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from core.cruds.archive import ArchiveCRUD
+from core.cruds.book import BookCRUD
+from core.cruds.borrow import BorrowCRUD
+from core.models.author import Author
+from core.models.book import Book
+from core.models.borrow import Borrow, BorrowArchive
+from core.models.reader import Reader
+from core.models.stats import BookStats
+from core.pagination import encode_cursor
+from core.schemas.borrow import BorrowCreate
+from db.archive import Archiver, archive_all
+from db.database import SessionLocal, create_db
+from db.migrations import rebuild_book_stats, rebuild_reader_loans, upgrade_db
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'library.db'}")
+    upgrade_db(engine)
+    with Session(engine) as db:
+        db.add(Author(id=1, first_name="Leo", last_name="Tolstoy", birth_date=date(1828, 9, 9)))
+        db.add(Book(id=1, title="War and Peace", author_id=1, available_copies=10))
+        db.add(Reader(id=1, name="Alice"))
+        db.commit()
+    yield engine
+    engine.dispose()
+
+
+def borrow(db, day, returned=None):
+    row = BorrowCRUD.borrow_book(db, BorrowCreate(book_id=1, reader_id=1, borrow_date=date(2020, 1, day)))
+    if returned is not None:
+        row = BorrowCRUD.return_borrow(db, row.id, date(2020, 2, returned))
+    return row
+
+
+def counts(engine) -> tuple[int, int]:
+    with engine.connect() as conn:
+        return (conn.scalar(select(func.count()).select_from(Borrow)),
+                conn.scalar(select(func.count()).select_from(BorrowArchive)))
+
+
+def test_archive_moves_old_returned_loans_in_batches(engine):
+    with Session(engine) as db:
+        old = [borrow(db, day, returned=day) for day in range(1, 6)]
+        recent = borrow(db, 10, returned=28)
+        active = borrow(db, 11)
+
+    with Session(engine) as db:
+        assert ArchiveCRUD.archive_returned(db, before=date(2020, 2, 20), limit=2) == 2
+    assert counts(engine) == (5, 2)
+
+    assert archive_all(sessionmaker(bind=engine), as_of=date(2021, 2, 20), batch_size=2, pause=0) == 3
+    assert counts(engine) == (2, 5)
+    with Session(engine) as db:
+        assert sorted(db.scalars(select(BorrowArchive.id))) == [row.id for row in old]
+        assert sorted(db.scalars(select(Borrow.id))) == [recent.id, active.id]
+        # Перенос в архив не меняет счетчики выдач книги и читателя
+        assert db.get(BookStats, 1).total_loans == 7
+        assert db.get(BookStats, 1).active_loans == 1
+        assert db.get(Reader, 1).active_loans == 1
+        assert db.get(Book, 1).available_copies == 9
+
+    # Пересчет учитывает архив и дает те же значения
+    with engine.begin() as conn:
+        rebuild_book_stats(conn)
+    with Session(engine) as db:
+        assert (db.get(BookStats, 1).active_loans, db.get(BookStats, 1).total_loans) == (1, 7)
+
+
+def test_history_reads_include_archive(engine):
+    with Session(engine) as db:
+        rows = [borrow(db, day, returned=day) for day in range(1, 5)] + [borrow(db, 5)]
+        ArchiveCRUD.archive_returned(db, before=date(2020, 2, 3))
+        expected = [row.id for row in rows[::-1]]
+
+        assert [row.id for row in BorrowCRUD.get_book_borrows(db, 1, limit=10)] == expected[:3]
+        history = BorrowCRUD.get_book_borrows(db, 1, limit=10, include_archive=True)
+        assert [row.id for row in history] == expected
+        assert history[-1]._asdict() == {"book_id": 1, "reader_id": 1, "borrow_date": date(2020, 1, 1),
+                                         "return_date": date(2020, 2, 1), "id": rows[0].id, "version": 2}
+
+        # Курсор и skip работают поверх обеих таблиц
+        first = BorrowCRUD.get_reader_borrows(db, 1, limit=2, order_by="borrow_date", include_archive=True)
+        after = encode_cursor("borrow_date", BorrowCRUD.SORTS["borrow_date"].values(first[-1]))
+        rest = BorrowCRUD.get_reader_borrows(db, 1, limit=10, after=after, order_by="borrow_date",
+                                             include_archive=True)
+        assert [row.id for row in first + rest] == expected[::-1]
+        skipped = BorrowCRUD.get_reader_borrows(db, 1, skip=1, limit=2, include_archive=True)
+        assert [row.id for row in skipped] == expected[1:3]
+        assert BorrowCRUD.get_reader_borrows(db, 1, active=True, include_archive=True)[0].id == rows[-1].id
+
+        assert BorrowCRUD.get_borrow(db, rows[0].id).return_date == date(2020, 2, 1)
+        assert BorrowCRUD.get_borrow_version(db, rows[0].id) == 2
+        with pytest.raises(ValueError, match="already been returned"):
+            BorrowCRUD.return_borrow(db, rows[0].id, date(2020, 3, 1))
+
+
+def test_archived_ids_are_not_reused(engine):
+    with Session(engine) as db:
+        last = borrow(db, 1, returned=1)
+        ArchiveCRUD.archive_returned(db, before=date(2020, 3, 1))
+        assert counts(engine) == (0, 1)
+        assert borrow(db, 2).id > last.id
+
+
+def test_delete_book_removes_archived_loans(engine):
+    with Session(engine) as db:
+        borrow(db, 1, returned=1)
+        borrow(db, 2)
+        ArchiveCRUD.archive_returned(db, before=date(2020, 3, 1))
+        BookCRUD.delete_book(db, 1)
+    assert counts(engine) == (0, 0)
+
+
+def test_archive_selects_oldest_by_partial_index(engine):
+    stmt = (select(Borrow.id).where(Borrow.return_date.isnot(None), Borrow.return_date < date(2020, 1, 1))
+            .order_by(Borrow.return_date, Borrow.id).limit(500))
+    sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        plan = "\n".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+    assert "USING COVERING INDEX ix_borrow_returned_return_date_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_upgrade_rebuilds_borrow_with_autoincrement(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    upgrade_db(engine)
+    with engine.begin() as conn:
+        # База в прежнем виде: таблица borrow без AUTOINCREMENT и без архива
+        conn.execute(text("INSERT INTO book (id, title, available_copies) VALUES (1, 'Anna Karenina', 5)"))
+        conn.execute(text("INSERT INTO reader (id, name, loan_limit) VALUES (1, 'Alice', 10)"))
+        conn.execute(text("DROP TABLE borrow"))
+        conn.execute(text("CREATE TABLE borrow (id INTEGER PRIMARY KEY, book_id INTEGER NOT NULL, "
+                          "reader_id INTEGER, borrow_date DATE NOT NULL, return_date DATE, "
+                          "version INTEGER NOT NULL DEFAULT 1)"))
+        conn.execute(text("INSERT INTO borrow (book_id, reader_id, borrow_date, return_date) VALUES "
+                          "(1, 1, '2020-01-01', '2020-01-02'), (1, 1, '2020-01-03', NULL)"))
+        conn.execute(text("DROP TABLE borrow_archive"))
+        conn.execute(text("PRAGMA user_version = 4"))
+
+    upgrade_db(engine)
+    with engine.begin() as conn:
+        rebuild_book_stats(conn)
+        rebuild_reader_loans(conn)
+        sql = conn.scalar(text("SELECT sql FROM sqlite_master WHERE name = 'borrow'"))
+    assert "AUTOINCREMENT" in sql
+    with Session(engine) as db:
+        assert ArchiveCRUD.archive_returned(db, before=date(2020, 3, 1)) == 1
+        assert (db.get(BookStats, 1).active_loans, db.get(BookStats, 1).total_loans) == (1, 2)
+        assert db.get(Reader, 1).active_loans == 1
+        assert [row.id for row in BorrowCRUD.get_book_borrows(db, 1, include_archive=True)] == [2, 1]
+    engine.dispose()
+
+
+def test_archiver_thread_and_endpoints():
+    create_db()
+    author_id = client.post("/authors/", json={"first_name": "Archive", "last_name": "Author",
+                                               "birth_date": "1900-01-01"}).json()["id"]
+    book_id = client.post("/books/", json={"title": "Archived", "author_id": author_id,
+                                           "available_copies": 2}).json()["id"]
+    reader_id = client.post("/readers/", json={"name": "Archive Reader"}).json()["id"]
+    loans = [client.post("/borrows/", json={"book_id": book_id, "reader_id": reader_id,
+                                            "borrow_date": f"2000-01-0{day}"}).json() for day in (1, 2)]
+    client.patch(f"/borrows/{loans[0]['id']}/return", params={"return_date": "2000-01-05"})
+
+    archiver = Archiver(SessionLocal, interval=60).start()
+    archiver.stop()
+    assert archiver.archived >= 1
+
+    assert [loan["id"] for loan in client.get(f"/books/{book_id}/borrows").json()] == [loans[1]["id"]]
+    history = client.get(f"/books/{book_id}/borrows", params={"include_archive": True}).json()
+    assert [loan["id"] for loan in history] == [loans[1]["id"], loans[0]["id"]]
+    history = client.get(f"/readers/{reader_id}/borrows", params={"active": False, "include_archive": True}).json()
+    assert [loan["id"] for loan in history] == [loans[0]["id"]]
+    assert client.get(f"/borrows/{loans[0]['id']}").json()["return_date"] == "2000-01-05"
@@ -0,0 +1,202 @@
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+import main
+from async_routes import build_async_router, get_async_db, get_async_read_db
+from core.models.base import Base
+from core.write_queue import GroupSession, WriteQueue
+
+
+@pytest.fixture(scope="module")
+def database(tmp_path_factory):
+    path = tmp_path_factory.mktemp("async") / "library.db"
+    Base.metadata.create_all(bind=create_engine(f"sqlite:///{path}"))
+    return path
+
+
+@pytest.fixture(scope="module")
+def client(database):
+    path = database
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    session_factory = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with session_factory() as db:
+            yield db
+
+    app = FastAPI()
+    # Те же обработчики, что и в синхронном режиме, через асинхронную сессию
+    app.include_router(build_async_router(main.router, {main.get_db: get_async_db,
+                                                         main.get_read_db: get_async_read_db}))
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_read_db] = override_get_async_db
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_async_author_crud(client):
+    response = client.post("/authors/", json={"first_name": "Leo", "last_name": "Tolstoy", "birth_date": "1828-09-09"})
+    assert response.status_code == 200
+    author_id = response.json()["id"]
+
+    response = client.put(f"/authors/{author_id}",
+                          json={"first_name": "Lev", "last_name": "Tolstoy", "birth_date": "1828-09-09"})
+    assert response.status_code == 200
+    assert response.json()["first_name"] == "Lev"
+
+    response = client.get(f"/authors/{author_id}")
+    assert response.status_code == 200
+    assert response.json()["first_name"] == "Lev"
+
+    assert client.get("/authors/999").status_code == 404
+
+
+def test_async_books_cursor_pagination(client):
+    author_id = client.get("/authors/").json()[0]["id"]
+    for i in range(5):
+        client.post("/books/", json={"title": f"Book {i}", "author_id": author_id, "available_copies": 1})
+
+    first = client.get("/books/", params={"limit": 3})
+    second = client.get("/books/", params={"limit": 3, "after": first.headers["X-Next-Cursor"]})
+    assert [book["title"] for book in first.json() + second.json()] == [f"Book {i}" for i in range(5)]
+    assert "X-Next-Cursor" not in second.headers
+
+
+def test_async_borrow_and_return(client):
+    book = client.get("/books/", params={"limit": 1}).json()[0]
+
+    response = client.post("/borrows/", json={"book_id": book["id"], "reader_name": "Alice",
+                                              "borrow_date": "2023-01-01"})
+    assert response.status_code == 200
+    borrow_id = response.json()["id"]
+    assert client.get(f"/books/{book['id']}").json()["available_copies"] == 0
+
+    response = client.post("/borrows/", json={"book_id": book["id"], "reader_name": "Bob",
+                                              "borrow_date": "2023-01-02"})
+    assert response.status_code == 400
+
+    response = client.patch(f"/borrows/{borrow_id}/return", params={"return_date": "2023-01-10"})
+    assert response.status_code == 200
+    assert response.json()["return_date"] == "2023-01-10"
+    assert client.get(f"/books/{book['id']}").json()["available_copies"] == 1
+
+
+def test_async_delete_book(client):
+    book = client.get("/books/", params={"limit": 1, "order_by": "-id"}).json()[0]
+
+    response = client.delete(f"/books/{book['id']}")
+    assert response.status_code == 200
+    assert response.json()["id"] == book["id"]
+    assert client.get(f"/books/{book['id']}").status_code == 404
+
+
+def test_async_expand_and_nested_endpoints(client):
+    author_id = client.get("/authors/").json()[0]["id"]
+
+    books = client.get("/books/", params={"expand": "author", "limit": 3}).json()
+    assert all(book["author"]["id"] == book["author_id"] for book in books)
+    authors = client.get("/authors/", params={"expand": "books"}).json()
+    all_books = client.get(f"/authors/{author_id}/books", params={"limit": 100}).json()
+    assert authors[0]["books"] == all_books
+
+    author_books = client.get(f"/authors/{author_id}/books", params={"limit": 2})
+    assert len(author_books.json()) == 2
+    assert "X-Next-Cursor" in author_books.headers
+
+    book_id = books[0]["id"]
+    assert client.get(f"/books/{book_id}/borrows").status_code == 200
+    assert client.get("/books/999/borrows").status_code == 404
+
+
+def test_async_conditional_requests(client):
+    book = client.get("/books/", params={"limit": 1}).json()[0]
+    response = client.get(f"/books/{book['id']}")
+    etag = response.headers["ETag"]
+    assert client.get(f"/books/{book['id']}", headers={"If-None-Match": etag}).status_code == 304
+
+    data = {key: book[key] for key in ("title", "author_id", "available_copies")}
+    assert client.put(f"/books/{book['id']}", json=data, headers={"If-Match": '"0"'}).status_code == 412
+    response = client.put(f"/books/{book['id']}", json=data, headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{book["version"] + 1}"'
+
+    page = client.get("/books/", params={"limit": 2})
+    assert client.get("/books/", params={"limit": 2}, headers={"If-None-Match": page.headers["ETag"]}).status_code == 304
+
+
+def test_async_batch_get(client):
+    books = client.get("/books/", params={"limit": 2}).json()
+    response = client.post("/books/batch-get", json={"ids": [books[1]["id"], -1, books[0]["id"]]})
+    assert response.json() == {"items": [books[1], books[0]], "not_found": [-1]}
+
+
+def test_async_stats(client):
+    author_id = client.get("/authors/").json()[0]["id"]
+    book = client.post("/books/", json={"title": "Stats", "author_id": author_id, "available_copies": 1}).json()
+    borrow = client.post("/borrows/", json={"book_id": book["id"], "reader_name": "Late",
+                                            "borrow_date": "1990-01-01"}).json()
+
+    summary = client.get("/stats/summary", params={"as_of": "2000-01-01"}).json()
+    assert summary["overdue_loans"] >= 1
+    assert book["id"] in [row["book_id"] for row in client.get("/stats/books", params={"limit": 100}).json()]
+    assert author_id in [row["author_id"] for row in client.get("/stats/authors").json()]
+    overdue = client.get("/stats/overdue", params={"as_of": "2000-01-01", "limit": 100}).json()
+    assert borrow["id"] in [row["id"] for row in overdue]
+
+
+def test_async_batch_borrow_and_return(client):
+    author_id = client.get("/authors/").json()[0]["id"]
+    book = client.post("/books/", json={"title": "Batch", "author_id": author_id, "available_copies": 2}).json()
+    item = {"book_id": book["id"], "reader_name": "Async Batch", "borrow_date": "2024-05-01"}
+
+    response = client.post("/borrows/batch", json={"items": [item] * 3}).json()
+    assert (response["succeeded"], response["failed"]) == (0, 3)
+    response = client.post("/borrows/batch", json={"items": [item] * 3, "atomic": False}).json()
+    assert [result["ok"] for result in response["results"]] == [True, True, False]
+
+    returns = [{"borrow_id": result["item"]["id"], "return_date": "2024-05-02"} for result in response["results"][:2]]
+    response = client.patch("/borrows/batch/return", json={"items": returns}).json()
+    assert response["succeeded"] == 2
+    assert client.get(f"/books/{book['id']}").json()["available_copies"] == 2
+
+
+def test_async_routes_share_sync_route_table(client):
+    def table(routes):
+        return [(route.path, route.methods, route.response_model) for route in routes if isinstance(route, APIRoute)]
+
+    assert table(client.app.router.routes) == table(main.router.routes)
+
+
+def test_async_write_through_queue_does_not_block_event_loop(client, database, monkeypatch):
+    write_queue = WriteQueue(sessionmaker(bind=create_engine(f"sqlite:///{database}"), class_=GroupSession,
+                                          expire_on_commit=False)).start()
+    monkeypatch.setattr(main, "write_queue", write_queue)
+    # Писатель занят, пока событийный цикл не обслужит другой запрос
+    served = threading.Event()
+    held = write_queue.submit(lambda db: served.wait(5))
+    pending = threading.Thread(target=client.post, args=("/authors/",), kwargs={"json": {
+        "first_name": "Queued", "last_name": "Author", "birth_date": "1900-01-01"}})
+    try:
+        pending.start()
+        deadline = time.monotonic() + 5
+        while write_queue._queue.qsize() == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Запрос на запись ждет очередь; чтение обслуживается тем же циклом событий
+        assert client.get("/authors/", params={"limit": 1}).status_code == 200
+        served.set()
+        assert held.result(5) is True
+        pending.join(5)
+        assert "Queued" in [author["first_name"] for author in client.get("/authors/", params={"limit": 100}).json()]
+    finally:
+        served.set()
+        pending.join(5)
+        write_queue.stop()
@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from core.cruds.borrow import BorrowCRUD
+from core.models.author import Author
+from core.models.base import Base
+from core.models.book import Book
+from core.models.borrow import Borrow
+from core.schemas.borrow import BorrowCreate
+
+COPIES = 50
+ATTEMPTS = 300
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # Отдельный файл базы: параллельные соединения SQLite должны видеть одни и те же данные
+    engine = create_engine(f"sqlite:///{tmp_path / 'library.db'}", connect_args={"timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with factory() as db:
+        author = Author(first_name="Leo", last_name="Tolstoy", birth_date=date(1828, 9, 9))
+        db.add(author)
+        db.flush()
+        db.add(Book(id=1, title="War and Peace", author_id=author.id, available_copies=COPIES))
+        db.commit()
+    yield factory
+    engine.dispose()
+
+
+def borrow_once(factory, i):
+    with factory() as db:
+        borrow = BorrowCreate(book_id=1, reader_name=f"Reader {i}", borrow_date=date(2023, 1, 1))
+        return BorrowCRUD.borrow_book(db=db, borrow=borrow)
+
+
+def return_once(factory, borrow_id):
+    with factory() as db:
+        try:
+            return BorrowCRUD.return_borrow(db=db, borrow_id=borrow_id, return_date=date(2023, 1, 10))
+        except ValueError:
+            return None
+
+
+def test_parallel_borrows_never_oversell(session_factory):
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(lambda i: borrow_once(session_factory, i), range(ATTEMPTS)))
+
+    assert sum(result is not None for result in results) == COPIES
+    with session_factory() as db:
+        assert db.get(Book, 1).available_copies == 0
+        assert db.scalar(select(func.count(Borrow.id))) == COPIES
+
+
+def test_parallel_returns_count_each_borrow_once(session_factory):
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        borrow_ids = [borrow.id for borrow in pool.map(lambda i: borrow_once(session_factory, i), range(COPIES))]
+        # Каждая выдача возвращается дважды параллельно, засчитаться должен только один возврат
+        results = list(pool.map(lambda borrow_id: return_once(session_factory, borrow_id), borrow_ids * 2))
+
+    assert sum(result is not None for result in results) == COPIES
+    with session_factory() as db:
+        assert db.get(Book, 1).available_copies == COPIES
+
+
+def test_return_unknown_borrow(session_factory):
+    with session_factory() as db:
+        assert BorrowCRUD.return_borrow(db=db, borrow_id=999, return_date=date(2023, 1, 10)) is None
@@ -0,0 +1,76 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from core.cache import EntityCache, LRUCache, invalidate_on_commit
+import core.cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_expires_entries():
+    clock = FakeClock()
+    cache = LRUCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 0
+
+
+def test_load_racing_with_invalidation_is_not_stored():
+    cache = EntityCache(LRUCache())
+
+    def stale_loader():
+        # Запись закоммитилась, пока шло чтение старых данных
+        cache.invalidate("book", 1)
+        return {"title": "old"}
+
+    assert cache.get_or_load("book", 1, stale_loader) == {"title": "old"}
+    assert cache.get_or_load("book", 1, lambda: {"title": "new"}) == {"title": "new"}
+    assert cache.get_or_load("book", 1, lambda: {"title": "unused"}) == {"title": "new"}
+
+
+def test_invalidation_applies_only_after_commit(monkeypatch):
+    cache = EntityCache(LRUCache())
+    monkeypatch.setattr(core.cache, "entity_cache", cache)
+    cache.get_or_load("book", 1, lambda: {"title": "cached"})
+    cache.get_or_load("book", 2, lambda: {"title": "cached"})
+    engine = create_engine("sqlite://")
+
+    with Session(engine) as db:
+        db.connection()
+        invalidate_on_commit(db, "book", 1)
+        db.rollback()
+        assert cache.get_or_load("book", 1, lambda: None) == {"title": "cached"}
+
+        db.connection()
+        invalidate_on_commit(db, "book", 2)
+        assert cache.get_or_load("book", 2, lambda: None) == {"title": "cached"}
+        db.commit()
+        assert cache.get_or_load("book", 2, lambda: None) is None
+    engine.dispose()
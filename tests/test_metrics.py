@@ -0,0 +1,72 @@
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from core.metrics import Histogram, MetricsMiddleware, MetricsRegistry, RequestStats, current_request, \
+    instrument_engine, metrics
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    stats = RequestStats()
+    for seconds in (0.0004, 0.003, 0.003, 20.0):
+        registry.request_started()
+        registry.request_finished("GET", '/books/{book_id}', 200, seconds, stats)
+
+    lines = registry.render().splitlines()
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/books/{book_id}",le="0.0005"} 1' in lines
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/books/{book_id}",le="0.005"} 3' in lines
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/books/{book_id}",le="10.0"} 3' in lines
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/books/{book_id}",le="+Inf"} 4' in lines
+    assert 'http_requests_total{method="GET",route="/books/{book_id}",status="200"} 4' in lines
+    assert "http_requests_in_flight 0" in lines
+
+
+def test_histogram_observe_uses_upper_bound():
+    histogram = Histogram((1.0, 2.0))
+    for value in (1.0, 1.5, 3.0):
+        histogram.observe(value)
+    assert histogram.counts == [1, 1, 1]
+    assert histogram.sum == 5.5
+
+
+def test_instrumented_engine_counts_request_statements(caplog):
+    engine = create_engine("sqlite://")
+    instrument_engine(engine, slow_query_ms=0)
+    before = metrics.statements
+    stats = RequestStats()
+    token = current_request.set(stats)
+    try:
+        with caplog.at_level(logging.WARNING, logger="library.sql"), engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+    finally:
+        current_request.reset(token)
+
+    assert stats.statements == 2
+    assert stats.db_seconds > 0
+    assert metrics.statements - before == 2
+    assert "SELECT 2" in caplog.text
+
+
+def test_middleware_labels_routes_by_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    before = metrics.requests.get(("GET", "/items/{item_id}", 200), 0)
+    response = client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing/3")
+
+    assert response.headers["server-timing"].startswith("app;dur=")
+    assert 'desc="queries=0"' in response.headers["server-timing"]
+    assert metrics.requests[("GET", "/items/{item_id}", 200)] - before == 2
+    assert ("GET", "unmatched", 404) in metrics.requests
+    assert not any(route == "/items/1" for _, route, _ in metrics.requests)
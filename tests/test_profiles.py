@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from db.profiles import DEFAULT_DB_PROFILE, PROFILES, build_async_engine, build_engine, engine_options, get_profile
+
+
+def pragma(conn, name):
+    return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_prod_profile_applies_pragmas(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'library.db'}", PROFILES["prod"])
+    with engine.connect() as conn:
+        assert pragma(conn, "journal_mode") == "wal"
+        assert pragma(conn, "synchronous") == 1  # NORMAL
+        assert pragma(conn, "busy_timeout") == 5000
+        assert pragma(conn, "cache_size") == -65536
+    assert engine.echo is False
+    assert engine.pool.size() == PROFILES["prod"].pool_size
+    engine.dispose()
+
+
+def test_async_engine_applies_pragmas(tmp_path):
+    async def check():
+        engine = build_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'library.db'}", PROFILES["test"])
+        async with engine.connect() as conn:
+            journal_mode = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+            synchronous = (await conn.execute(text("PRAGMA synchronous"))).scalar()
+        await engine.dispose()
+        return journal_mode, synchronous
+
+    assert asyncio.run(check()) == ("wal", 0)  # synchronous=OFF
+
+
+def test_pool_options_skipped_for_memory_database():
+    options = engine_options("sqlite://", PROFILES["prod"])
+    assert "pool_size" not in options
+    with build_engine("sqlite://", PROFILES["prod"]).connect() as conn:
+        assert pragma(conn, "cache_size") == -65536
+
+
+def test_default_profile_does_not_echo_sql():
+    assert DEFAULT_DB_PROFILE == "prod"
+    assert PROFILES[DEFAULT_DB_PROFILE].echo is False
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        get_profile("staging")
+
+
+def test_read_only_engine_rejects_writes(tmp_path):
+    url = f"sqlite:///{tmp_path / 'library.db'}"
+    writer = build_engine(url, PROFILES["test"])
+    reader = build_engine(url, PROFILES["test"], read_only=True)
+    with writer.begin() as conn:
+        conn.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY)"))
+
+    with reader.connect() as conn:
+        assert pragma(conn, "query_only") == 1
+        with pytest.raises(OperationalError):
+            conn.execute(text("INSERT INTO item (id) VALUES (1)"))
+    assert reader.pool.size() == PROFILES["test"].read_pool_size
+    writer.dispose()
+    reader.dispose()
+
+
+def test_reads_not_blocked_by_open_write_transaction(tmp_path):
+    url = f"sqlite:///{tmp_path / 'library.db'}"
+    writer = build_engine(url, PROFILES["test"])
+    reader = build_engine(url, PROFILES["test"], read_only=True)
+    with writer.begin() as conn:
+        conn.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO item (id) VALUES (1)"))
+
+    with writer.begin() as write_conn:
+        write_conn.execute(text("INSERT INTO item (id) VALUES (2)"))
+        # В режиме WAL чтение видит последнее закоммиченное состояние и не ждет блокировки записи
+        with reader.connect() as read_conn:
+            assert read_conn.execute(text("SELECT count(*) FROM item")).scalar() == 1
+    writer.dispose()
+    reader.dispose()
@@ -0,0 +1,96 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from sqlalchemy import create_engine, text
+
+from core import profiling
+from core.profiling import ProfilingRoute, capture_sql, load_report
+
+
+class Item(BaseModel):
+    name: str
+
+
+def make_client(monkeypatch, tmp_path, token: str = "") -> TestClient:
+    # Настройка читается при создании маршрутов, поэтому подменяется до их объявления
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(profiling, "PROFILING_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", token)
+    # TestClient передает адрес клиента "testclient"; без токена он считается локальным
+    monkeypatch.setattr(profiling, "LOOPBACK_HOSTS", frozenset({"testclient"}))
+    engine = create_engine("sqlite://")
+    capture_sql(engine)
+    router = APIRouter(route_class=ProfilingRoute)
+
+    @router.get("/items/{item_id}")
+    def get_item(item_id: int):
+        with engine.connect() as conn:
+            return {"id": conn.execute(text("SELECT :id"), {"id": item_id}).scalar()}
+
+    @router.post("/items/")
+    async def create_item(item: Item):
+        return {"name": item.name}
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_profile_is_saved_only_on_request(monkeypatch, tmp_path):
+    client = make_client(monkeypatch, tmp_path)
+
+    plain = client.get("/items/1")
+    response = client.get("/items/2", headers={"X-Profile": "1"})
+
+    assert "x-profile-id" not in plain.headers
+    assert response.json() == {"id": 2}
+    report = load_report(response.headers["x-profile-id"])
+    assert "Request: GET /items/2" in report
+    assert "SQL statements: 1" in report
+    assert "SELECT ?" in report
+    assert "Call tree, worker thread 1" in report
+    assert "get_item" in report
+    assert (tmp_path / f"{response.headers['x-profile-id']}.prof").exists()
+
+
+def test_profiled_post_receives_body(monkeypatch, tmp_path):
+    client = make_client(monkeypatch, tmp_path)
+
+    response = client.post("/items/?profile=1", json={"name": "book"})
+
+    assert response.json() == {"name": "book"}
+    assert "Request: POST /items/?profile=1" in load_report(response.headers["x-profile-id"])
+
+
+def test_profiling_token_must_match(monkeypatch, tmp_path):
+    client = make_client(monkeypatch, tmp_path, token="secret")
+
+    assert "x-profile-id" not in client.get("/items/1", headers={"X-Profile": "1"}).headers
+    assert "x-profile-id" in client.get("/items/1", headers={"X-Profile": "secret"}).headers
+
+
+def test_profiling_without_token_is_local_only(monkeypatch, tmp_path):
+    client = make_client(monkeypatch, tmp_path)
+    monkeypatch.setattr(profiling, "LOOPBACK_HOSTS", frozenset({"127.0.0.1", "::1"}))
+
+    assert "x-profile-id" not in client.get("/items/1", headers={"X-Profile": "1"}).headers
+
+
+def test_old_reports_are_pruned(monkeypatch, tmp_path):
+    client = make_client(monkeypatch, tmp_path)
+    monkeypatch.setattr(profiling, "PROFILING_MAX_REPORTS", 2)
+
+    ids = [client.get(f"/items/{item_id}", headers={"X-Profile": "1"}).headers["x-profile-id"]
+           for item_id in range(4)]
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        f"{profile_id}{extension}" for profile_id in ids[2:] for extension in (".prof", ".txt"))
+
+
+def test_load_report_rejects_paths(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILING_DIR", str(tmp_path))
+    (tmp_path / "report.txt").write_text("report")
+
+    assert load_report("report") == "report"
+    assert load_report("../report") is None
+    assert load_report("missing") is None
@@ -0,0 +1,177 @@
+import pytest
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.orm import Session
+
+from core.cruds.author import AuthorCRUD
+from core.cruds.book import BookCRUD
+from core.cruds.borrow import BorrowCRUD
+from core.cruds.stats import StatsCRUD
+from core.models.author import Author
+from core.models.base import Base
+from core.models.book import Book
+from core.models.borrow import Borrow, BorrowArchive
+from core.models.stats import AuthorStats, BookStats, LoanSummary
+from core.pagination import encode_cursor, paginate
+from db.migrations import upgrade_db
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'library.db'}")
+    upgrade_db(engine)
+    yield engine
+    engine.dispose()
+
+
+def query_plan(engine, stmt) -> str:
+    sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        return "\n".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+
+
+def test_book_borrows_uses_index(engine):
+    # Запрос загрузки связи Book.borrows
+    plan = query_plan(engine, select(Borrow).where(Borrow.book_id == 1))
+    assert "USING INDEX ix_borrow_book_id" in plan
+
+
+def test_active_loans_use_partial_index(engine):
+    plan = query_plan(engine, select(Borrow).where(Borrow.book_id == 1, Borrow.return_date.is_(None)))
+    assert "USING INDEX ix_borrow_active_book_id" in plan
+
+
+def test_overdue_loans_use_partial_index(engine):
+    with Session(engine) as db:
+        cursor = encode_cursor("borrow_date", ["2023-01-01", 10])
+        page = paginate(db.query(Borrow).filter(Borrow.return_date.is_(None), Borrow.borrow_date < "2024-01-01"),
+                        BorrowCRUD.SORTS, "borrow_date", 0, 10, cursor).statement
+    plan = query_plan(engine, page)
+    assert "USING INDEX ix_borrow_active_borrow_date_id" in plan
+    assert "USE TEMP B-TREE" not in plan
+
+
+@pytest.mark.parametrize("order_by", list(StatsCRUD.RANKINGS))
+def test_top_books_use_stats_index(engine, order_by):
+    counter = StatsCRUD.RANKINGS[order_by]
+    stmt = select(BookStats.book_id).where(counter > 0).order_by(counter.desc(), BookStats.book_id.desc()).limit(10)
+    plan = query_plan(engine, stmt)
+    assert f"USING COVERING INDEX ix_book_stats_{order_by}" in plan
+    assert "USE TEMP B-TREE" not in plan
+
+
+def test_top_authors_use_stats_index(engine):
+    stmt = (select(AuthorStats.author_id, Author.first_name, Author.last_name, AuthorStats.books,
+                   AuthorStats.active_loans, AuthorStats.total_loans)
+            .join(Author, Author.id == AuthorStats.author_id)
+            .where(AuthorStats.total_loans > 0)
+            .order_by(AuthorStats.total_loans.desc(), AuthorStats.author_id)
+            .limit(10))
+    plan = query_plan(engine, stmt)
+    # Рейтинг читает начало индекса счетчиков авторов, без группировки по книгам и сортировки
+    assert "SEARCH author_stats USING INDEX ix_author_stats_total_loans" in plan
+    assert "book" not in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_summary_reads_single_row(engine):
+    plan = query_plan(engine, select(LoanSummary.active_loans, LoanSummary.total_loans).where(LoanSummary.id == 1))
+    assert plan == "SEARCH loan_summary USING INTEGER PRIMARY KEY (rowid=?)"
+
+
+def test_reader_lookup_uses_index(engine):
+    plan = query_plan(engine, select(Borrow).where(Borrow.reader_id == 1))
+    assert "USING INDEX ix_borrow_reader_id_borrow_date_id" in plan
+
+
+@pytest.mark.parametrize("active, index", [
+    (None, "ix_borrow_reader_id_borrow_date_id"),
+    (True, "ix_borrow_active_reader_id"),
+])
+def test_reader_borrows_use_index(engine, active, index):
+    with Session(engine) as db:
+        cursor = encode_cursor("-borrow_date", ["2023-01-01", 10])
+        query = db.query(Borrow).filter(Borrow.reader_id == 1)
+        if active:
+            query = query.filter(Borrow.return_date.is_(None))
+        stmt = paginate(query, BorrowCRUD.SORTS, "-borrow_date", 0, 10, cursor).statement
+    plan = query_plan(engine, stmt)
+    assert f"USING INDEX {index}" in plan
+    assert "USE TEMP B-TREE" not in plan
+
+
+def test_author_books_uses_index(engine):
+    # Запрос загрузки связи Author.books
+    plan = query_plan(engine, select(Book).where(Book.author_id == 1))
+    assert "USING INDEX ix_book_author_id" in plan
+
+
+@pytest.mark.parametrize("crud, model, order_by, cursor_values, index", [
+    (BookCRUD, Book, "title", ["Anna Karenina", 10], "ix_book_title_id"),
+    (AuthorCRUD, Author, "last_name", ["Tolstoy", 10], "ix_author_last_name_id"),
+    (BorrowCRUD, Borrow, "borrow_date", ["2023-01-01", 10], "ix_borrow_borrow_date_id"),
+    (BorrowCRUD, Borrow, "-borrow_date", ["2023-01-01", 10], "ix_borrow_borrow_date_id"),
+])
+def test_keyset_pages_use_index(engine, crud, model, order_by, cursor_values, index):
+    with Session(engine) as db:
+        cursor = encode_cursor(order_by, cursor_values)
+        stmt = paginate(db.query(model), crud.SORTS, order_by, 0, 10, cursor).statement
+    plan = query_plan(engine, stmt)
+    assert f"USING INDEX {index}" in plan
+    # Сортировка должна идти по индексу, а не через временное B-дерево
+    assert "USE TEMP B-TREE" not in plan
+
+
+def test_upgrade_adds_indexes_to_existing_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    # База в прежнем виде: таблицы без вторичных индексов
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(text(f"DROP INDEX {index.name}"))
+
+    created = upgrade_db(engine)
+    assert "ix_borrow_active_book_id" in created
+    assert "ix_book_author_id" in created
+
+    indexes = {index["name"] for index in inspect(engine).get_indexes("borrow")}
+    assert {"ix_borrow_book_id", "ix_borrow_reader_id_borrow_date_id", "ix_borrow_active_book_id"} <= indexes
+    assert upgrade_db(engine) == []
+    engine.dispose()
+
+
+def test_search_uses_fts_index(engine):
+    with Session(engine) as db:
+        db.add(Book(title="War and Peace", description="A novel.", available_copies=1))
+        db.commit()
+        assert [book.title for book in BookCRUD.search_books(db=db, q="peac*")[0]] == ["War and Peace"]
+
+    plan = query_plan(engine, select(text("rowid")).select_from(text("book_fts")).where(text("book_fts MATCH 'war'")))
+    assert "VIRTUAL TABLE INDEX" in plan
+
+
+def test_upgrade_builds_search_index_for_existing_books(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # База в прежнем виде: без полнотекстового индекса, с уже существующими книгами
+        for trigger in ("book_fts_ai", "book_fts_ad", "book_fts_au"):
+            conn.execute(text(f"DROP TRIGGER {trigger}"))
+        conn.execute(text("DROP TABLE book_fts"))
+        conn.execute(text("INSERT INTO book (title, available_copies) VALUES ('Anna Karenina', 1)"))
+
+    upgrade_db(engine)
+    with Session(engine) as db:
+        assert [book.title for book in BookCRUD.search_books(db=db, q="karenina")[0]] == ["Anna Karenina"]
+    engine.dispose()
+
+
+def test_archive_history_uses_indexes(engine):
+    for column, index in ((BorrowArchive.book_id, "ix_borrow_archive_book_id_borrow_date_id"),
+                          (BorrowArchive.reader_id, "ix_borrow_archive_reader_id_borrow_date_id")):
+        with Session(engine) as db:
+            query = paginate(db.query(BorrowArchive.id).filter(column == 1), BorrowCRUD.ARCHIVE_SORTS, "-borrow_date",
+                             0, 10)
+            plan = query_plan(engine, query.statement)
+        assert f"USING COVERING INDEX {index}" in plan
+        assert "TEMP B-TREE" not in plan
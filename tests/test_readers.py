@@ -0,0 +1,127 @@
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.orm import Session
+
+from core.cruds.borrow import BorrowCRUD
+from core.cruds.reader import ReaderCRUD
+from core.models.author import Author
+from core.models.base import Base
+from core.models.book import Book
+from core.models.reader import Reader
+from core.schemas.borrow import BorrowCreate
+from core.schemas.reader import ReaderCreate
+from db.database import create_db
+from db.migrations import upgrade_db
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'library.db'}")
+    upgrade_db(engine)
+    with Session(engine) as db:
+        db.add(Author(id=1, first_name="Leo", last_name="Tolstoy", birth_date=date(1828, 9, 9)))
+        db.add(Book(id=1, title="War and Peace", author_id=1, available_copies=10))
+        db.commit()
+    yield engine
+    engine.dispose()
+
+
+def borrow(db, reader_id, day=1):
+    return BorrowCRUD.borrow_book(db, BorrowCreate(book_id=1, reader_id=reader_id, borrow_date=date(2024, 1, day)))
+
+
+def test_loan_limit_is_enforced_at_borrow_time(engine):
+    with Session(engine) as db:
+        reader = ReaderCRUD.create_reader(db, ReaderCreate(name="Anna", loan_limit=2))
+        first = borrow(db, reader.id)
+        borrow(db, reader.id, 2)
+        with pytest.raises(ValueError, match="loan limit"):
+            borrow(db, reader.id, 3)
+        # Отказ откатывает и уменьшение остатка книги
+        assert db.get(Book, 1).available_copies == 8
+        assert ReaderCRUD.get_reader(db, reader.id).active_loans == 2
+
+        BorrowCRUD.return_borrow(db, first.id, date(2024, 1, 5))
+        assert ReaderCRUD.get_reader(db, reader.id).active_loans == 1
+        assert borrow(db, reader.id, 6) is not None
+
+        with pytest.raises(ValueError, match="Reader not found"):
+            borrow(db, 999)
+        db.expire_all()
+        assert db.get(Book, 1).available_copies == 8
+
+
+def test_reader_name_resolves_to_one_reader(engine):
+    with Session(engine) as db:
+        ids = {BorrowCRUD.borrow_book(db, BorrowCreate(book_id=1, reader_name="Boris", borrow_date=date(2024, 1, 1)))
+               .reader_id for _ in range(3)}
+        assert len(ids) == 1
+        assert db.scalars(select(Reader.name)).all() == ["Boris"]
+        with pytest.raises(ValueError):
+            ReaderCRUD.create_reader(db, ReaderCreate(name="Boris"))
+
+
+def test_upgrade_moves_reader_names_to_readers(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # База в прежнем виде: имя читателя хранится в каждой выдаче
+        conn.execute(text("DROP TABLE borrow"))
+        conn.execute(text("CREATE TABLE borrow (id INTEGER PRIMARY KEY, book_id INTEGER NOT NULL, "
+                          "reader_name VARCHAR NOT NULL, borrow_date DATE NOT NULL, return_date DATE, "
+                          "version INTEGER NOT NULL DEFAULT 1)"))
+        conn.execute(text("CREATE INDEX ix_borrow_reader_name ON borrow (reader_name)"))
+        conn.execute(text("INSERT INTO book (id, title, available_copies) VALUES (1, 'Anna Karenina', 5)"))
+        conn.execute(text("INSERT INTO borrow (book_id, reader_name, borrow_date, return_date) VALUES "
+                          "(1, 'Bob', '2024-01-01', NULL), (1, 'Alice', '2024-01-02', '2024-01-03'), "
+                          "(1, 'Bob', '2024-01-04', NULL), (1, 'Alice', '2024-01-05', NULL)"))
+        conn.execute(text("PRAGMA user_version = 3"))
+
+    upgrade_db(engine)
+    with engine.connect() as conn:
+        readers = conn.execute(text("SELECT id, name, active_loans FROM reader ORDER BY id")).all()
+        borrows = conn.execute(text("SELECT reader_id FROM borrow ORDER BY id")).scalars().all()
+    assert [tuple(row) for row in readers] == [(1, "Bob", 2), (2, "Alice", 1)]
+    assert borrows == [1, 2, 1, 2]
+    columns = {column["name"] for column in inspect(engine).get_columns("borrow")}
+    indexes = {index["name"] for index in inspect(engine).get_indexes("borrow")}
+    assert "reader_name" not in columns
+    assert {"ix_borrow_reader_id_borrow_date_id", "ix_borrow_active_reader_id"} <= indexes
+    assert "ix_borrow_reader_name" not in indexes
+    engine.dispose()
+
+
+def test_reader_endpoints():
+    create_db()
+    reader = client.post("/readers/", json={"name": "Desk Reader", "loan_limit": 2}).json()
+    assert reader["active_loans"] == 0
+    assert client.post("/readers/", json={"name": "Desk Reader"}).status_code == 400
+    assert client.get("/readers/999999").status_code == 404
+    assert client.get("/readers/999999/borrows").status_code == 404
+
+    book = client.post("/books/", json={"title": "Reader Book", "author_id": 1, "available_copies": 5}).json()
+    borrows = [client.post("/borrows/", json={"book_id": book["id"], "reader_id": reader["id"],
+                                              "borrow_date": f"2024-02-0{day}"}).json() for day in (1, 2)]
+    response = client.post("/borrows/", json={"book_id": book["id"], "reader_id": reader["id"],
+                                              "borrow_date": "2024-02-03"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Reader has reached the loan limit"
+    assert client.post("/borrows/", json={"book_id": book["id"], "reader_id": reader["id"], "reader_name": "X",
+                                          "borrow_date": "2024-02-03"}).status_code == 422
+
+    client.patch(f"/borrows/{borrows[0]['id']}/return", params={"return_date": "2024-02-05"})
+    url = f"/readers/{reader['id']}/borrows"
+    assert [row["id"] for row in client.get(url).json()] == [borrows[1]["id"], borrows[0]["id"]]
+    assert [row["id"] for row in client.get(url, params={"active": True}).json()] == [borrows[1]["id"]]
+    assert [row["id"] for row in client.get(url, params={"active": False}).json()] == [borrows[0]["id"]]
+    assert client.get(f"/readers/{reader['id']}").json()["active_loans"] == 1
+
+    first = client.get(url, params={"limit": 1})
+    second = client.get(url, params={"limit": 1, "after": first.headers["X-Next-Cursor"]})
+    assert [row["id"] for row in second.json()] == [borrows[0]["id"]]
@@ -0,0 +1,98 @@
+import pytest
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import Session
+
+from core.cruds.book import BookCRUD
+from core.models.author import Author
+from core.models.book import Book
+from core.models.borrow import Borrow
+from core.models.stats import BookStats
+from db.seed import SeedCounts, make_vocabulary, seed_file
+
+COUNTS = SeedCounts(authors=50, books=300, borrows=5000, readers=200)
+
+
+def dump(path):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.connect() as conn:
+        tables = {
+            model.__tablename__: conn.execute(select(model.__table__).order_by(model.id)).all()
+            for model in (Author, Book, Borrow)
+        }
+    engine.dispose()
+    return tables
+
+
+@pytest.fixture(scope="module")
+def seeded(tmp_path_factory):
+    path = tmp_path_factory.mktemp("seed") / "library.db"
+    seed_file(str(path), COUNTS, seed=7)
+    return path
+
+
+def test_seed_row_counts(seeded):
+    tables = dump(seeded)
+    assert len(tables["author"]) == COUNTS.authors
+    assert len(tables["book"]) == COUNTS.books
+    assert len(tables["borrow"]) == COUNTS.borrows
+
+
+def test_seed_is_deterministic(seeded, tmp_path):
+    again = tmp_path / "library.db"
+    seed_file(str(again), COUNTS, seed=7)
+    assert dump(again) == dump(seeded)
+
+    other = tmp_path / "other.db"
+    seed_file(str(other), COUNTS, seed=8)
+    assert dump(other)["book"] != dump(seeded)["book"]
+
+
+def test_seed_available_copies_match_active_borrows(seeded):
+    engine = create_engine(f"sqlite:///{seeded}")
+    with engine.connect() as conn:
+        active = dict(conn.execute(
+            select(Borrow.book_id, func.count()).where(Borrow.return_date.is_(None)).group_by(Borrow.book_id)
+        ).all())
+        books = conn.execute(select(Book.id, Book.available_copies)).all()
+        dates = conn.execute(select(func.min(Borrow.borrow_date), func.max(Borrow.borrow_date))).one()
+    engine.dispose()
+
+    assert active
+    assert all(copies >= 0 for _, copies in books)
+    # Остаток не превышает 10 экземпляров вместе с активными выдачами
+    assert all(copies + active.get(book_id, 0) <= 10 for book_id, copies in books)
+    assert dates[0] < dates[1]
+
+
+def test_seed_rebuilds_indexes_and_search(seeded):
+    engine = create_engine(f"sqlite:///{seeded}")
+    with engine.connect() as conn:
+        indexes = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+        triggers = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'"))}
+        books = conn.execute(select(Book.title, Book.description)).all()
+    assert {"ix_author_last_name_id", "ix_book_title_id", "ix_borrow_borrow_date_id"} <= indexes
+    assert {"book_fts_ai", "book_fts_ad", "book_fts_au"} <= triggers
+
+    # Самое частое слово словаря встречается во многих книгах
+    word = make_vocabulary(7)[0]
+    expected = sum(word in f"{title} {description}".lower().split() for title, description in books)
+    with Session(engine) as db:
+        found, _ = BookCRUD.search_books(db=db, q=word, limit=COUNTS.books)
+    engine.dispose()
+    assert expected > 0
+    assert len(found) == expected
+
+
+def test_seed_rebuilds_book_stats(seeded):
+    engine = create_engine(f"sqlite:///{seeded}")
+    with engine.connect() as conn:
+        expected = conn.execute(select(func.count().filter(Borrow.return_date.is_(None)), func.count())
+                                .select_from(Borrow)).one()
+        counters = conn.execute(select(func.sum(BookStats.active_loans), func.sum(BookStats.total_loans))).one()
+    engine.dispose()
+    assert tuple(counters) == tuple(expected)
+
+
+def test_seed_rejects_non_empty_database(seeded):
+    with pytest.raises(ValueError):
+        seed_file(str(seeded), COUNTS, seed=7)
@@ -0,0 +1,195 @@
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import Session
+
+from core.cruds.author import AuthorCRUD
+from core.cruds.book import BookCRUD
+from core.cruds.borrow import BorrowCRUD
+from core.cruds.stats import StatsCRUD
+from core.models.author import Author
+from core.models.base import Base
+from core.models.book import Book
+from core.models.borrow import Borrow, BorrowArchive
+from core.models.stats import AuthorStats, BookStats, LoanSummary, LOAN_TOTALS_TRIGGERS
+from core.schemas.book import BookUpdate
+from core.schemas.borrow import BorrowCreate, BorrowUpdate
+from db.database import create_db
+from db.migrations import rebuild_book_stats, upgrade_db
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'library.db'}")
+    upgrade_db(engine)
+    with Session(engine) as db:
+        db.add(Author(id=1, first_name="Leo", last_name="Tolstoy", birth_date=date(1828, 9, 9)))
+        db.add_all([Book(id=1, title="War and Peace", author_id=1, available_copies=3),
+                    Book(id=2, title="Anna Karenina", author_id=1, available_copies=3)])
+        db.commit()
+    yield engine
+    engine.dispose()
+
+
+def stats(engine) -> dict:
+    with engine.connect() as conn:
+        return {row.book_id: (row.active_loans, row.total_loans) for row in conn.execute(select(BookStats))}
+
+
+def recomputed(engine) -> dict:
+    with engine.begin() as conn:
+        rebuild_book_stats(conn)
+    return stats(engine)
+
+
+def totals(engine) -> tuple:
+    # Общие счетчики и счетчики авторов; строки авторов без выдач не влияют на отчеты
+    with engine.connect() as conn:
+        summary = tuple(conn.execute(select(LoanSummary.active_loans, LoanSummary.total_loans)).one())
+        authors = {row.author_id: (row.books, row.active_loans, row.total_loans)
+                   for row in conn.execute(select(AuthorStats).where(AuthorStats.total_loans > 0))}
+    return summary, authors
+
+
+def test_counters_follow_borrow_changes(engine):
+    with Session(engine) as db:
+        first = BorrowCRUD.borrow_book(db, BorrowCreate(book_id=1, reader_name="A", borrow_date=date(2024, 1, 1)))
+        BorrowCRUD.borrow_book(db, BorrowCreate(book_id=1, reader_name="B", borrow_date=date(2024, 1, 2)))
+        assert stats(engine) == {1: (2, 2)}
+
+        BorrowCRUD.return_borrow(db, first.id, date(2024, 1, 5))
+        assert stats(engine) == {1: (1, 2)}
+
+        # Перенос возвращенной выдачи на другую книгу переносит и ее вклад в счетчики
+        BorrowCRUD.update_borrow(db, first.id, BorrowUpdate(book_id=2, reader_id=first.reader_id,
+                                                            borrow_date=date(2024, 1, 1),
+                                                            return_date=date(2024, 1, 6)))
+        assert stats(engine) == {1: (1, 1), 2: (0, 1)}
+
+        BookCRUD.delete_books(db, [1])
+    assert stats(engine) == {2: (0, 1)}
+    assert recomputed(engine) == {2: (0, 1)}
+
+
+def test_totals_follow_book_and_author_changes(engine):
+    with Session(engine) as db:
+        db.add(Author(id=2, first_name="Anton", last_name="Chekhov", birth_date=date(1860, 1, 29)))
+        db.commit()
+        first = BorrowCRUD.borrow_book(db, BorrowCreate(book_id=1, reader_name="A", borrow_date=date(2024, 1, 1)))
+        BorrowCRUD.borrow_book(db, BorrowCreate(book_id=2, reader_name="B", borrow_date=date(2024, 1, 2)))
+        BorrowCRUD.return_borrow(db, first.id, date(2024, 1, 5))
+        assert totals(engine) == ((1, 2), {1: (2, 1, 2)})
+
+        # Смена автора книги переносит ее счетчики к новому автору
+        BookCRUD.update_book(db, 2, BookUpdate(title="Anna Karenina", author_id=2, available_copies=2))
+        assert totals(engine) == ((1, 2), {1: (1, 0, 1), 2: (1, 1, 1)})
+
+        # Выдача книги, которой еще нет, учитывается у автора, когда книга появляется
+        db.execute(text("INSERT INTO borrow (book_id, reader_id, borrow_date) VALUES (3, 1, '2024-01-03')"))
+        db.commit()
+        assert totals(engine) == ((2, 3), {1: (1, 0, 1), 2: (1, 1, 1)})
+        db.add(Book(id=3, title="The Cossacks", author_id=1, available_copies=1))
+        db.commit()
+        assert totals(engine) == ((2, 3), {1: (2, 1, 2), 2: (1, 1, 1)})
+
+        BookCRUD.delete_books(db, [1])
+        assert totals(engine) == ((2, 2), {1: (1, 1, 1), 2: (1, 1, 1)})
+        AuthorCRUD.delete_authors(db, [2])
+        assert totals(engine) == ((2, 2), {1: (1, 1, 1)})
+
+    expected = totals(engine)
+    recomputed(engine)
+    assert totals(engine) == expected
+
+
+def test_rebuild_repairs_drift(engine):
+    with Session(engine) as db:
+        BorrowCRUD.borrow_book(db, BorrowCreate(book_id=2, reader_name="A", borrow_date=date(2024, 1, 1)))
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE book_stats SET active_loans = 7, total_loans = 9"))
+        conn.execute(text("INSERT INTO book_stats (book_id, active_loans, total_loans) VALUES (1, 3, 3)"))
+        conn.execute(text("UPDATE loan_summary SET active_loans = 5"))
+        conn.execute(text("UPDATE author_stats SET books = 4"))
+    assert recomputed(engine) == {2: (1, 1)}
+    assert totals(engine) == ((1, 1), {1: (1, 1, 1)})
+
+
+def test_reports(engine):
+    with Session(engine) as db:
+        for day in (1, 2, 20):
+            BorrowCRUD.borrow_book(db, BorrowCreate(book_id=2, reader_name="A", borrow_date=date(2024, 1, day)))
+        returned = BorrowCRUD.borrow_book(db, BorrowCreate(book_id=1, reader_name="B", borrow_date=date(2024, 1, 1)))
+        BorrowCRUD.return_borrow(db, returned.id, date(2024, 1, 3))
+
+        as_of = date(2024, 1, 25)
+        summary = StatsCRUD.get_summary(db, as_of)
+        assert (summary["active_loans"], summary["total_loans"], summary["overdue_loans"]) == (3, 4, 2)
+
+        assert [row.book_id for row in StatsCRUD.get_top_books(db)] == [2, 1]
+        assert [row.book_id for row in StatsCRUD.get_top_books(db, order_by="active_loans")] == [2]
+        with pytest.raises(ValueError):
+            StatsCRUD.get_top_books(db, order_by="title")
+
+        authors = StatsCRUD.get_top_authors(db)
+        assert [(row.author_id, row.books, row.active_loans, row.total_loans) for row in authors] == [(1, 2, 3, 4)]
+
+        overdue = StatsCRUD.get_overdue(db, as_of, limit=1)
+        assert [row.borrow_date for row in overdue] == [date(2024, 1, 1)]
+
+
+def test_upgrade_builds_stats_for_existing_borrows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # База в прежнем виде: выдачи есть, счетчиков и триггеров нет
+        for trigger in ("book_stats_borrow_ai", "book_stats_borrow_ad", "book_stats_borrow_au", "book_stats_book_ad",
+                        *LOAN_TOTALS_TRIGGERS):
+            conn.execute(text(f"DROP TRIGGER {trigger}"))
+        for table in ("book_stats", "author_stats", "loan_summary"):
+            conn.execute(text(f"DROP TABLE {table}"))
+        conn.execute(text("INSERT INTO book (id, title, available_copies) VALUES (1, 'Anna Karenina', 1)"))
+        conn.execute(text("INSERT INTO reader (id, name, loan_limit) VALUES (1, 'A', 10)"))
+        conn.execute(text("INSERT INTO borrow (book_id, reader_id, borrow_date) VALUES (1, 1, '2024-01-01')"))
+        conn.execute(text("PRAGMA user_version = 2"))
+
+    upgrade_db(engine)
+    assert stats(engine) == {1: (1, 1)}
+    assert totals(engine) == ((1, 1), {})
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE borrow SET return_date = '2024-01-02'"))
+    assert stats(engine) == {1: (0, 1)}
+    engine.dispose()
+
+
+def test_stats_endpoints():
+    create_db()
+    book = client.post("/books/", json={"title": "Overdue Book", "author_id": 1, "available_copies": 2}).json()
+    old = client.post("/borrows/", json={"book_id": book["id"], "reader_name": "Late", "borrow_date": "1990-01-01"})
+    assert old.status_code == 200
+
+    summary = client.get("/stats/summary", params={"as_of": "2000-01-01"}).json()
+    with Session(create_engine("sqlite:///library.db")) as db:
+        active, total = db.execute(select(func.count().filter(Borrow.return_date.is_(None)), func.count())
+                                   .select_from(Borrow).join(Book, Book.id == Borrow.book_id)).one()
+        # Выдачи, перенесенные в архив, остаются в общем числе выдач
+        total += db.scalar(select(func.count()).select_from(BorrowArchive)
+                           .join(Book, Book.id == BorrowArchive.book_id))
+    assert (summary["active_loans"], summary["total_loans"]) == (active, total)
+    assert summary["overdue_loans"] >= 1 and summary["loan_period_days"] == 14
+
+    books = client.get("/stats/books", params={"order_by": "active_loans", "limit": 100}).json()
+    assert {"book_id": book["id"], "title": "Overdue Book", "author_id": 1, "active_loans": 1,
+            "total_loans": 1} in books
+    assert client.get("/stats/books", params={"order_by": "title"}).status_code == 400
+    assert client.get("/stats/authors").status_code == 200
+
+    first = client.get("/stats/overdue", params={"as_of": "2000-01-01", "limit": 1})
+    assert first.json()[0]["id"] == old.json()["id"]
+    rest = client.get("/stats/overdue", params={"as_of": "2000-01-01", "after": first.headers["X-Next-Cursor"]})
+    assert old.json()["id"] not in [borrow["id"] for borrow in rest.json()]
+    assert client.get("/stats/overdue", params={"after": "broken"}).status_code == 400
@@ -0,0 +1,154 @@
+import threading
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+import main
+from core.cache import entity_cache
+from core.cruds.author import AuthorCRUD
+from core.cruds.borrow import BorrowCRUD
+from core.metrics import metrics
+from core.models.author import Author
+from core.models.book import Book
+from core.models.borrow import Borrow
+from core.models.reader import Reader
+from core.schemas.author import AuthorCreate, AuthorUpdate
+from core.schemas.borrow import BorrowCreate
+from core.write_queue import GroupSession, WriteQueue, WriteQueueFull
+from db.migrations import upgrade_db
+
+client = TestClient(main.app)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'library.db'}")
+    upgrade_db(engine)
+    with Session(engine) as db:
+        db.add(Author(id=1, first_name="Leo", last_name="Tolstoy", birth_date=date(1828, 9, 9)))
+        db.add(Book(id=1, title="War and Peace", author_id=1, available_copies=2))
+        db.add(Reader(id=1, name="Alice"))
+        db.commit()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def write_queue(engine):
+    write_queue = WriteQueue(sessionmaker(bind=engine, class_=GroupSession, expire_on_commit=False)).start()
+    yield write_queue
+    write_queue.stop()
+
+
+def hold_writer(write_queue):
+    # Операция, которая держит писателя, пока следующие операции накапливаются в очереди
+    started, release = threading.Event(), threading.Event()
+    future = write_queue.submit(lambda db: started.set() or release.wait(5))
+    started.wait(5)
+    return future, release
+
+
+def test_queued_operations_commit_in_one_batch(engine, write_queue):
+    batches = metrics.write_batch_sizes.count
+    held, release = hold_writer(write_queue)
+    futures = [
+        write_queue.submit(BorrowCRUD.borrow_book, borrow=BorrowCreate(book_id=1, reader_id=1,
+                                                                       borrow_date=date(2024, 1, day)))
+        for day in (1, 2, 3)
+    ]
+    futures.append(write_queue.submit(AuthorCRUD.create_author, author=AuthorCreate(
+        first_name="Anton", last_name="Chekhov", birth_date=date(1860, 1, 29))))
+    release.set()
+
+    held.result(5)
+    first, second, third, author = [future.result(5) for future in futures]
+    assert (first.borrow_date, second.borrow_date) == (date(2024, 1, 1), date(2024, 1, 2))
+    # Остаток книги закончился: третья выдача не создана, остальные операции пакета применены
+    assert third is None
+    assert author.last_name == "Chekhov"
+    assert metrics.write_batch_sizes.count == batches + 2
+    with Session(engine) as db:
+        assert db.scalar(select(func.count()).select_from(Borrow)) == 2
+        assert db.get(Book, 1).available_copies == 0
+
+
+def test_failed_operation_is_rolled_back_alone(engine, write_queue):
+    def create_and_fail(db):
+        AuthorCRUD.create_author(db, AuthorCreate(first_name="Failed", last_name="Author",
+                                                  birth_date=date(1900, 1, 1)))
+        raise ValueError("Operation failed")
+
+    held, release = hold_writer(write_queue)
+    failed = write_queue.submit(create_and_fail)
+    created = write_queue.submit(AuthorCRUD.create_author, author=AuthorCreate(
+        first_name="Fyodor", last_name="Dostoevsky", birth_date=date(1821, 11, 11)))
+    release.set()
+
+    with pytest.raises(ValueError, match="Operation failed"):
+        failed.result(5)
+    assert created.result(5).first_name == "Fyodor"
+    with Session(engine) as db:
+        assert sorted(db.scalars(select(Author.last_name))) == ["Dostoevsky", "Tolstoy"]
+
+
+def test_cache_is_invalidated_after_batch_commit(write_queue):
+    entity_cache.get_or_load("author", 1, lambda: {"id": 1, "first_name": "Leo", "version": 1})
+    updated = write_queue.submit(AuthorCRUD.update_author, author_id=1,
+                                 author=AuthorUpdate(first_name="Lev", last_name="Tolstoy",
+                                                     birth_date=date(1828, 9, 9))).result(5)
+    assert updated.first_name == "Lev"
+    assert entity_cache.get_or_load("author", 1, lambda: None) is None
+
+
+def test_stop_finishes_accepted_operations(engine, write_queue):
+    held, release = hold_writer(write_queue)
+    queued = [write_queue.submit(AuthorCRUD.create_author, author=AuthorCreate(
+        first_name="Queued", last_name=f"Author {i}", birth_date=date(1900, 1, 1))) for i in range(3)]
+    stopping = threading.Thread(target=write_queue.stop)
+    stopping.start()
+    release.set()
+    stopping.join(5)
+
+    assert all(future.done() for future in queued)
+    assert [future.result().last_name for future in queued] == ["Author 0", "Author 1", "Author 2"]
+    with pytest.raises(WriteQueueFull, match="stopped"):
+        write_queue.submit(lambda db: None)
+    # После остановки очередь можно запустить снова, как при повторном старте приложения
+    assert write_queue.start().submit(lambda db: "done").result(5) == "done"
+
+
+def test_lifespan_stops_write_queue(engine, monkeypatch):
+    write_queue = WriteQueue(sessionmaker(bind=engine, class_=GroupSession, expire_on_commit=False))
+    monkeypatch.setattr(main, "write_queue", write_queue)
+    with TestClient(main.app) as lifespan_client:
+        assert write_queue.running
+        response = lifespan_client.post("/authors/", json={"first_name": "Lifespan", "last_name": "Author",
+                                                           "birth_date": "1900-01-01"})
+        assert response.status_code == 200
+    assert not write_queue.running
+
+
+def test_full_queue_returns_503(engine, monkeypatch):
+    write_queue = WriteQueue(sessionmaker(bind=engine, class_=GroupSession), maxsize=1).start()
+    held, release = hold_writer(write_queue)
+    write_queue.submit(lambda db: None)
+    rejected = metrics.write_queue_rejected
+    with pytest.raises(WriteQueueFull):
+        write_queue.submit(lambda db: None)
+
+    monkeypatch.setattr(main, "write_queue", write_queue)
+    response = client.post("/authors/", json={"first_name": "Queued", "last_name": "Author",
+                                              "birth_date": "1900-01-01"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert metrics.write_queue_rejected == rejected + 2
+
+    lines = client.get("/metrics").text.splitlines()
+    assert f"db_write_queue_rejected_total {rejected + 2}" in lines
+    assert any(line.startswith("db_write_batch_size_count ") for line in lines)
+    assert any(line.startswith("db_write_queue_wait_seconds_bucket") for line in lines)
+    release.set()
+    write_queue.stop()